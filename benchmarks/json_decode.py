@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        json_decode
+# Purpose:     JSON decoding benchmark of the jsonlib backends
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+"""MB/s of every installed JSON library on task and employee list responses
+shaped like the ones of Megaplan: a plain decode, a decode with the
+records.Ref object_hook and incremental decoding through stream.ItemStream.
+Each result is labelled with the library that actually decoded: ujson
+gives way to another one for the object_hook and the stream cases.
+
+    python benchmarks/json_decode.py [-n ITEMS] [-r REPEAT]
+"""
+
+import json
+import os
+import random
+import sys
+import timeit
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from megaplanpy import jsonlib
+from megaplanpy.client import Response
+from megaplanpy.records import Ref
+from megaplanpy.stream import ItemStream
+
+
+STATUSES = ('actual', 'inprocess', 'new', 'overdue', 'done', 'delayed',
+    'completed', 'failed')
+WORDS = (u'Подготовить', u'отчет', u'по', u'проекту', u'клиента', u'договор',
+    u'Согласовать', u'смету', u'для', u'отдела', u'продаж', u'review', u'API')
+
+
+def RefOf(rnd, base, count, prefix):
+    i = rnd.randrange(count)
+    return {'Id': base + i, 'Name': u'{0} {1}'.format(prefix, i)}
+
+
+def Time(rnd):
+    return '2026-{0:02d}-{1:02d} {2:02d}:{3:02d}:{4:02d}'.format(
+        rnd.randint(1, 12), rnd.randint(1, 28), rnd.randint(0, 23),
+        rnd.randint(0, 59), rnd.randint(0, 59))
+
+
+def Tasks(count, rnd):
+    tasks = []
+    for i in xrange(count):
+        owner = RefOf(rnd, 1000000, 200, u'Сотрудник')
+        tasks.append({
+            'Id': 1000000 + i,
+            'Name': u' '.join(rnd.choice(WORDS) for _ in xrange(6)),
+            'Status': rnd.choice(STATUSES),
+            'Deadline': Time(rnd) if rnd.random() < 0.7 else None,
+            'Owner': owner,
+            'Responsible': RefOf(rnd, 1000000, 200, u'Сотрудник'),
+            'Severity': RefOf(rnd, 1, 3, u'Важность'),
+            'SuperTask': RefOf(rnd, 1000000, count, u'Задача')
+                if rnd.random() < 0.3 else None,
+            'Project': RefOf(rnd, 100, 50, u'Проект'),
+            'Favorite': rnd.randint(0, 1),
+            'TimeCreated': Time(rnd),
+            'TimeUpdated': Time(rnd),
+        })
+    return tasks
+
+
+def Employees(count, rnd):
+    employees = []
+    for i in xrange(count):
+        employees.append({
+            'Id': 1000000 + i,
+            'Name': u'Сотрудник {0}'.format(i),
+            'LastName': u'Фамилия{0}'.format(i),
+            'FirstName': u'Имя',
+            'MiddleName': u'Отчество',
+            'Position': RefOf(rnd, 1, 30, u'Должность'),
+            'Department': RefOf(rnd, 1, 15, u'Отдел'),
+            'Phones': ['+7 495 {0:07d}'.format(rnd.randrange(10 ** 7))],
+            'Email': 'user{0}@example.com'.format(i),
+            'Status': {'Id': 1, 'Name': u'Работает'},
+            'TimeCreated': Time(rnd),
+        })
+    return employees
+
+
+def Document(key, items):
+    return json.dumps({'status': {'code': 'ok', 'message': None},
+        'data': {key: items}})
+
+
+def Stream(backend, text, key):
+    stream = ItemStream(('data', key), decoder=backend.Decoder())
+    size = Response.chunk_size
+    count = 0
+    for i in xrange(0, len(text), size):
+        count += len(stream.Feed(text[i:i + size]))
+    stream.Close()
+    return count
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', '--items', type='int', default=5000)
+    parser.add_option('-r', '--repeat', type='int', default=5)
+    options, args = parser.parse_args()
+
+    rnd = random.Random(42)
+    payloads = (
+        ('tasks', Document('tasks', Tasks(options.items, rnd))),
+        ('employees', Document('employees', Employees(options.items, rnd))),
+    )
+    # (mode, backend of a library name, decode function of a backend)
+    modes = (
+        ('loads', lambda name: jsonlib.Backend(name),
+            lambda backend, key: backend.Loads),
+        ('object_hook', lambda name: jsonlib.Backend(name,
+            object_hook=Ref.FromDict), lambda backend, key: backend.Loads),
+        ('stream', lambda name: jsonlib.Backend(name),
+            lambda backend, key: lambda text: Stream(backend, text, key)),
+    )
+
+    print('available: {0}; default: {1}'.format(
+        ', '.join(jsonlib.Available()), jsonlib.DEFAULT.name))
+    for key, text in payloads:
+        megabytes = len(text) / 1048576.0
+        print('\n{0}: {1} items, {2:.1f} MB'.format(key, options.items,
+            megabytes))
+        for mode, make, factory in modes:
+            row = []
+            for name in jsonlib.Available():
+                backend = make(name)
+                if mode == 'stream':
+                    label = backend.Decoder().__module__.split('.')[0]
+                else:
+                    label = backend.name
+                if label in [item[0] for item in row]:
+                    continue
+                decode = factory(backend, key)
+                seconds = min(timeit.repeat(lambda: decode(text),
+                    repeat=options.repeat, number=1))
+                row.append((label, megabytes / seconds))
+            print('{0:>12} {1}'.format(mode, ' '.join(
+                '{0:>10} {1:>6.1f} MB/s'.format(*item) for item in row)))
+
+if __name__ == '__main__':
+    main()
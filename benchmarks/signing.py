@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        signing
+# Purpose:     Request signing micro-benchmark
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+"""Signatures per second: the way requests were signed before (new HMAC key
+and a strftime/parsedate round trip per request) against Megaplan now.
+
+    python benchmarks/signing.py [-n NUMBER]
+"""
+
+import base64
+import hmac
+import os
+import sys
+import timeit
+from datetime import datetime
+from hashlib import sha1
+from optparse import OptionParser
+from rfc822 import formatdate, mktime_tz, parsedate_tz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from megaplanpy import Megaplan
+
+
+URI = 'BumsTaskApiV01/Task/card.api?Id=1000042'
+
+
+def LegacySignature(mplan):
+    date = formatdate(mktime_tz(parsedate_tz(
+        datetime.now().strftime('%a, %d %b %Y %H:%M:%S'))))
+    q = mplan.SIGNATURE.format(method='GET', md5content='', contenttype='',
+        date=date, host=mplan._host, uri=URI)
+    h = hmac.HMAC(mplan._SecretKey.encode(mplan.code), q, sha1)
+    return base64.encodestring(h.hexdigest()).strip()
+
+
+def Signature(mplan):
+    access_id, secret_key, signer = mplan._credentials
+    return mplan._GetSignature('GET', URI, '', mplan._RfcDateNow(), signer)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', '--number', type='int', default=100000)
+    options, args = parser.parse_args()
+
+    mplan = Megaplan('account', 'login', 'password')
+    secret_key = '0123456789abcdef0123456789abcdef01234567'
+    mplan._credentials = ('AccessId', secret_key, mplan._GetSigner(secret_key))
+
+    assert LegacySignature(mplan) == Signature(mplan)
+
+    results = {}
+    for name, func in (('before', LegacySignature), ('after', Signature)):
+        seconds = min(timeit.repeat(lambda: func(mplan), repeat=3,
+            number=options.number))
+        results[name] = options.number / seconds
+        print('{0:>8}: {1:12.0f} signatures/s'.format(name, results[name]))
+    print('{0:>8}: {1:12.2f}x'.format('speedup',
+        results['after'] / results['before']))
+
+if __name__ == '__main__':
+    main()
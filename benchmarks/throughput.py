@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        throughput
+# Purpose:     End-to-end throughput and latency benchmark of the client
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+"""Requests per second, p50/p99 latency, CPU and memory per request of
+Tasks, TaskCard, TaskCreate and CommentCreate against stub.StubServer.
+
+The stub runs in a separate process, so the CPU time is the client's
+alone, and every case runs in a fresh child process, so its memory is not
+left over from the cases before it. Each case is an operation in one of
+the modes - sequential (one thread), threaded (--threads threads sharing
+one Megaplan) and async (AsyncMegaplan with --threads concurrency) - over
+each payload size of SIZES. Latency is the duration of the calls as
+instrument.Trace reports it; requests per second are counted over the wall
+time of the case.
+
+    python benchmarks/throughput.py [-n REQUESTS] [-t THREADS]
+        [--sizes small,medium] [--operations Tasks,TaskCard]
+        [--modes sequential,threaded] [--latency SECONDS]
+        [-o results.json] [--compare baseline.json [--tolerance 0.1]]
+
+With --compare the results are checked against an earlier output file:
+a case with requests per second lower or p99 higher by more than
+--tolerance is reported and the exit status is 1.
+"""
+
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import megaplanpy
+from megaplanpy import jsonlib
+from megaplanpy.asyncapi import AsyncMegaplan
+from megaplanpy.instrument import Hook
+from megaplanpy.main import Megaplan
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# name: (tasks in the list, length of task and comment texts)
+SIZES = {
+    'small': (100, 200),
+    'medium': (1000, 2000),
+    'large': (5000, 10000),
+}
+
+OPERATIONS = ('Tasks', 'TaskCard', 'TaskCreate', 'CommentCreate')
+MODES = ('sequential', 'threaded', 'async')
+
+LOGIN = PASSWORD = 'stub'
+
+
+class Samples(Hook):
+    """Durations and response sizes of the calls.
+    """
+    def __init__(self):
+        self.Reset()
+
+    def After(self, trace):
+        self.elapsed.append(trace.elapsed)
+        self.response_bytes.append(trace.response_bytes)
+        if trace.error is not None:
+            self.errors.append(trace.error)
+
+    def Reset(self):
+        self.elapsed = []
+        self.response_bytes = []
+        self.errors = []
+
+
+def Percentile(values, q):
+    """Nearest-rank q-th percentile of sorted values.
+    """
+    if not values:
+        return None
+    rank = max(int(round(q / 100.0 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def Usage():
+    """CPU seconds, peak and current resident memory (KB) of the process.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    rss = None
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except IOError:
+        pass
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss, rss
+
+
+def StartStub(tasks, statement, latency):
+    """Runs stub.StubServer in a child process; returns it and its host.
+    """
+    process = subprocess.Popen([sys.executable, '-m', 'megaplanpy.stub',
+        '--port', '0', '--tasks', str(tasks), '--statement', str(statement),
+        '--latency', str(latency)], cwd=ROOT, stdout=subprocess.PIPE)
+    line = process.stdout.readline()
+    if not line:
+        raise RuntimeError('stub server did not start')
+    return process, line.split('http://', 1)[1].split('/', 1)[0]
+
+
+def Calls(operation, tasks, statement, count, seed):
+    """count (method name, kwargs) pairs of operation.
+    """
+    rnd = random.Random(seed)
+    text = (u'Текст ' * (statement // 6 + 1))[:statement]
+    calls = []
+    for i in xrange(count):
+        Id = 1000000 + rnd.randrange(tasks)
+        if operation == 'Tasks':
+            calls.append(('Tasks', {}))
+        elif operation == 'TaskCard':
+            calls.append(('TaskCard', {'Id': Id}))
+        elif operation == 'TaskCreate':
+            calls.append(('TaskCreate', {
+                'Model[Name]': u'Задача {0}'.format(i).encode('utf-8'),
+                'Model[Statement]': text.encode('utf-8'),
+                'Model[Responsible]': 1000000}))
+        else:
+            calls.append(('CommentCreate', {'SubjectType': 'task',
+                'SubjectId': Id, 'Model[Text]': text.encode('utf-8')}))
+    return calls
+
+
+def Run(mode, host, calls, threads, coalesce):
+    """Makes the calls; returns (wall seconds, Samples).
+    """
+    samples = Samples()
+    kwargs = {'host': host, 'scheme': 'http', 'hooks': [samples]}
+    if mode == 'async':
+        mplan = AsyncMegaplan('stub', LOGIN, PASSWORD, concurrency=threads,
+            **kwargs)
+    else:
+        mplan = Megaplan('stub', LOGIN, PASSWORD, **kwargs)
+        mplan._client.pool_size = max(threads, mplan._client.pool_size)
+    mplan.cache = None
+    if not coalesce:
+        mplan.single_flight = None
+
+    def Call(call):
+        try:
+            getattr(mplan, call[0])(**call[1])
+        except Exception:
+            pass
+
+    def Wait(results):
+        for result in results:
+            try:
+                result.Get()
+            except Exception:
+                pass
+
+    # Logs in and opens the connections.
+    warmup = calls[:max(threads, 1)]
+    if mode == 'sequential':
+        for call in warmup:
+            Call(call)
+    elif mode == 'async':
+        Wait([getattr(mplan, name)(**params) for name, params in warmup])
+    else:
+        pool = ThreadPool(len(warmup))
+        pool.map(Call, warmup)
+        pool.close()
+    samples.Reset()
+
+    started = time.time()
+    if mode == 'sequential':
+        for call in calls:
+            Call(call)
+    elif mode == 'threaded':
+        pool = ThreadPool(threads)
+        pool.map(Call, calls, chunksize=1)
+        pool.close()
+    else:
+        Wait([getattr(mplan, name)(**params) for name, params in calls])
+    wall = time.time() - started
+    if mode == 'async':
+        mplan.Close()
+    else:
+        mplan._client.Close()
+    return wall, samples
+
+
+def Case(queue, options, size, operation, mode, host):
+    tasks, statement = SIZES[size]
+    calls = Calls(operation, tasks, statement, options.requests, options.seed)
+    threads = 1 if mode == 'sequential' else options.threads
+    cpu, maxrss, rss = Usage()
+    wall, samples = Run(mode, host, calls, threads, options.coalesce)
+    cpu_after, maxrss_after, rss_after = Usage()
+
+    count = len(samples.elapsed)
+    elapsed = sorted(samples.elapsed)
+    queue.put({
+        'size': size,
+        'operation': operation,
+        'mode': mode,
+        'threads': threads,
+        'requests': count,
+        'errors': len(samples.errors),
+        'seconds': wall,
+        'rps': count / wall if wall else None,
+        'mean': sum(elapsed) / count if count else None,
+        'p50': Percentile(elapsed, 50),
+        'p90': Percentile(elapsed, 90),
+        'p99': Percentile(elapsed, 99),
+        'max': elapsed[-1] if elapsed else None,
+        'response_bytes': (sum(samples.response_bytes) // count
+            if count else None),
+        'cpu_per_request': (cpu_after - cpu) / count if count else None,
+        'maxrss_kb': maxrss_after,
+        'maxrss_delta_kb': maxrss_after - maxrss,
+        'rss_delta_kb': (rss_after - rss) if rss is not None else None,
+    })
+
+
+def Compare(results, baseline, tolerance):
+    """Cases of results worse than in baseline by more than tolerance.
+    """
+    key = lambda item: (item['size'], item['operation'], item['mode'])
+    before = dict((key(item), item) for item in baseline['results'])
+    regressions = []
+    for item in results:
+        old = before.get(key(item))
+        if old is None:
+            continue
+        if old['rps'] and item['rps'] < old['rps'] * (1 - tolerance):
+            regressions.append((key(item), 'rps', old['rps'], item['rps']))
+        if old['p99'] and item['p99'] > old['p99'] * (1 + tolerance):
+            regressions.append((key(item), 'p99', old['p99'], item['p99']))
+    return regressions
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', '--requests', type='int', default=200,
+        help='calls per case')
+    parser.add_option('-t', '--threads', type='int', default=8,
+        help='threads of the threaded mode, concurrency of the async one')
+    parser.add_option('--sizes', default='small,medium')
+    parser.add_option('--operations', default=','.join(OPERATIONS))
+    parser.add_option('--modes', default=','.join(MODES))
+    parser.add_option('--latency', type='float', default=0.0,
+        help='seconds the stub sleeps before each reply')
+    parser.add_option('--coalesce', action='store_true', default=False,
+        help='keep coalescing of identical concurrent GETs')
+    parser.add_option('--seed', type='int', default=0)
+    parser.add_option('-o', '--output', help='JSON file for the results')
+    parser.add_option('--compare', help='JSON file of an earlier run')
+    parser.add_option('--tolerance', type='float', default=0.1)
+    options, args = parser.parse_args()
+
+    sizes = options.sizes.split(',')
+    operations = options.operations.split(',')
+    modes = options.modes.split(',')
+    for name, known in ((sizes, SIZES), (operations, OPERATIONS),
+        (modes, MODES)):
+        unknown = set(name) - set(known)
+        if unknown:
+            parser.error('unknown: {0}'.format(', '.join(sorted(unknown))))
+
+    results = []
+    print('{0:>6} {1:>13} {2:>10} {3:>9} {4:>8} {5:>8} {6:>9} {7:>9} '
+        '{8:>6}'.format('size', 'operation', 'mode', 'req/s', 'p50 ms',
+        'p99 ms', 'cpu ms/r', 'resp KB', 'errors'))
+    for size in sizes:
+        tasks, statement = SIZES[size]
+        process, host = StartStub(tasks, statement, options.latency)
+        try:
+            for operation in operations:
+                for mode in modes:
+                    queue = multiprocessing.Queue()
+                    child = multiprocessing.Process(target=Case,
+                        args=(queue, options, size, operation, mode, host))
+                    child.start()
+                    item = queue.get()
+                    child.join()
+                    results.append(item)
+                    print('{size:>6} {operation:>13} {mode:>10} {rps:>9.1f} '
+                        '{0:>8.2f} {1:>8.2f} {2:>9.3f} {3:>9.1f} '
+                        '{errors:>6}'.format(item['p50'] * 1000,
+                        item['p99'] * 1000, item['cpu_per_request'] * 1000,
+                        item['response_bytes'] / 1024.0, **item))
+        finally:
+            process.terminate()
+            process.wait()
+
+    report = {
+        'version': megaplanpy.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'json_backend': jsonlib.DEFAULT.name,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'options': {'requests': options.requests,
+            'threads': options.threads, 'latency': options.latency,
+            'coalesce': options.coalesce, 'seed': options.seed,
+            'sizes': dict((size, SIZES[size]) for size in sizes)},
+        'results': results,
+    }
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        regressions = Compare(results, baseline, options.tolerance)
+        for key, metric, old, new in regressions:
+            print('regression {0}: {1} {2:.4g} -> {3:.4g}'.format(
+                '/'.join(key), metric, old, new))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -2,4 +2,5 @@
 
 __author__ = 'Sergey Pikhovkin <s@pikhovkin.ru>'
 
-from main import Megaplan
\ No newline at end of file
+from main import Megaplan
+from asyncapi import AsyncMegaplan
\ No newline at end of file
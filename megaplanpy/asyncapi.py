@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        asyncapi
+# Purpose:     Non-blocking Megaplan client
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import httplib
+import md5
+import socket
+import sys
+import threading
+import time
+
+from asyncclient import AsyncClient
+from eventloop import Future, Gather, Loop, Return, Semaphore, Sleep, Task
+from main import (BatchItem, ClientError, DeadlineExceeded, Megaplan,
+    _Overdue)
+
+
+def _AllDone(futures):
+    """A Future of None done once futures are, failed with the first
+    exception among them.
+    """
+    done = Future()
+    Gather(futures).AddCallback(
+        lambda gathered: done._Complete(None, gathered._error))
+    return done
+
+
+class AsyncMegaplan(Megaplan):
+    """Megaplan client whose methods return at once.
+
+    Every public method of Megaplan takes the same arguments and returns an
+    eventloop.Future; Get([timeout]) (or get) waits for the response or
+    raises the exception of the call. The requests run on one loop thread
+    over non-blocking sockets (asyncclient.AsyncClient), so a call in
+    flight holds no thread. No more than `concurrency` requests - logins
+    and the pages of the Iter* methods among them - are sent at the same
+    time; the others wait in line. The Iter* methods are generators, as in
+    Megaplan.
+
+        with AsyncMegaplan(account, login, password) as mplan:
+            cards = [mplan.TaskCard(Id) for Id in Ids]
+            names = [card.Get().data['task']['Name'] for card in cards]
+    """
+    concurrency = 16
+
+    # The calls share the loop thread: GetData() is the last body the
+    # client has received.
+    _data = ''
+
+    def __init__(self, account='', login='', password='', concurrency=None,
+        **kwargs):
+        """
+        concurrency: requests in flight at most (None -
+            AsyncMegaplan.concurrency)
+        kwargs: those of Megaplan
+        """
+        super(AsyncMegaplan, self).__init__(account, login, password,
+            **kwargs)
+        if concurrency is not None:
+            self.concurrency = concurrency
+        self.loop = Loop()
+        client = self._client
+        self._client = AsyncClient(self.loop, pool_size=self.concurrency,
+            connect_timeout=client.connect_timeout,
+            read_timeout=client.read_timeout, cassette=client.cassette)
+        self._semaphore = Semaphore(self.concurrency)
+        # The login under way; used on the loop thread only.
+        self._signing_in = None
+        self._tasks = set()
+        self._tasks_lock = threading.Lock()
+        self.loop.Start()
+
+    def Close(self):
+        """Waits for the pending calls, stops the loop and closes the
+        connections.
+        """
+        with self._tasks_lock:
+            tasks = list(self._tasks)
+        for task in tasks:
+            task.Wait()
+        self.loop.Stop()
+        self._client.Close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.Close()
+
+    def Stats(self):
+        """Stats of the semaphore the requests wait on (see
+        eventloop.Semaphore.Stats).
+        """
+        return self._semaphore.Stats()
+
+    # Futures of the calls made by a public method are collected in
+    # _local.issued while it runs.
+
+    def _Issue(self, future):
+        issued = getattr(self._local, 'issued', None)
+        if issued:
+            issued[-1].append(future)
+        return future
+
+    def _Track(self, task):
+        with self._tasks_lock:
+            self._tasks.add(task)
+        task.AddCallback(self._Untrack)
+        return task
+
+    def _Untrack(self, task):
+        with self._tasks_lock:
+            self._tasks.discard(task)
+
+    # Coroutines of the request path; they run on the loop and are named
+    # after the Megaplan methods they replace.
+
+    def _SignIn(self, coroutine):
+        """The Task of the login under way, or of coroutine started as one:
+        the calls that need credentials wait for a single login.
+        """
+        task = self._signing_in
+        if task is None:
+            task = self._signing_in = Task(self.loop, coroutine)
+            task.AddCallback(self._SignedIn)
+        return task
+
+    def _SignedIn(self, task):
+        self._signing_in = None
+
+    def _LoggedIn(self, coroutine):
+        if not all(self._credentials):
+            yield self._SignIn(self._Authenticate())
+        raise Return((yield coroutine))
+
+    def _Authorize(self):
+        uri = self.AUTHORIZE + 'authorize.api'
+        md5pass = md5.new(self.Password).hexdigest()
+        params = {'Login': self.Login, 'Password': md5pass}
+        response = yield self._Open(uri, self._EncodeParams(params))
+        self._AuthorizeHandle(response.read())
+
+        if self.token_store is not None:
+            self.token_store.Set(self._TokenKey, list(self._credentials[:2]))
+
+    def _Authenticate(self):
+        if self.token_store is not None:
+            token = self.token_store.Get(self._TokenKey)
+            if token:
+                self._SetCredentials(*token)
+                return
+        yield self._Authorize()
+
+    def _Reauthorize(self, stale):
+        """Waits for the login under way or starts one if the credentials
+        are still stale, as Megaplan._Reauthorize does under its lock.
+        """
+        if self._signing_in is None and self._credentials is not stale:
+            return
+        yield self._SignIn(self._Relogin(stale))
+
+    def _Relogin(self, stale):
+        if self.token_store is not None:
+            stale_token = list(stale[:2])
+            token = self.token_store.Get(self._TokenKey)
+            if token and token != stale_token:
+                self._SetCredentials(*token)
+                return
+            self.token_store.Delete(self._TokenKey, stale_token)
+        yield self._Authorize()
+
+    def _Open(self, uri, body='', headers={}, timeout=None, trace=None,
+        stream=False):
+        """Waits for the rate limiter and a free slot of the concurrency;
+        the slot is given back once the body has been read.
+        """
+        started = time.time()
+        rate_limiter = self.rate_limiter
+        if rate_limiter is not None:
+            delay = rate_limiter.Reserve()
+            if timeout is not None and delay >= timeout:
+                raise _Overdue('The rate limiter holds the request for '
+                    '{0:.3f}s, past the deadline'.format(delay))
+            if delay > 0:
+                yield Sleep(self.loop, delay)
+        yield self._semaphore.Acquire()
+        if timeout is not None:
+            timeout -= time.time() - started
+            if timeout <= 0:
+                self._semaphore.Release()
+                raise _Overdue('No request slot is free before the deadline')
+        try:
+            response = yield self._client.Open(self._MPQuery.format(uri=uri),
+                params=body, headers=headers, timeout=timeout, trace=trace,
+                stream=stream)
+        except Exception:
+            self._semaphore.Release()
+            raise
+        finished = getattr(response, 'finished', None)
+        if finished is None:
+            # Served by a cassette.
+            self._semaphore.Release()
+        else:
+            finished.AddCallback(lambda future: self._semaphore.Release())
+        if rate_limiter is not None:
+            rate_limiter.Feedback(response.status,
+                response.getheader('retry-after'))
+        raise Return(response)
+
+    def _Call(self, uri, body='', timeout=None, credentials=None,
+        stream=False, trace=None):
+        # Signed here so that every attempt carries a fresh Date.
+        if trace is None:
+            headers = self._GetHeaders(uri, body, credentials)
+        else:
+            trace.attempts += 1
+            started = time.time()
+            headers = self._GetHeaders(uri, body, credentials)
+            trace.Add('sign', time.time() - started)
+        response = yield self._Open(uri, body, headers, timeout, trace,
+            stream)
+        if response.status in self._ErrorStatus:
+            self._data = response.read()
+            raise ClientError(
+                '{0} {1}'.format(response.status, response.reason),
+                response.status)
+        if stream:
+            raise Return(response)
+        raise Return(response.read())
+
+    def _Fetch(self, uri, body='', stream=False, trace=None):
+        retry = self.retry
+        if retry is not None and not retry.IsRetryable(uri, body):
+            retry = None
+        deadline = self.deadline
+
+        started = time.time()
+        attempt = 0
+        reauthorized = False
+        while True:
+            attempt += 1
+            timeout = None
+            if deadline is not None:
+                timeout = started + deadline - time.time()
+            credentials = self._credentials
+            try:
+                result = yield self._Call(uri, body, timeout, credentials,
+                    stream, trace)
+                raise Return(result)
+            except (socket.error, httplib.HTTPException, ClientError) as e:
+                elapsed = time.time() - started
+                if deadline is not None and (elapsed >= deadline or
+                    isinstance(e, _Overdue)):
+                    raise DeadlineExceeded(deadline, elapsed, e)
+                if isinstance(e, ClientError) and e.status == 401 and \
+                    not reauthorized:
+                    reauthorized = True
+                    if trace is not None:
+                        trace.reauthorized = True
+                    yield self._Reauthorize(credentials)
+                    continue
+                if retry is None or (isinstance(e, ClientError) and
+                    e.status not in retry.STATUSES):
+                    raise
+                delay = retry.Next(attempt, started)
+                if delay is None:
+                    raise
+                if deadline is not None and elapsed + delay >= deadline:
+                    raise DeadlineExceeded(deadline, elapsed, e)
+            yield Sleep(self.loop, delay)
+
+    def _Load(self, uri, trace=None, generation=None):
+        data = yield self._Fetch(uri, trace=trace)
+        obj = self._Decode(data, trace)
+        if self.cache is not None:
+            self.cache.Set(uri, data, generation)
+        raise Return(obj)
+
+    def _Get(self, uri, trace=None):
+        cache = self.cache
+        generation = None
+        if cache is not None:
+            data = cache.Get(uri)
+            if data is not None:
+                if trace is not None:
+                    trace.source = 'cache'
+                raise Return(self._Decode(data, trace))
+            generation = cache.Generation(uri)
+
+        single_flight = self.single_flight
+        if single_flight is None:
+            raise Return((yield self._Load(uri, trace, generation)))
+        # A call made after a write does not join one made before it.
+        raise Return((yield single_flight.Join((uri, generation),
+            lambda: Task(self.loop, self._Load(uri, trace, generation)))))
+
+    def _Request(self, uri, body='', trace=None):
+        if not body:
+            raise Return((yield self._Get(uri, trace)))
+
+        try:
+            data = yield self._Fetch(uri, body, trace=trace)
+            raise Return(self._Decode(data, trace))
+        finally:
+            if self.cache is not None:
+                self.cache.Written(uri)
+
+    def _Traced(self, uri, body):
+        trace = self._Trace(uri, body)
+        try:
+            obj = yield self._Request(uri, body, trace)
+        except Exception as e:
+            error = sys.exc_info()
+            self._Finish(trace, e)
+            raise error[0], error[1], error[2]
+        self._Finish(trace)
+        raise Return(obj)
+
+    def _GetBody(self, uri, trace=None):
+        return self._LoggedIn(self._Fetch(uri, trace=trace))
+
+    # Megaplan methods called by the public ones.
+
+    def _GetData(self, uri, params={}):
+        """Starts the call on the loop; returns its Task.
+        """
+        body = self._EncodeParams(params)
+        task = Task(self.loop, self._LoggedIn(self._Traced(uri, body)))
+        return self._Issue(self._Track(task))
+
+    def _Map(self, func, args, max_workers=None):
+        """Returns a Future of the list of BatchItem of func(arg) for every
+        arg. The calls are made together, as many at a time as the
+        concurrency allows; max_workers is not used.
+        """
+        def call(arg):
+            item = Future()
+
+            def done(future):
+                if future._error is not None:
+                    item.SetResult(BatchItem(arg, Error=future._error[1]))
+                else:
+                    item.SetResult(BatchItem(arg, future._result))
+
+            func(arg).AddCallback(done)
+            return item
+
+        return Gather([call(arg) for arg in args])
+
+    def _Prefetch(self, uri, trace=None):
+        return Task(self.loop, self._GetBody(uri, trace))
+
+    def _Stream(self, uri, key):
+        trace = self._Trace(uri)
+        error = None
+        try:
+            response = Task(self.loop, self._LoggedIn(self._Fetch(uri,
+                stream=True, trace=trace))).Get()
+            try:
+                for item in self._IterItems(response.IterChunks(), key,
+                    trace):
+                    yield item
+            finally:
+                response.Close()
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._Finish(trace, error)
+
+
+def _async_method(name):
+    func = getattr(Megaplan, name).im_func
+
+    def method(self, *args, **kwargs):
+        if not hasattr(self._local, 'issued'):
+            self._local.issued = []
+        issued = []
+        self._local.issued.append(issued)
+        try:
+            result = func(self, *args, **kwargs)
+        except Exception:
+            result = Future()
+            result.SetError()
+        finally:
+            self._local.issued.pop()
+        if not isinstance(result, Future):
+            # TaskEdit and the like return nothing; the Future is done
+            # once their requests are.
+            result = _AllDone(issued)
+        return self._Issue(result)
+
+    method.__name__ = name
+    method.__doc__ = func.__doc__
+    return method
+
+
+for _name, _value in vars(Megaplan).items():
+    if _name.startswith('_') or not callable(_value) or \
+        _name == 'GetData' or _name.startswith('Iter'):
+        continue
+    setattr(AsyncMegaplan, _name, _async_method(_name))
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,759 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        asyncclient
+# Purpose:     Non-blocking HTTP/1.1 transport on an eventloop.Loop
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import errno
+import httplib
+import os
+import Queue
+import socket
+import ssl
+import sys
+import threading
+import time
+from urlparse import urlparse
+from urllib import urlencode
+
+from client import APIClient, Decoder
+from eventloop import Future
+
+
+_WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINPROGRESS,
+    errno.EALREADY, getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK))
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _Error(error):
+    return (type(error), error, None)
+
+
+class AsyncResponse(object):
+    """An HTTP response read by the loop; has the interface of
+    client.Response.
+
+    Unless it is streamed the body has been read (and decoded) before the
+    response is handed out. A streamed body is queued by the loop as it
+    arrives and IterChunks() takes it on the reading thread; the loop
+    stops reading from the socket while more than
+    AsyncClient.stream_buffer bytes wait in the queue. finished is a Future
+    done once the connection has been let go; reusable tells whether it
+    went back to the pool.
+    """
+    def __init__(self, connection, status, reason, headers, will_close,
+        stream):
+        self._connection = connection
+        self._headers = headers
+        self._decoder = Decoder(headers.get('content-encoding', ''))
+        self.status = status
+        self.reason = reason
+        self.will_close = will_close
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.finished = Future()
+        self.reusable = False
+        self._chunks = []
+        self._queue = Queue.Queue() if stream else None
+        # Guards _queued and connection.paused, which the loop and the
+        # reading thread both change.
+        self._lock = threading.Lock()
+        self._queued = 0
+
+    def getheader(self, name, default=None):
+        return self._headers.get(name.lower(), default)
+
+    # Loop side
+
+    def _Put(self, data):
+        """Queues a decoded chunk; True if the reader has fallen so far
+        behind that the connection is paused.
+        """
+        connection = self._connection
+        with self._lock:
+            self._queued += len(data)
+            if self._queued > connection.client.stream_buffer:
+                connection.paused = True
+        self._queue.put(data)
+        return connection.paused
+
+    def _Feed(self, data):
+        self.wire_bytes += len(data)
+        data = self._decoder.Decompress(data)
+        if not data:
+            return False
+        self.decoded_bytes += len(data)
+        if self._queue is None:
+            self._chunks.append(data)
+            return False
+        return self._Put(data)
+
+    def _Flush(self):
+        data = self._decoder.Flush()
+        if data:
+            self.decoded_bytes += len(data)
+            if self._queue is None:
+                self._chunks.append(data)
+            else:
+                self._Put(data)
+
+    def _End(self):
+        if self._queue is not None:
+            self._queue.put(None)
+
+    def _Fail(self, exc_info):
+        if self._queue is not None:
+            self._queue.put(exc_info)
+
+    # Reader side
+
+    def Close(self):
+        """Drops the connection if the body has not been read to the end.
+        """
+        if not self.finished.Done():
+            connection = self._connection
+            connection.client.loop.CallSoon(connection._Abort, self)
+
+    def IterChunks(self, size=None):
+        """Yields decoded chunks of the body as they arrive.
+        """
+        if self._queue is None:
+            for data in self._chunks:
+                yield data
+            return
+        connection = self._connection
+        low = connection.client.stream_buffer // 2
+        while True:
+            data = self._queue.get()
+            if data is None:
+                return
+            if isinstance(data, tuple):
+                raise data[0], data[1], data[2]
+            with self._lock:
+                self._queued -= len(data)
+                resume = connection.paused and self._queued <= low
+                if resume:
+                    connection.paused = False
+            if resume:
+                connection.client.loop.CallSoon(connection._Resume, self)
+            yield data
+
+    def read(self):
+        return ''.join(self.IterChunks())
+
+
+class AsyncHTTPConnection(object):
+    """A non-blocking HTTP/1.1 connection of an AsyncClient; carries one
+    request at a time and runs on the loop thread.
+
+    client.ConnectionPool keeps it between requests as it keeps httplib
+    connections: sock is None until the connection is made, close() drops
+    it. connect_time and tls_time are the seconds the last connect took,
+    ttfb_time and read_time those of the response.
+    """
+    def __init__(self, client, scheme, host, port):
+        self.client = client
+        self.scheme = scheme
+        self.host = host
+        self.port = port or DEFAULT_PORTS[scheme]
+        self.sock = None
+        self.connect_time = self.tls_time = 0.0
+        self.ttfb_time = self.read_time = 0.0
+        self.paused = False
+        self._fd = None
+        self._timer = None
+        self._future = None
+        self._response = None
+
+    @property
+    def _loop(self):
+        return self.client.loop
+
+    def _Unwatch(self):
+        if self._fd is not None:
+            self._loop.RemoveReader(self._fd)
+            self._loop.RemoveWriter(self._fd)
+
+    def close(self):
+        self._Unwatch()
+        if self._timer is not None:
+            self._timer.Cancel()
+            self._timer = None
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except socket.error:
+                pass
+        self.sock = None
+        self._fd = None
+
+    # Timeouts
+
+    def _Limit(self, seconds):
+        """Fails the request once it makes no progress for seconds (None -
+        no limit) or runs past its expiry.
+        """
+        self._limit = seconds
+        self._progress = time.time()
+        if self._timer is not None:
+            self._timer.Cancel()
+        self._Arm()
+
+    def _Arm(self):
+        self._timer = None
+        due = self._expires
+        if self._limit is not None:
+            idle = self._progress + self._limit
+            due = idle if due is None else min(due, idle)
+        if due is not None:
+            self._timer = self._loop.CallLater(max(due - time.time(), 0),
+                self._Check)
+
+    def _Check(self):
+        self._timer = None
+        if self._future is None:
+            return
+        now = time.time()
+        if (self._expires is not None and now >= self._expires) or (
+            self._limit is not None and now - self._progress >= self._limit):
+            self._Fail(_Error(socket.timeout('timed out')))
+            return
+        self._Arm()
+
+    # Request
+
+    def Request(self, method, query, body, headers, timeout=None,
+        stream=False):
+        """Sends the request; returns a Future of the AsyncResponse. It is
+        done once the headers have arrived if a 2xx response is streamed,
+        once the whole body has otherwise. timeout caps the whole
+        exchange; connect_timeout and read_timeout of the client limit
+        the waits for the connection and for each piece of the response.
+        """
+        self._future = future = Future()
+        try:
+            self._Start(method, query, body, headers, timeout, stream)
+        except Exception:
+            self._Fail(sys.exc_info())
+        return future
+
+    def _Start(self, method, query, body, headers, timeout, stream):
+        self._method = method
+        self._stream = stream
+        self._expires = None if timeout is None else \
+            time.time() + max(timeout, 0.001)
+        self._limit = None
+        self._response = None
+        self._buf = ''
+        self._state = 'status'
+        self.paused = False
+        self.connect_time = self.tls_time = 0.0
+        self.ttfb_time = self.read_time = 0.0
+
+        lines = ['{0} {1} HTTP/1.1'.format(method, query)]
+        host = self.host
+        if self.port != DEFAULT_PORTS[self.scheme]:
+            host = '{0}:{1}'.format(host, self.port)
+        lines.append('Host: {0}'.format(host))
+        for name, value in headers.iteritems():
+            lines.append('{0}: {1}'.format(name, value))
+        if body:
+            if 'Content-type' not in headers:
+                lines.append(
+                    'Content-type: application/x-www-form-urlencoded')
+            if 'Content-length' not in headers:
+                lines.append('Content-length: {0}'.format(len(body)))
+        # Headers and body go out in one write, as APIClient sends them.
+        self._out = '\r\n'.join(lines) + '\r\n\r\n' + body
+        self._sent = 0
+        if self.sock is None:
+            self._Limit(self.client.connect_timeout)
+            future = self._future
+            self.client._resolve(self.host, self.port).AddCallback(
+                lambda resolved: self._Resolved(future, resolved))
+        else:
+            self._Send()
+
+    def _Resolved(self, future, resolved):
+        if self._future is not future:
+            # Timed out while resolving.
+            return
+        if resolved._error is not None:
+            self._Fail(resolved._error)
+            return
+        self._addresses = list(resolved._result)
+        try:
+            self._Connect()
+        except Exception:
+            self._Fail(sys.exc_info())
+
+    def _Connect(self):
+        family, socktype, proto, _, address = self._addresses.pop(0)
+        self.sock = socket.socket(family, socktype, proto)
+        self.sock.setblocking(0)
+        self._fd = self.sock.fileno()
+        self._connect_started = time.time()
+        error = self.sock.connect_ex(address)
+        if error and error not in _WOULD_BLOCK:
+            raise socket.error(error, os.strerror(error))
+        self._loop.AddWriter(self._fd, self._Connected)
+        self._Limit(self.client.connect_timeout)
+
+    def _Connected(self):
+        self._loop.RemoveWriter(self._fd)
+        error = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        try:
+            if error:
+                if not self._addresses:
+                    raise socket.error(error, os.strerror(error))
+                # The next address of the host, as socket.create_connection
+                # tries them.
+                self.close()
+                self._Connect()
+                return
+            connected = time.time()
+            self.connect_time = connected - self._connect_started
+            if self.scheme != 'https':
+                self._Send()
+                return
+            # The context httplib.HTTPSConnection uses.
+            context = ssl._create_default_https_context()
+            self.sock = context.wrap_socket(self.sock,
+                server_hostname=self.host, do_handshake_on_connect=False)
+            self._tls_started = connected
+        except Exception:
+            self._Fail(sys.exc_info())
+            return
+        self._Handshake()
+
+    def _Handshake(self):
+        self._Unwatch()
+        try:
+            self.sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self._loop.AddReader(self._fd, self._Handshake)
+            return
+        except ssl.SSLWantWriteError:
+            self._loop.AddWriter(self._fd, self._Handshake)
+            return
+        except Exception:
+            self._Fail(sys.exc_info())
+            return
+        self.tls_time = time.time() - self._tls_started
+        self._Send()
+
+    def _Send(self):
+        self._sending = time.time()
+        self._Limit(self.client.read_timeout)
+        self._Write()
+
+    def _Write(self):
+        try:
+            while self._sent < len(self._out):
+                self._sent += self.sock.send(self._out[self._sent:])
+                self._progress = time.time()
+        except (ssl.SSLWantWriteError, ssl.SSLWantReadError):
+            pass
+        except socket.error as e:
+            if e.args[0] not in _WOULD_BLOCK:
+                self._Fail(sys.exc_info())
+                return
+        if self._sent < len(self._out):
+            self._loop.AddWriter(self._fd, self._Write)
+            return
+        self._loop.RemoveWriter(self._fd)
+        self._out = ''
+        self._loop.AddReader(self._fd, self._Read)
+
+    def _Read(self):
+        while self._future is not None and not self.paused:
+            try:
+                data = self.sock.recv(65536)
+            except ssl.SSLWantReadError:
+                return
+            except socket.error as e:
+                if e.args[0] not in _WOULD_BLOCK:
+                    self._Fail(sys.exc_info())
+                return
+            self._progress = time.time()
+            if not data:
+                self._Eof()
+                return
+            self._buf += data
+            try:
+                self._Parse()
+            except Exception:
+                self._Fail(sys.exc_info())
+                return
+
+    # Response
+
+    def _Line(self):
+        i = self._buf.find('\r\n')
+        if i < 0:
+            return None
+        line, self._buf = self._buf[:i], self._buf[i + 2:]
+        return line
+
+    def _Parse(self):
+        while self._future is not None and not self.paused:
+            state = self._state
+            if state == 'status':
+                line = self._Line()
+                if line is None:
+                    return
+                parts = line.split(None, 2)
+                if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+                    raise httplib.BadStatusLine(line)
+                self._version = parts[0]
+                self._status = int(parts[1])
+                self._reason = parts[2] if len(parts) > 2 else ''
+                self._headers = {}
+                self._last = None
+                self._state = 'headers'
+            elif state == 'headers':
+                line = self._Line()
+                if line is None:
+                    return
+                if line:
+                    self._Header(line)
+                else:
+                    self._Headers()
+            elif state == 'body':
+                if not self._buf:
+                    return
+                data = self._buf
+                if self._length is not None:
+                    data = data[:self._length]
+                    self._length -= len(data)
+                self._buf = self._buf[len(data):]
+                self._Body(data)
+                if self._length == 0:
+                    self._Done()
+            elif state == 'size':
+                line = self._Line()
+                if line is None:
+                    return
+                self._length = int(line.split(';', 1)[0].strip(), 16)
+                self._state = 'chunk' if self._length else 'trailer'
+            elif state == 'chunk':
+                if not self._buf:
+                    return
+                data = self._buf[:self._length]
+                self._buf = self._buf[len(data):]
+                self._length -= len(data)
+                if not self._length:
+                    self._state = 'chunk end'
+                self._Body(data)
+            elif state == 'chunk end':
+                if self._Line() is None:
+                    return
+                self._state = 'size'
+            elif state == 'trailer':
+                line = self._Line()
+                if line is None:
+                    return
+                if not line:
+                    self._Done()
+
+    def _Header(self, line):
+        if line[0] in ' \t' and self._last is not None:
+            self._headers[self._last] += ' ' + line.strip()
+            return
+        name, _, value = line.partition(':')
+        name, value = name.strip().lower(), value.strip()
+        if name in self._headers:
+            value = self._headers[name] + ', ' + value
+        self._headers[name] = value
+        self._last = name
+
+    def _Headers(self):
+        status, headers = self._status, self._headers
+        if 100 <= status < 200:
+            # 100 Continue and the like come before the response itself.
+            self._state = 'status'
+            return
+        connection = headers.get('connection', '').lower()
+        will_close = 'close' in connection or (
+            self._version == 'HTTP/1.0' and 'keep-alive' not in connection)
+        self._length = None
+        if status in (204, 304) or self._method == 'HEAD':
+            self._length = 0
+            self._state = 'body'
+        elif 'chunked' in headers.get('transfer-encoding', '').lower():
+            self._state = 'size'
+        else:
+            self._state = 'body'
+            length = headers.get('content-length')
+            if length is not None:
+                self._length = int(length)
+            else:
+                # The body ends with the connection.
+                will_close = True
+        # Error responses are short and read whole even when streaming.
+        self._response = AsyncResponse(self, status, self._reason, headers,
+            will_close, self._stream and 200 <= status < 300)
+        self._headers_received = time.time()
+        self.ttfb_time = self._headers_received - self._sending
+        if self._response._queue is not None:
+            self._future.SetResult(self._response)
+        if self._length == 0:
+            self._Done()
+
+    def _Body(self, data):
+        if self._response._Feed(data):
+            self._Pause()
+
+    def _Eof(self):
+        if self._state == 'body' and self._length is None:
+            self._Done()
+        elif self._response is None:
+            self._Fail(_Error(httplib.BadStatusLine(self._buf or "''")))
+        else:
+            self._Fail(_Error(httplib.IncompleteRead('')))
+
+    def _Done(self):
+        response, future = self._response, self._future
+        self._future = None
+        self._Unwatch()
+        if self._timer is not None:
+            self._timer.Cancel()
+            self._timer = None
+        self.read_time = time.time() - self._headers_received
+        try:
+            response._Flush()
+        except Exception:
+            self._future = future
+            self._Fail(sys.exc_info())
+            return
+        response.reusable = not response.will_close and not self._buf
+        # The connection is back in the pool before the reader sees the end.
+        response.finished.SetResult(None)
+        response._End()
+        future.SetResult(response)
+
+    def _Fail(self, exc_info):
+        """Ends the request with the exception of exc_info.
+        """
+        future, response = self._future, self._response
+        if future is None:
+            return
+        self._future = None
+        self.close()
+        if response is not None:
+            response.finished.SetResult(None)
+            response._Fail(exc_info)
+        # Nothing happens if the (streamed) response is out already.
+        future.SetError(exc_info)
+
+    # Streaming
+
+    def _Pause(self):
+        self._loop.RemoveReader(self._fd)
+        # A slow reader is not the server's fault; the expiry still holds.
+        self._limit = None
+
+    def _Resume(self, response):
+        if self.paused or self._response is not response or \
+            self._future is None:
+            return
+        self._Limit(self.client.read_timeout)
+        try:
+            self._Parse()
+        except Exception:
+            self._Fail(sys.exc_info())
+            return
+        if self._future is not None and not self.paused:
+            self._loop.AddReader(self._fd, self._Read)
+            # TLS may hold data already taken off the socket.
+            self._Read()
+
+    def _Abort(self, response):
+        if self._response is response:
+            self._Fail(_Error(socket.error('The response was closed unread')))
+
+
+class AsyncClient(APIClient):
+    """APIClient whose requests run on an eventloop.Loop: Open() returns a
+    Future of the response at once, and no thread waits on a socket.
+
+    Connections are non-blocking sockets (TLS included) kept alive in a
+    client.ConnectionPool per (scheme, host, port), as APIClient keeps
+    them, and a GET that fails on a reused one is sent once more on a new
+    one. Host names are resolved on a thread of their own, so a slow DNS
+    server holds up no other request, and remembered for dns_ttl seconds.
+    """
+    dns_ttl = 300.0
+    # Bytes of a streamed body read ahead of its reader.
+    stream_buffer = 262144
+
+    def __init__(self, loop, **kwargs):
+        super(AsyncClient, self).__init__(**kwargs)
+        self.loop = loop
+        # Loop thread only: (host, port): (addresses, expiry) and the
+        # Futures of the lookups under way.
+        self._addresses = {}
+        self._resolving = {}
+
+    def _new_connection(self, scheme, host, port):
+        return AsyncHTTPConnection(self, scheme, host, port)
+
+    def _lookup(self, host, port):
+        return socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+
+    def _resolve(self, host, port):
+        """Returns a Future of the addresses of host, done on the loop
+        thread.
+        """
+        key = (host, port)
+        entry = self._addresses.get(key)
+        if entry is None or entry[1] < time.time():
+            try:
+                # An IP address is not looked up.
+                entry = (socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM,
+                    0, socket.AI_NUMERICHOST), float('inf'))
+                self._addresses[key] = entry
+            except socket.gaierror:
+                entry = None
+        if entry is not None:
+            future = Future()
+            future.SetResult(entry[0])
+            return future
+        future = self._resolving.get(key)
+        if future is None:
+            future = self._resolving[key] = Future()
+            thread = threading.Thread(target=self._resolve_thread,
+                args=(future, host, port), name='megaplanpy-resolver')
+            thread.daemon = True
+            thread.start()
+        return future
+
+    def _resolve_thread(self, future, host, port):
+        try:
+            addresses, error = self._lookup(host, port), None
+        except Exception:
+            addresses, error = None, sys.exc_info()
+        self.loop.CallSoon(self._resolved, future, host, port, addresses,
+            error)
+
+    def _resolved(self, future, host, port, addresses, error):
+        del self._resolving[(host, port)]
+        if error is None:
+            self._addresses[(host, port)] = (addresses,
+                time.time() + self.dns_ttl)
+        future._Complete(addresses, error)
+
+    def Open(self, url, params={}, headers={}, timeout=None, trace=None,
+        stream=False):
+        """Sends the request on the loop; returns a Future of the
+        AsyncResponse.
+
+        The arguments are those of APIClient.Open. With stream the Future
+        of a 2xx response is done once its headers have arrived and its
+        body is read by iterating it; otherwise the body has been read
+        when the Future is done. A cassette answers at once.
+        """
+        if not headers:
+            headers = self.HEADERS
+        if params and not isinstance(params, basestring):
+            params = urlencode(params)
+        params = params or ''
+
+        future = Future()
+        cassette = self.cassette
+        if cassette is not None and cassette.replaying:
+            try:
+                future.SetResult(cassette.Play(url, params, trace))
+            except Exception:
+                future.SetError()
+            return future
+        self.loop.CallSoon(self._start, future, url, params, headers,
+            timeout, trace, stream and cassette is None)
+        return future
+
+    def _start(self, future, url, params, headers, timeout, trace, stream):
+        try:
+            uri = urlparse(url)
+            pool = self._get_pool(uri)
+        except Exception:
+            future.SetError()
+            return
+        query = uri.path
+        if uri.query:
+            query += '?{0}'.format(uri.query)
+        method = 'POST' if params else 'GET'
+        if trace is not None:
+            trace.request_bytes += len(params)
+        started = time.time()
+
+        def send(connection, reused):
+            connection.Request(method, query, params, headers, timeout,
+                stream).AddCallback(
+                lambda request: sent(request, connection, reused))
+
+        def sent(request, connection, reused):
+            if request._error is not None:
+                error = request._error[1]
+                if reused and not params and connection._response is None \
+                    and not isinstance(error, socket.timeout):
+                    # The server may close a keep-alive connection at any
+                    # time, so a GET is sent once more on a fresh socket.
+                    send(pool.Reconnect(connection), False)
+                    return
+                pool.Release(connection, False)
+                future._Complete(None, request._error)
+                return
+            response = request._result
+            response.finished.AddCallback(
+                lambda finished: self._finish(pool, connection, response,
+                trace))
+            if trace is not None:
+                connect, tls = connection.connect_time, connection.tls_time
+                trace.Add('connect', connect)
+                trace.Add('tls', tls)
+                trace.Add('ttfb', connection.ttfb_time)
+                trace.status = response.status
+            if self.cassette is not None:
+                try:
+                    response = self.cassette.Record(url, params, response,
+                        started)
+                except Exception:
+                    future.SetError()
+                    return
+            future.SetResult(response)
+
+        send(*pool.Acquire())
+
+    def _finish(self, pool, connection, response, trace):
+        pool.Release(connection, response.reusable)
+        self._count_bytes(response.wire_bytes, response.decoded_bytes)
+        if trace is not None:
+            trace.Add('read', connection.read_time)
+            trace.response_bytes += response.wire_bytes
+
+    def Request(self, url, params={}, headers={}):
+        """Returns a Future of the response body.
+        """
+        body = Future()
+
+        def done(future):
+            if future._error is not None:
+                body._Complete(None, future._error)
+            else:
+                body.SetResult(future._result.read())
+
+        self.Open(url, params, headers).AddCallback(done)
+        return body
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
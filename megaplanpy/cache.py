@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        cache
+# Purpose:     Response cache for rarely changing API data
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache(object):
+    """LRU cache of GET response bodies with a time to live per endpoint.
+
+    ttl maps an endpoint (URI path without the query) to the seconds its
+    responses are kept; other endpoints are never cached. invalidates maps
+    a URI prefix to the prefixes whose entries a POST under it drops. At
+    most maxsize responses are kept, the least recently used go first.
+
+    Every invalidation bumps the generation of its prefix. A response
+    fetched while its URI was invalidated may predate the write, so Set()
+    drops it when given the Generation() read before the request.
+    """
+    def __init__(self, ttl=None, invalidates=None, maxsize=256):
+        self.ttl = dict(ttl or {})
+        self.invalidates = dict(invalidates or {})
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        # prefix -> number of times it was invalidated
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0,
+            'invalidated': 0}
+
+    def TTL(self, uri):
+        return self.ttl.get(uri.split('?', 1)[0])
+
+    def Get(self, uri):
+        """Returns the cached body for uri or None.
+        """
+        if self.TTL(uri) is None:
+            return None
+        with self._lock:
+            entry = self._entries.pop(uri, None)
+            if entry is not None and entry[0] <= time.time():
+                self._stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries[uri] = entry
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def _Generation(self, uri):
+        return sum(count for prefix, count in self._generations.iteritems()
+            if uri.startswith(prefix))
+
+    def Generation(self, uri):
+        """A value that changes whenever the entries of uri are
+        invalidated.
+        """
+        with self._lock:
+            return self._Generation(uri)
+
+    def Set(self, uri, data, generation=None):
+        """Caches data for uri unless uri has been invalidated since
+        generation (see Generation()) was read.
+        """
+        ttl = self.TTL(uri)
+        if ttl is None:
+            return
+        with self._lock:
+            if generation is not None and \
+                self._Generation(uri) != generation:
+                return
+            self._entries.pop(uri, None)
+            self._entries[uri] = (time.time() + ttl, data)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evicted'] += 1
+
+    def Invalidate(self, prefix=''):
+        """Drops the entries whose URI starts with prefix (all by default).
+        """
+        with self._lock:
+            self._generations[prefix] = self._generations.get(prefix, 0) + 1
+            for uri in self._entries.keys():
+                if uri.startswith(prefix):
+                    del self._entries[uri]
+                    self._stats['invalidated'] += 1
+
+    def Written(self, uri):
+        """Drops the entries a POST to uri may have made stale.
+        """
+        for prefix, prefixes in self.invalidates.iteritems():
+            if uri.startswith(prefix):
+                for stale in prefixes:
+                    self.Invalidate(stale)
+
+    def Stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        return stats
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        cassette
+# Purpose:     Recording of API traffic and its replay without the network
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import base64
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from urlparse import urlparse
+
+
+# Request parameters and response fields whose values are not written.
+SECRET_PARAMS = ('Password',)
+SECRET_FIELDS = ('AccessId', 'SecretKey')
+MASK = '***'
+
+# Response headers kept; the body is stored decoded, so Content-Encoding
+# and the framing headers are not.
+HEADERS = ('content-type', 'retry-after')
+
+
+class CassetteMiss(Exception):
+    """A replayed request that is not in the cassette.
+    """
+
+
+def _Params(text):
+    """text (a query or a form body) with the pairs sorted and the values
+    of SECRET_PARAMS masked.
+    """
+    if not text:
+        return ''
+    pairs = []
+    for pair in text.split('&'):
+        name = pair.split('=', 1)[0]
+        if name in SECRET_PARAMS:
+            pair = '{0}={1}'.format(name, MASK)
+        pairs.append(pair)
+    return '&'.join(sorted(pairs))
+
+
+def _Gunzip(data):
+    """Decompresses every gzip member of data. The last one may lack its
+    end: the file of a cassette not closed has everything flushed but the
+    trailer.
+    """
+    chunks = []
+    while data:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks.append(decompressor.decompress(data))
+        data = decompressor.unused_data
+    return ''.join(chunks)
+
+
+_SECRET = re.compile(r'("(?:{0})"\s*:\s*")[^"]*(")'.format(
+    '|'.join(SECRET_FIELDS)))
+
+
+class Recorded(object):
+    """A response served from a cassette; has the interface of
+    client.Response.
+    """
+    chunk_size = 16384
+
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self._headers = headers
+        self._body = body
+        self.wire_bytes = self.decoded_bytes = len(body)
+
+    def getheader(self, name, default=None):
+        return self._headers.get(name.lower(), default)
+
+    def Close(self):
+        pass
+
+    def IterChunks(self, size=None):
+        size = size or self.chunk_size
+        body = self._body
+        for i in xrange(0, len(body), size):
+            yield body[i:i + size]
+
+    def read(self):
+        return self._body
+
+
+class Cassette(object):
+    """Requests and their responses kept in a file.
+
+    In 'record' mode APIClient sends every request as usual and writes it
+    with the decoded response to path, one JSON object per line (gzipped
+    if path ends with .gz). In 'replay' mode the responses are served from
+    path and nothing goes to the network; a request that was not recorded
+    raises CassetteMiss. mode None - 'replay' if path exists, 'record'
+    otherwise.
+
+    Requests match on the method, path, query and body (the order of
+    parameters aside); the host and the headers - Date and X-Authorization
+    change with every request - are not compared. The same request
+    recorded several times is answered in the recorded order, the last
+    response over and over once they run out. The password is not written,
+    nor are AccessId and SecretKey of the login response. With realtime
+    a replayed response comes after the time it took when recorded.
+
+        mplan = Megaplan(account, login, password,
+            cassette=Cassette('tasks.jsonl.gz'))
+    """
+    def __init__(self, path, mode=None, realtime=False):
+        if mode is None:
+            mode = 'replay' if os.path.exists(path) else 'record'
+        if mode not in ('record', 'replay'):
+            raise ValueError('Unknown cassette mode {0!r}'.format(mode))
+        self.path = path
+        self.mode = mode
+        self.realtime = realtime
+        self._lock = threading.Lock()
+        self._file = None
+        self._written = False
+        self._entries = {}
+        self._played = {}
+        self._stats = {'recorded': 0, 'played': 0, 'misses': 0}
+        if mode == 'replay':
+            self._Load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.Close()
+
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+
+    def _Open(self, mode):
+        if self.path.endswith('.gz'):
+            return gzip.open(self.path, mode)
+        return open(self.path, mode)
+
+    def _Key(self, method, url, body):
+        uri = urlparse(url)
+        return (method, uri.path, _Params(uri.query), _Params(body))
+
+    def _Load(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if self.path.endswith('.gz'):
+            data = _Gunzip(data)
+        for line in data.splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                key = (entry['method'], entry['path'], entry['query'],
+                    entry['body'])
+                self._entries.setdefault(key, []).append(entry)
+
+    def Play(self, url, params='', trace=None):
+        """Returns the Recorded response to the request.
+        """
+        key = self._Key('POST' if params else 'GET', url, params)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self._stats['misses'] += 1
+                raise CassetteMiss('{0} {1}?{2} is not in {3}'.format(
+                    key[0], key[1], key[2], self.path))
+            played = self._played.get(key, 0)
+            self._played[key] = played + 1
+            self._stats['played'] += 1
+        entry = entries[min(played, len(entries) - 1)]
+        if 'response64' in entry:
+            body = base64.b64decode(entry['response64'])
+        else:
+            body = entry['response'].encode('utf-8')
+        if self.realtime:
+            time.sleep(entry.get('elapsed', 0.0))
+        response = Recorded(entry['status'], entry['reason'],
+            entry['headers'], body)
+        if trace is not None:
+            trace.source = 'cassette'
+            trace.status = response.status
+            trace.request_bytes += len(params)
+            trace.response_bytes += len(body)
+        return response
+
+    def Record(self, url, params, response, started):
+        """Reads response (client.Response) to the end, writes it down and
+        returns it as a Recorded one. started is the time the request was
+        sent.
+        """
+        body = response.read()
+        elapsed = time.time() - started
+        headers = dict((name, response.getheader(name)) for name in HEADERS
+            if response.getheader(name) is not None)
+        method, path, query, form = self._Key('POST' if params else 'GET',
+            url, params)
+        entry = {
+            'method': method,
+            'path': path,
+            'query': query,
+            'body': form,
+            'status': response.status,
+            'reason': response.reason,
+            'headers': headers,
+            'elapsed': round(elapsed, 6),
+        }
+        try:
+            entry['response'] = _SECRET.sub(r'\1' + MASK + r'\2',
+                body).decode('utf-8')
+        except UnicodeDecodeError:
+            entry['response64'] = base64.b64encode(body)
+        line = json.dumps(entry, separators=(',', ':'), sort_keys=True)
+        with self._lock:
+            if self._file is None:
+                # Written over at the first request, appended to after
+                # Close().
+                self._file = self._Open('ab' if self._written else 'wb')
+                self._written = True
+            self._file.write(line + '\n')
+            self._file.flush()
+            self._stats['recorded'] += 1
+        return Recorded(response.status, response.reason, headers, body)
+
+    def Close(self):
+        """Closes the file being recorded to.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def Stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,11 @@
 #-------------------------------------------------------------------------------
 
 import httplib
+import select
+import socket
+import threading
+import time
+import zlib
 from urlparse import urlparse, ParseResult
 from urllib import urlencode
 
@@ -21,6 +26,293 @@ class UnsupportedScheme(httplib.HTTPException):
     pass
 
 
+class _DeadlineSocket(object):
+    """Socket of a connection whose every recv() - the status line, the
+    headers and each piece of the body - ends by connection.expires
+    (time.time() value, None - no limit). A read timeout alone restarts
+    with every piece, so a body trickled in slowly would never time out.
+
+    httplib closes the connection as soon as it has the headers of a
+    response read until the connection closes (Connection: close,
+    HTTP/1.0); the socket is closed once the files made of it are, too,
+    as socket.socket and ssl.SSLSocket do.
+    """
+    def __init__(self, sock, connection):
+        self._sock = sock
+        self._connection = connection
+        self._makefile_refs = 0
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+    def recv(self, size):
+        expires = self._connection.expires
+        if expires is not None:
+            remaining = expires - time.time()
+            if remaining <= 0:
+                raise socket.timeout('timed out')
+            read = self._connection.read_timeout
+            self._sock.settimeout(
+                remaining if read is None else min(read, remaining))
+        return self._sock.recv(size)
+
+    def makefile(self, mode='r', bufsize=-1):
+        self._makefile_refs += 1
+        return socket._fileobject(self, mode, bufsize, close=True)
+
+    def close(self):
+        if self._makefile_refs < 1:
+            self._sock.close()
+        else:
+            self._makefile_refs -= 1
+
+
+class HTTPConnection(httplib.HTTPConnection):
+    """HTTPConnection with separate connect (timeout) and read timeouts.
+
+    connect_time and tls_time are the seconds the last connect took.
+    """
+    read_timeout = None
+    expires = None
+    connect_time = tls_time = 0.0
+
+    def connect(self):
+        started = time.time()
+        httplib.HTTPConnection.connect(self)
+        self.connect_time = time.time() - started
+        self.sock.settimeout(self.read_timeout)
+        self.sock = _DeadlineSocket(self.sock, self)
+
+
+class HTTPSConnection(httplib.HTTPSConnection):
+    """HTTPSConnection with separate connect (timeout) and read timeouts.
+
+    The TLS handshake is part of connecting.
+    """
+    read_timeout = None
+    expires = None
+    connect_time = tls_time = 0.0
+
+    def connect(self):
+        started = time.time()
+        httplib.HTTPConnection.connect(self)
+        connected = time.time()
+        if self._tunnel_host:
+            server_hostname = self._tunnel_host
+        else:
+            server_hostname = self.host
+        self.sock = self._context.wrap_socket(self.sock,
+            server_hostname=server_hostname)
+        self.connect_time = connected - started
+        self.tls_time = time.time() - connected
+        self.sock.settimeout(self.read_timeout)
+        self.sock = _DeadlineSocket(self.sock, self)
+
+
+class ConnectionPool(object):
+    """Keep-alive connections to a single (scheme, host, port).
+
+    Idle connections are kept up to maxsize and dropped after idle_timeout
+    seconds. A connection is checked before reuse: if the server has closed
+    it (or sent something unexpected) it is discarded and another one taken.
+    """
+    def __init__(self, factory, maxsize=10, idle_timeout=60.0):
+        self._factory = factory
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'stale': 0,
+            'expired': 0,
+            'discarded': 0,
+            'reconnected': 0,
+            'active': 0,
+        }
+
+    def _is_stale(self, connection):
+        sock = connection.sock
+        if sock is None:
+            return True
+        try:
+            # An idle keep-alive socket must not be readable: readable means
+            # EOF (half-closed by the server) or garbage in the stream.
+            # select() cannot watch descriptors from FD_SETSIZE on, poll()
+            # can.
+            if hasattr(select, 'poll'):
+                poller = select.poll()
+                poller.register(sock, select.POLLIN)
+                readable = poller.poll(0)
+            else:
+                readable, _, _ = select.select([sock], [], [], 0)
+        except (select.error, socket.error, ValueError):
+            return True
+        return bool(readable)
+
+    def Acquire(self):
+        """Returns a (connection, reused) pair.
+        """
+        now = time.time()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    self._stats['created'] += 1
+                    self._stats['active'] += 1
+                    break
+                connection, released = self._idle.pop()
+                if self.idle_timeout and now - released > self.idle_timeout:
+                    self._stats['expired'] += 1
+                    stale = True
+                elif self._is_stale(connection):
+                    self._stats['stale'] += 1
+                    stale = True
+                else:
+                    self._stats['reused'] += 1
+                    self._stats['active'] += 1
+                    stale = False
+            if not stale:
+                return connection, True
+            connection.close()
+        return self._factory(), False
+
+    def Release(self, connection, reusable=True):
+        with self._lock:
+            self._stats['active'] -= 1
+            if reusable and connection.sock is not None and \
+                len(self._idle) < self.maxsize:
+                self._idle.append((connection, time.time()))
+                return
+            self._stats['discarded'] += 1
+        connection.close()
+
+    def Reconnect(self, connection):
+        """Replaces a broken connection with a fresh one.
+        """
+        connection.close()
+        with self._lock:
+            self._stats['reconnected'] += 1
+            self._stats['created'] += 1
+        return self._factory()
+
+    def Clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, released in idle:
+            connection.close()
+
+    def Stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = len(self._idle)
+        return stats
+
+
+class Decoder(object):
+    """Incremental decoder for the Content-Encoding of a response body.
+    """
+    def __init__(self, encoding=''):
+        self.encoding = encoding.strip().lower()
+        self._obj = None
+        if self.encoding in ('gzip', 'x-gzip'):
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == 'deflate':
+            self._obj = zlib.decompressobj()
+        self._started = False
+
+    def Decompress(self, data):
+        if self._obj is None or not data:
+            return data
+        if self._started:
+            return self._obj.decompress(data)
+        self._started = True
+        try:
+            return self._obj.decompress(data)
+        except zlib.error:
+            if self.encoding != 'deflate':
+                raise
+            # Some servers send raw deflate data without the zlib header.
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._obj.decompress(data)
+
+    def Flush(self):
+        if self._obj is None:
+            return ''
+        return self._obj.flush()
+
+
+class Response(object):
+    """An HTTP response whose body is decoded as it is read.
+
+    The pooled connection is given back once the body has been read to the
+    end (or Close() is called). wire_bytes counts the body as received,
+    decoded_bytes counts it after Content-Encoding has been removed. The
+    time spent reading and wire_bytes are added to trace, if given.
+    """
+    chunk_size = 16384
+
+    def __init__(self, client, pool, connection, response, trace=None):
+        self._client = client
+        self._pool = pool
+        self._connection = connection
+        self._response = response
+        self._decoder = Decoder(response.getheader('content-encoding', ''))
+        self._trace = trace
+        self.status = response.status
+        self.reason = response.reason
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+
+    def getheader(self, name, default=None):
+        return self._response.getheader(name, default)
+
+    def _release(self, reusable):
+        if self._connection is not None:
+            self._pool.Release(self._connection, reusable)
+            self._connection = None
+            self._client._count_bytes(self.wire_bytes, self.decoded_bytes)
+            if self._trace is not None:
+                self._trace.response_bytes += self.wire_bytes
+
+    def Close(self):
+        """Drops the connection if the body has not been read to the end.
+        """
+        self._release(False)
+
+    def IterChunks(self, size=None):
+        """Yields decoded chunks of the body as they arrive.
+        """
+        size = size or self.chunk_size
+        trace = self._trace
+        try:
+            while True:
+                if trace is None:
+                    data = self._response.read(size)
+                else:
+                    started = time.time()
+                    data = self._response.read(size)
+                    trace.Add('read', time.time() - started)
+                if not data:
+                    break
+                self.wire_bytes += len(data)
+                data = self._decoder.Decompress(data)
+                if data:
+                    self.decoded_bytes += len(data)
+                    yield data
+            data = self._decoder.Flush()
+            if data:
+                self.decoded_bytes += len(data)
+                yield data
+        except:
+            self._release(False)
+            raise
+        self._release(not self._response.will_close)
+
+    def read(self):
+        return ''.join(self.IterChunks())
+
+
 class APIClient(object):
     """
     """
@@ -30,16 +322,61 @@ class APIClient(object):
         'User-Agent': 'Mozilla/5.0 (Windows; U; Windows NT 6.0; ru; rv:1.9.1.7) Gecko/20091221 Firefox/3.5.7',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
         'Accept-Language': 'ru,en-us;q=0.7,en;q=0.3',
-        'Accept-Encoding': 'deflate',
+        'Accept-Encoding': 'gzip,deflate',
         'Accept-Charset': 'utf-8;q=0.7,*;q=0.7',
         'Keep-Alive': '300',
         'Connection': 'keep-alive'
     }
 
-    def __init__(self):
+    pool_size = 10
+    idle_timeout = 60.0
+    # Seconds to wait for a connection (TCP and TLS) and for each read from
+    # the socket; None - wait forever.
+    connect_timeout = None
+    read_timeout = None
+    # cassette.Cassette the requests are recorded to or replayed from;
+    # None - always go to the network.
+    cassette = None
+
+    def __init__(self, pool_size=None, idle_timeout=None, connect_timeout=None,
+        read_timeout=None, cassette=None):
+        self._local = threading.local()
         self.Status = int(0)
         self.Reason = str()
 
+        if pool_size is not None:
+            self.pool_size = pool_size
+        if idle_timeout is not None:
+            self.idle_timeout = idle_timeout
+        if connect_timeout is not None:
+            self.connect_timeout = connect_timeout
+        if read_timeout is not None:
+            self.read_timeout = read_timeout
+        if cassette is not None:
+            self.cassette = cassette
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+        self._bytes = {'wire': 0, 'decoded': 0}
+        self._bytes_lock = threading.Lock()
+
+    # Status and Reason describe the last Request() made by the current
+    # thread, so a client shared between threads does not mix them up.
+    @property
+    def Status(self):
+        return getattr(self._local, 'Status', 0)
+
+    @Status.setter
+    def Status(self, status):
+        self._local.Status = status
+
+    @property
+    def Reason(self):
+        return getattr(self._local, 'Reason', '')
+
+    @Reason.setter
+    def Reason(self, reason):
+        self._local.Reason = reason
+
     def _get_scheme(self, uri):
         if not uri.scheme or (uri.scheme == 'http'):
             return 'http'
@@ -61,39 +398,87 @@ class APIClient(object):
                 port = None
         return (host, port)
 
-    def _get_connection(self, uri):
+    def _new_connection(self, scheme, host, port):
         """Opens a socket connection to the server to set up an HTTP request.
+        """
+        connection = None
+        if scheme == 'https':
+            connection = HTTPSConnection(host, port=port)
+        else:
+            connection = HTTPConnection(host, port)
+        if self.debug:
+            connection.debuglevel = 1
+        return connection
+
+    def _get_pool(self, uri):
+        """Returns the connection pool for the (scheme, host, port) of uri.
 
         Args:
           uri: The full URL for the request as a Uri object.
         """
         scheme = self._get_scheme(uri)
         host, port = self._get_port(uri)
-        connection = None
-        if scheme == 'https':
-            connection = httplib.HTTPSConnection(host, port=port)
-        else:
-            connection = httplib.HTTPConnection(host, port)
-        return connection
+        key = (scheme, host, port)
+        with self._pools_lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                factory = lambda: self._new_connection(scheme, host, port)
+                pool = ConnectionPool(factory, self.pool_size,
+                    self.idle_timeout)
+                self._pools[key] = pool
+        return pool
 
-    def _http_request(self, uri, params='', headers={}):
-        if isinstance(uri, (str, unicode)):
-            uri = urlparse(uri)
-        else:
-            raise TypeError('Invalid URL')
+    def PoolStats(self):
+        """Returns {(scheme, host, port): stats} for every pool.
+        """
+        with self._pools_lock:
+            pools = self._pools.items()
+        return dict((key, pool.Stats()) for key, pool in pools)
 
-        method = 'GET'
-        if params:
-            method = 'POST'
+    def _count_bytes(self, wire, decoded):
+        with self._bytes_lock:
+            self._bytes['wire'] += wire
+            self._bytes['decoded'] += decoded
 
-        connection = self._get_connection(uri)
+    def ByteStats(self):
+        """Returns the response body sizes received so far: {'wire': bytes
+        as sent by the server, 'decoded': bytes after decompression}.
+        """
+        with self._bytes_lock:
+            return dict(self._bytes)
 
-        if self.debug:
-            connection.debuglevel = 1
+    def Close(self):
+        """Closes all idle pooled connections and the file of a cassette
+        being recorded.
+        """
+        with self._pools_lock:
+            pools = self._pools.values()
+        for pool in pools:
+            pool.Clear()
+        if self.cassette is not None:
+            self.cassette.Close()
 
-        query = uri.path
-        if uri.query:
-            query += '?{0}'.format(uri.query)
+    def _set_timeout(self, connection, timeout=None):
+        """Applies the client timeouts to connection, none of them longer
+        than timeout; reading the whole response must end within timeout
+        too.
+        """
+        connect, read = self.connect_timeout, self.read_timeout
+        if timeout is not None:
+            timeout = max(timeout, 0.001)
+            connect = timeout if connect is None else min(connect, timeout)
+            read = timeout if read is None else min(read, timeout)
+        if connect is None:
+            connect = socket._GLOBAL_DEFAULT_TIMEOUT
+        connection.timeout = connect
+        connection.read_timeout = read
+        connection.expires = None if timeout is None else \
+            time.time() + timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(read)
+
+    def _send(self, connection, method, query, params, headers, timeout):
+        self._set_timeout(connection, timeout)
         connection.putrequest(method, query)
 
         # Send the HTTP headers.
@@ -107,23 +492,96 @@ class APIClient(object):
             if 'Content-length' not in headers:
                 connection.putheader('Content-length', str(len(params)))
 
-        connection.endheaders()
+        # Headers and body go out in one write: sent apart, the body
+        # waits (Nagle) for the ACK the server delays, some 40 ms.
+        connection.endheaders(params or None)
+
+        return connection.getresponse()
+
+    def _http_request(self, uri, params='', headers={}, timeout=None,
+        trace=None):
+        if isinstance(uri, (str, unicode)):
+            uri = urlparse(uri)
+        else:
+            raise TypeError('Invalid URL')
 
+        method = 'GET'
         if params:
-            connection.send(params)
+            method = 'POST'
 
-        return connection.getresponse()
+        pool = self._get_pool(uri)
+        connection, reused = pool.Acquire()
 
-    def Request(self, url, params={}, headers={}):
-        """
+        query = uri.path
+        if uri.query:
+            query += '?{0}'.format(uri.query)
+
+        if trace is not None:
+            connection.connect_time = connection.tls_time = 0.0
+            trace.request_bytes += len(params)
+            started = time.time()
+        try:
+            try:
+                response = self._send(connection, method, query, params,
+                    headers, timeout)
+            except socket.timeout:
+                raise
+            except (socket.error, httplib.HTTPException):
+                # The server may close a keep-alive connection at any time,
+                # so a GET is sent once more on a fresh socket. A POST may
+                # have been processed before the socket was dropped: it is
+                # left to the retry policy, which repeats writes only when
+                # told to.
+                if not reused or params:
+                    raise
+                connection = pool.Reconnect(connection)
+                response = self._send(connection, method, query, params,
+                    headers, timeout)
+        except:
+            pool.Release(connection, False)
+            raise
+        if trace is not None:
+            connect, tls = connection.connect_time, connection.tls_time
+            trace.Add('connect', connect)
+            trace.Add('tls', tls)
+            trace.Add('ttfb', time.time() - started - connect - tls)
+            trace.status = response.status
+        return pool, connection, response
+
+    def Open(self, url, params={}, headers={}, timeout=None, trace=None):
+        """Sends the request and returns a Response with the body unread.
+
+        timeout caps connect_timeout and read_timeout for this request,
+        and the time to read its response.
+        trace (instrument.Trace) gets the connect, TLS, time to first byte
+        and read times, the status and the byte counts of the request.
+        With a cassette the response is recorded (and comes with the body
+        read) or replayed.
         """
         if not headers:
             headers = self.HEADERS
 
-        if params:
+        # A ready body (str) is sent as is.
+        if params and not isinstance(params, basestring):
             params = urlencode(params)
 
-        response = self._http_request(url, params, headers)
+        cassette = self.cassette
+        if cassette is not None:
+            if cassette.replaying:
+                return cassette.Play(url, params, trace)
+            started = time.time()
+
+        pool, connection, response = self._http_request(url, params, headers,
+            timeout, trace)
+        response = Response(self, pool, connection, response, trace)
+        if cassette is not None:
+            return cassette.Record(url, params, response, started)
+        return response
+
+    def Request(self, url, params={}, headers={}):
+        """
+        """
+        response = self.Open(url, params, headers)
         self.Status = response.status
         self.Reason = response.reason
 
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        coalesce
+# Purpose:     Coalescing of identical concurrent calls
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import sys
+import threading
+
+
+class _Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Runs at most one call per key at a time.
+
+    A thread that asks for a key which is already being fetched waits for
+    that call and gets the same result (or the same exception) instead of
+    making its own. Join() does the same for calls that return a future.
+    """
+    def __init__(self):
+        self._flights = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'coalesced': 0}
+
+    def Do(self, key, func):
+        with self._lock:
+            self._stats['calls'] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error[0], flight.error[1], flight.error[2]
+            return flight.result
+
+        try:
+            flight.result = func()
+            return flight.result
+        except:
+            flight.error = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def Join(self, key, start):
+        """Returns the future of the call in flight for key, or of start()
+        if there is none. start() returns an eventloop.Future; nobody waits
+        on a thread.
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            future = self._futures.get(key)
+            if future is not None:
+                self._stats['coalesced'] += 1
+                return future
+            future = self._futures[key] = start()
+        future.AddCallback(lambda done: self._Land(key, done))
+        return future
+
+    def _Land(self, key, future):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    def Stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._flights) + len(self._futures)
+        return stats
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,7 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 
-import json
+import jsonlib
 
 
 class Dict2Object(object):
@@ -20,8 +20,9 @@ class Dict2Object(object):
 
 
 class JSON2Obj(Dict2Object):
-    def __init__(self, page):
-        super(JSON2Obj, self).__init__(json.loads(page))
+    def __init__(self, page, backend=None):
+        super(JSON2Obj, self).__init__(
+            (backend or jsonlib.DEFAULT).Loads(page))
 
 
 def main():
@@ -0,0 +1,487 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        eventloop
+# Purpose:     Single-threaded event loop over poll/select with futures
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import collections
+import errno
+import heapq
+import itertools
+import math
+import select
+import socket
+import sys
+import threading
+import time
+import traceback
+import types
+
+
+class TimeoutError(Exception):
+    """Future.Get() has waited for longer than it was asked to.
+    """
+
+
+class Return(Exception):
+    """Ends a coroutine with value: a Python 2 generator cannot return one.
+    """
+    def __init__(self, value=None):
+        super(Return, self).__init__(value)
+        self.value = value
+
+
+class Future(object):
+    """Result of an operation that completes later, on any thread.
+
+    Get([timeout]) waits for the result or raises the exception of the
+    operation (get is the same, as in multiprocessing's AsyncResult).
+    AddCallback(callback) calls callback(future) once it is done, on the
+    thread that completes it.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = False
+        self._result = None
+        # exc_info of the exception the operation raised.
+        self._error = None
+        self._callbacks = []
+        self._event = None
+
+    def __repr__(self):
+        state = 'pending'
+        if self._done:
+            state = 'failed' if self._error is not None else 'done'
+        return '<{0} {1}>'.format(type(self).__name__, state)
+
+    def Done(self):
+        return self._done
+
+    def SetResult(self, result):
+        self._Complete(result, None)
+
+    def SetError(self, error=None):
+        """error is an exc_info triple (the exception being handled by
+        default).
+        """
+        self._Complete(None, error or sys.exc_info())
+
+    def _Complete(self, result, error):
+        # Only the first outcome counts: a request may time out and fail
+        # at the same moment.
+        with self._lock:
+            if self._done:
+                return
+            self._result, self._error = result, error
+            self._done = True
+            callbacks, self._callbacks = self._callbacks, None
+            event = self._event
+        if event is not None:
+            event.set()
+        for callback in callbacks:
+            callback(self)
+
+    def AddCallback(self, callback):
+        with self._lock:
+            if not self._done:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def Wait(self, timeout=None):
+        """Waits until the future is done; False if timeout ran out first.
+        """
+        with self._lock:
+            if self._done:
+                return True
+            if self._event is None:
+                self._event = threading.Event()
+            event = self._event
+        event.wait(timeout)
+        return self._done
+
+    def Get(self, timeout=None):
+        if not self.Wait(timeout):
+            raise TimeoutError('The result is not ready after {0}s'.format(
+                timeout))
+        if self._error is not None:
+            raise self._error[0], self._error[1], self._error[2]
+        return self._result
+
+    get = Get
+
+
+class Task(Future):
+    """Runs a coroutine on loop and completes with its outcome.
+
+    A coroutine is a generator that yields what it waits for: a Future,
+    another coroutine (run in place, as a call), a list of them (waited
+    for together) or None (nothing). The yield gives back the result or
+    raises the exception there; Return(value) ends the coroutine with
+    value.
+    """
+    def __init__(self, loop, coroutine):
+        super(Task, self).__init__()
+        self._loop = loop
+        self._stack = [coroutine]
+        loop.CallSoon(self._Step, None, None)
+
+    def _Step(self, value, error):
+        stack = self._stack
+        while True:
+            coroutine = stack[-1]
+            try:
+                if error is None:
+                    yielded = coroutine.send(value)
+                else:
+                    yielded = coroutine.throw(*error)
+            except (StopIteration, Return) as e:
+                value, error = getattr(e, 'value', None), None
+                stack.pop()
+                if not stack:
+                    self.SetResult(value)
+                    return
+                continue
+            except Exception:
+                value, error = None, sys.exc_info()
+                stack.pop()
+                if not stack:
+                    self.SetError(error)
+                    return
+                continue
+            if isinstance(yielded, types.GeneratorType):
+                stack.append(yielded)
+                value = error = None
+                continue
+            future = self._loop.Wrap(yielded)
+            if future.Done():
+                value, error = future._result, future._error
+                continue
+            future.AddCallback(self._Wake)
+            return
+
+    def _Wake(self, future):
+        self._loop.CallSoon(self._Step, future._result, future._error)
+
+
+def Gather(futures):
+    """A Future of the list of results of futures, failed with the first
+    exception among them.
+    """
+    futures = list(futures)
+    gathered = Future()
+    if not futures:
+        gathered.SetResult([])
+        return gathered
+    lock = threading.Lock()
+    pending = [len(futures)]
+
+    def done(future):
+        if future._error is not None:
+            gathered._Complete(None, future._error)
+        with lock:
+            pending[0] -= 1
+            last = not pending[0]
+        if last:
+            gathered._Complete([future._result for future in futures], None)
+
+    for future in futures:
+        future.AddCallback(done)
+    return gathered
+
+
+class Timer(object):
+    __slots__ = ('when', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def Cancel(self):
+        self.cancelled = True
+
+
+class Semaphore(object):
+    """Bounds the operations in flight without blocking a thread.
+
+    Acquire() returns a Future that is done once one of `value` slots is
+    taken; Release() gives the slot to the next one waiting.
+    """
+    def __init__(self, value):
+        self.value = value
+        self._lock = threading.Lock()
+        self._free = value
+        self._waiters = collections.deque()
+        self._stats = {'acquired': 0, 'waited': 0, 'peak': 0}
+
+    def Acquire(self):
+        future = Future()
+        with self._lock:
+            self._stats['acquired'] += 1
+            if self._free <= 0:
+                self._stats['waited'] += 1
+                self._waiters.append(future)
+                return future
+            self._free -= 1
+            self._Peak()
+        future.SetResult(None)
+        return future
+
+    def _Peak(self):
+        self._stats['peak'] = max(self._stats['peak'],
+            self.value - self._free)
+
+    def Release(self):
+        with self._lock:
+            if not self._waiters:
+                self._free += 1
+                return
+            future = self._waiters.popleft()
+        future.SetResult(None)
+
+    def Stats(self):
+        """acquired, waited (had to queue), peak (most slots taken at once),
+        active and waiting.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['active'] = self.value - self._free
+            stats['waiting'] = len(self._waiters)
+        return stats
+
+
+def _SocketPair():
+    if hasattr(socket, 'socketpair'):
+        return socket.socketpair()
+    listener = socket.socket()
+    try:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        a = socket.create_connection(listener.getsockname())
+        b = listener.accept()[0]
+    finally:
+        listener.close()
+    return a, b
+
+
+class Loop(object):
+    """Runs callbacks, timers and socket handlers on one thread.
+
+    Sockets are watched with poll() (select() where there is none).
+    CallSoon, CallLater and Wrap may be called from any thread;
+    AddReader/AddWriter and their Remove* from the loop thread only.
+    Start() runs the loop in a daemon thread, Stop() ends it.
+    """
+    name = 'megaplanpy-loop'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = collections.deque()
+        self._timers = []
+        self._sequence = itertools.count()
+        self._readers = {}
+        self._writers = {}
+        self._poller = select.poll() if hasattr(select, 'poll') else None
+        self._thread = None
+        self._stopped = False
+        # A byte written to _waker breaks the poll when a callback comes
+        # from another thread.
+        self._waker, self._wakee = _SocketPair()
+        self._waker.setblocking(0)
+        self._wakee.setblocking(0)
+        self._woken = False
+        self.AddReader(self._wakee.fileno(), self._Drain)
+
+    def InThread(self):
+        return threading.current_thread() is self._thread
+
+    def _Wake(self):
+        try:
+            self._waker.send('x')
+        except socket.error:
+            # The buffer is full: the loop is woken anyway.
+            pass
+
+    def _Drain(self):
+        try:
+            while self._wakee.recv(4096):
+                pass
+        except socket.error:
+            pass
+        with self._lock:
+            self._woken = False
+
+    def _Schedule(self, append):
+        with self._lock:
+            append()
+            wake = not self._woken and self._thread is not None and \
+                not self.InThread()
+            if wake:
+                self._woken = True
+        if wake:
+            self._Wake()
+
+    def CallSoon(self, callback, *args):
+        self._Schedule(lambda: self._ready.append((callback, args)))
+
+    def CallLater(self, delay, callback, *args):
+        """Calls callback(*args) after delay seconds; returns a Timer that
+        can be cancelled.
+        """
+        timer = Timer(time.time() + delay, callback, args)
+        self._Schedule(lambda: heapq.heappush(self._timers,
+            (timer.when, next(self._sequence), timer)))
+        return timer
+
+    def Wrap(self, value):
+        """A Future of what a coroutine yields.
+        """
+        if isinstance(value, Future):
+            return value
+        if isinstance(value, types.GeneratorType):
+            return Task(self, value)
+        if isinstance(value, (list, tuple)):
+            return Gather(self.Wrap(item) for item in value)
+        future = Future()
+        future.SetResult(value)
+        return future
+
+    def _Watch(self, fd):
+        if self._poller is None:
+            return
+        mask = 0
+        if fd in self._readers:
+            mask |= select.POLLIN
+        if fd in self._writers:
+            mask |= select.POLLOUT
+        if mask:
+            self._poller.register(fd, mask)
+        else:
+            try:
+                self._poller.unregister(fd)
+            except KeyError:
+                pass
+
+    def AddReader(self, fd, callback):
+        self._readers[fd] = callback
+        self._Watch(fd)
+
+    def RemoveReader(self, fd):
+        if self._readers.pop(fd, None) is not None:
+            self._Watch(fd)
+
+    def AddWriter(self, fd, callback):
+        self._writers[fd] = callback
+        self._Watch(fd)
+
+    def RemoveWriter(self, fd):
+        if self._writers.pop(fd, None) is not None:
+            self._Watch(fd)
+
+    def _Poll(self, timeout):
+        """[(fd, readable, writable)] of the sockets ready within timeout.
+        """
+        try:
+            if self._poller is not None:
+                if timeout is None:
+                    events = self._poller.poll()
+                else:
+                    events = self._poller.poll(
+                        int(math.ceil(timeout * 1000)))
+                errors = select.POLLERR | select.POLLHUP | select.POLLNVAL
+                return [(fd, bool(mask & (select.POLLIN | errors)),
+                    bool(mask & (select.POLLOUT | errors)))
+                    for fd, mask in events]
+            readers, writers = list(self._readers), list(self._writers)
+            readable, writable, failed = select.select(readers, writers,
+                readers + writers, timeout)
+        except (select.error, IOError, OSError) as e:
+            if e.args[0] == errno.EINTR:
+                return []
+            raise
+        failed = set(failed)
+        readable, writable = set(readable) | failed, set(writable) | failed
+        return [(fd, fd in readable, fd in writable)
+            for fd in readable | writable]
+
+    def _Call(self, callback, args):
+        try:
+            callback(*args)
+        except Exception:
+            # A broken callback must not stop the loop for everyone else.
+            traceback.print_exc()
+
+    def _Run(self):
+        while True:
+            with self._lock:
+                if self._stopped:
+                    break
+                timeout = None
+                if self._ready:
+                    timeout = 0
+                elif self._timers:
+                    timeout = max(self._timers[0][0] - time.time(), 0)
+            for fd, readable, writable in self._Poll(timeout):
+                if readable and fd in self._readers:
+                    self._Call(self._readers[fd], ())
+                if writable and fd in self._writers:
+                    self._Call(self._writers[fd], ())
+
+            now = time.time()
+            due = []
+            with self._lock:
+                timers = self._timers
+                while timers and timers[0][0] <= now:
+                    due.append(heapq.heappop(timers)[2])
+                ready, self._ready = self._ready, collections.deque()
+            for timer in due:
+                if not timer.cancelled:
+                    self._Call(timer.callback, timer.args)
+            for callback, args in ready:
+                self._Call(callback, args)
+
+    def Start(self):
+        thread = threading.Thread(target=self._Run, name=self.name)
+        thread.daemon = True
+        self._thread = thread
+        thread.start()
+        return self
+
+    def Stop(self):
+        """Ends the loop (the callbacks not run yet are dropped) and waits
+        for its thread.
+        """
+        with self._lock:
+            self._stopped = True
+        self._Wake()
+        thread = self._thread
+        if thread is not None and not self.InThread():
+            thread.join()
+            self._waker.close()
+            self._wakee.close()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+def Sleep(loop, delay):
+    """A Future done after delay seconds.
+    """
+    future = Future()
+    loop.CallLater(delay, future.SetResult, None)
+    return future
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
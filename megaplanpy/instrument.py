@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        instrument
+# Purpose:     Timings of API calls and their per-endpoint aggregation
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import bisect
+import threading
+import time
+
+
+# Phases of a call, in the order they happen.
+PHASES = ('sign', 'connect', 'tls', 'ttfb', 'read', 'decode')
+
+
+def Endpoint(uri):
+    """The endpoint of uri: its path without the query
+    (BumsTaskApiV01/Task/card.api).
+    """
+    return uri.split('?', 1)[0]
+
+
+class Trace(object):
+    """What one API call took.
+
+    phases holds the seconds spent in each of PHASES, summed over the
+    attempts: sign - signing the request, connect - TCP connect, tls - TLS
+    handshake, ttfb - from sending the request to the response headers,
+    read - reading the body, decode - JSON decoding. The call is served
+    from the 'network', the 'cache', a 'cassette', or 'coalesced' with an
+    identical call of another thread. error is the exception the call
+    raised, if any.
+    """
+    __slots__ = ('uri', 'endpoint', 'method', 'phases', 'status', 'error',
+        'request_bytes', 'response_bytes', 'attempts', 'reauthorized',
+        'source', 'started', 'elapsed')
+
+    def __init__(self, uri, method='GET'):
+        self.uri = uri
+        self.endpoint = Endpoint(uri)
+        self.method = method
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.status = None
+        self.error = None
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.attempts = 0
+        self.reauthorized = False
+        self.source = None
+        self.started = time.time()
+        self.elapsed = None
+
+    def Add(self, phase, seconds):
+        self.phases[phase] += seconds
+
+    def Finish(self, error=None):
+        self.elapsed = time.time() - self.started
+        self.error = error
+        if self.source is None:
+            self.source = 'network' if self.attempts else 'coalesced'
+
+    def __repr__(self):
+        return '<Trace {0} {1} {2} {3:.3f}s>'.format(self.method,
+            self.endpoint, self.status, self.elapsed or 0.0)
+
+
+class Hook(object):
+    """Base of the objects in Megaplan.hooks.
+
+    Before() is called when a call starts, After() when it has finished
+    (or failed), both in the thread of the call.
+    """
+    def Before(self, trace):
+        pass
+
+    def After(self, trace):
+        pass
+
+
+def Buckets(start=0.0005, stop=120.0, factor=2 ** 0.25):
+    """Geometric bucket bounds (seconds) from start up to stop.
+    """
+    bounds = []
+    bound = start
+    while bound < stop:
+        bounds.append(bound)
+        bound *= factor
+    bounds.append(stop)
+    return tuple(bounds)
+
+
+class Histogram(object):
+    """Counts of values (seconds) per bucket; bounds are the upper bounds,
+    one more bucket holds the values above the last one.
+    """
+    def __init__(self, bounds=None):
+        self.bounds = tuple(bounds or Buckets())
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def Add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def Percentile(self, q):
+        """Estimated q-th percentile (0..100), interpolated within its
+        bucket.
+        """
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = self.bounds[i - 1] if i else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(low + (high - low) * (rank - seen) / count,
+                    self.max)
+            seen += count
+        return self.max
+
+
+class LatencyAggregator(Hook):
+    """Hook that keeps latency histograms, status and error counts, bytes
+    and phase times per endpoint.
+
+        latency = LatencyAggregator()
+        mplan = Megaplan(account, login, password, hooks=[latency])
+        ...
+        latency.Stats()['BumsTaskApiV01/Task/list.api']['p99']
+    """
+    def __init__(self, bounds=None, percentiles=(50, 90, 99)):
+        self.bounds = tuple(bounds or Buckets())
+        self.percentiles = percentiles
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _Entry(self, endpoint):
+        entry = self._endpoints.get(endpoint)
+        if entry is None:
+            entry = self._endpoints[endpoint] = {
+                'latency': Histogram(self.bounds),
+                'phases': dict.fromkeys(PHASES, 0.0),
+                'statuses': {},
+                'sources': {},
+                'errors': 0,
+                'attempts': 0,
+                'request_bytes': 0,
+                'response_bytes': 0,
+            }
+        return entry
+
+    def After(self, trace):
+        with self._lock:
+            entry = self._Entry(trace.endpoint)
+            entry['latency'].Add(trace.elapsed)
+            phases = entry['phases']
+            for phase, seconds in trace.phases.iteritems():
+                phases[phase] += seconds
+            statuses = entry['statuses']
+            statuses[trace.status] = statuses.get(trace.status, 0) + 1
+            sources = entry['sources']
+            sources[trace.source] = sources.get(trace.source, 0) + 1
+            if trace.error is not None:
+                entry['errors'] += 1
+            entry['attempts'] += trace.attempts
+            entry['request_bytes'] += trace.request_bytes
+            entry['response_bytes'] += trace.response_bytes
+
+    def Endpoints(self):
+        with self._lock:
+            return sorted(self._endpoints)
+
+    def Percentile(self, endpoint, q):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            return entry['latency'].Percentile(q) if entry else None
+
+    def Stats(self):
+        """Returns {endpoint: stats}: count, errors, attempts, mean, max,
+        p50/p90/p99 (seconds), mean seconds of each phase, statuses,
+        sources and byte counts.
+        """
+        stats = {}
+        with self._lock:
+            for endpoint, entry in self._endpoints.iteritems():
+                latency = entry['latency']
+                count = latency.count
+                item = {
+                    'count': count,
+                    'errors': entry['errors'],
+                    'attempts': entry['attempts'],
+                    'mean': latency.sum / count,
+                    'max': latency.max,
+                    'phases': dict((phase, seconds / count)
+                        for phase, seconds in entry['phases'].iteritems()),
+                    'statuses': dict(entry['statuses']),
+                    'sources': dict(entry['sources']),
+                    'request_bytes': entry['request_bytes'],
+                    'response_bytes': entry['response_bytes'],
+                }
+                for q in self.percentiles:
+                    item['p{0}'.format(q)] = latency.Percentile(q)
+                stats[endpoint] = item
+        return stats
+
+    def Reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        jsonlib
+# Purpose:     Choice of the JSON library responses are decoded with
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import json
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+# Tried in this order when no library is named.
+PREFERENCE = ('ujson', 'simplejson', 'json')
+
+# Used instead of ujson, which has neither object_hook nor parse_float
+# and cannot decode a value from the middle of a text.
+FALLBACK = ('simplejson', 'json')
+
+_MODULES = {
+    'json': json,
+    'simplejson': simplejson,
+    'ujson': ujson,
+}
+
+
+def Available():
+    """Names of the installed libraries in the order of PREFERENCE.
+    """
+    return [name for name in PREFERENCE if _MODULES[name] is not None]
+
+
+def _Fallback():
+    return [name for name in FALLBACK if _MODULES[name] is not None][0]
+
+
+class Backend(object):
+    """JSON library used to decode responses.
+
+    name is one of PREFERENCE (None - the first installed one).
+    object_hook and parse_float are passed on as to json.loads. ujson has
+    neither, so with them simplejson is used instead (json if simplejson
+    is not installed) and name says so. ujson cannot decode a value from
+    the middle of a text either, so Decoder() (used by stream.ItemStream)
+    comes from simplejson or json too.
+
+        mplan = Megaplan(account, login, password,
+            json_backend=Backend('simplejson', parse_float=Decimal))
+    """
+    def __init__(self, name=None, object_hook=None, parse_float=None):
+        if name is None:
+            name = Available()[0]
+        if _MODULES.get(name) is None:
+            raise ImportError('JSON library {0} is not available'.format(name))
+        if name == 'ujson' and (object_hook is not None or
+            parse_float is not None):
+            name = _Fallback()
+        self.name = name
+        self.object_hook = object_hook
+        self.parse_float = parse_float
+        self._module = _MODULES[name]
+
+        kwargs = {}
+        if object_hook is not None:
+            kwargs['object_hook'] = object_hook
+        if parse_float is not None:
+            kwargs['parse_float'] = parse_float
+        self._kwargs = kwargs
+
+    def __repr__(self):
+        return 'Backend({0!r})'.format(self.name)
+
+    def Loads(self, text):
+        return self._module.loads(text, **self._kwargs)
+
+    def Decoder(self):
+        """A JSONDecoder (with raw_decode) of the same settings.
+        """
+        module = self._module if self.name != 'ujson' else (
+            _MODULES[_Fallback()])
+        return module.JSONDecoder(**self._kwargs)
+
+
+# Used unless a Megaplan is given another one.
+DEFAULT = Backend()
+
+
+def Loads(text):
+    return DEFAULT.Loads(text)
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
@@ -14,14 +14,26 @@
 
 import md5
 import hmac
+import httplib
+import socket
+import sys
+import time
 from hashlib import sha1
 import base64
-from datetime import datetime
-from rfc822 import formatdate, mktime_tz, parsedate_tz
+from rfc822 import formatdate
 from urllib import urlencode
-import json
+import threading
+from multiprocessing.pool import ThreadPool
 
-from client import APIClient
+from cache import ResponseCache
+from cassette import Cassette
+from client import APIClient, Response
+from coalesce import SingleFlight
+from instrument import Trace
+import jsonlib
+from records import RECORDS, Convert
+from retry import RetryPolicy
+from stream import ItemStream
 
 
 class AttributeError(Exception):
@@ -29,12 +41,76 @@ class AttributeError(Exception):
 
 
 class ClientError(Exception):
-    pass
+    def __init__(self, message='', status=None):
+        super(ClientError, self).__init__(message)
+        self.status = status
+
+
+class DeadlineExceeded(ClientError):
+    """The call (with all its retries) did not finish within the deadline.
+    """
+    def __init__(self, deadline, elapsed, error=None):
+        super(DeadlineExceeded, self).__init__(
+            'Deadline of {0:.3f}s exceeded after {1:.3f}s'.format(
+                deadline, elapsed))
+        self.deadline = deadline
+        self.elapsed = elapsed
+        self.error = error
+
+
+# Default of the Megaplan arguments for which None has a meaning of its own.
+_DEFAULT = object()
+
+
+class _Overdue(socket.timeout):
+    """The request cannot be sent before the deadline.
+    """
 
 
 class JSON2Obj(object):
-    def __init__(self, page):
-        self.__dict__ = json.loads(page)
+    def __init__(self, page, backend=None):
+        self.__dict__ = (backend or jsonlib.DEFAULT).Loads(page)
+
+
+class BatchItem(object):
+    """Outcome of one call made by a bulk method: Result on success,
+    Error (the raised exception) on failure.
+    """
+    __slots__ = ('Id', 'Result', 'Error')
+
+    def __init__(self, Id, Result=None, Error=None):
+        self.Id, self.Result, self.Error = Id, Result, Error
+
+    @property
+    def Ok(self):
+        return self.Error is None
+
+    def __repr__(self):
+        return 'BatchItem({0!r}, Ok={1})'.format(self.Id, self.Ok)
+
+
+class Prefetch(threading.Thread):
+    """Calls func(*args) in a background thread; Get() waits for the result
+    (or raises the exception of the call).
+    """
+    def __init__(self, func, *args):
+        super(Prefetch, self).__init__()
+        self.daemon = True
+        self._func, self._args = func, args
+        self._result = self._error = None
+        self.start()
+
+    def run(self):
+        try:
+            self._result = self._func(*self._args)
+        except:
+            self._error = sys.exc_info()
+
+    def Get(self):
+        self.join()
+        if self._error is not None:
+            raise self._error[0], self._error[1], self._error[2]
+        return self._result
 
 
 class Megaplan(object):
@@ -42,7 +118,14 @@ class Megaplan(object):
     """
     debug = False
 
+    # Threads used by the bulk methods (TaskCards, ProjectCards, ...).
+    # Keep it within APIClient.pool_size so that every worker gets a
+    # kept-alive connection.
+    max_workers = 8
+
     HOST = '{account}.megaplan.ru/'
+    # 'http' for a local server such as stub.StubServer.
+    scheme = 'https'
     SIGNATURE = '{method}\n{md5content}\n{contenttype}\n{date}\n{host}{uri}'
 
     _CommonApi = 'BumsCommonApiV01/'
@@ -66,6 +149,18 @@ class Megaplan(object):
     TASK = _TaskApi + 'Task/'
     TODOLIST = _TimeApi + 'TodoList/'
 
+    # Seconds the responses of the reference endpoints are cached for.
+    CACHE_TTL = {
+        SEVERITY + 'list.api': 3600,
+        DEPARTMENT + 'list.api': 600,
+        EMPLOYEE + 'list.api': 300,
+    }
+    # Writes under a key drop the cached responses under its values.
+    CACHE_INVALIDATES = {
+        EMPLOYEE: (EMPLOYEE, DEPARTMENT),
+        DEPARTMENT: (DEPARTMENT, EMPLOYEE),
+    }
+
     code = 'utf-8'
 
     _FolderType = ('incoming', 'responsible', 'executor', 'owner', 'auditor',
@@ -86,7 +181,8 @@ class Megaplan(object):
     def Account(self, account):
         self._Account = account
         self._host = self.HOST.format(account=account)
-        self._MPQuery = 'https://{host}{uri}'.format(host=self._host, uri='{uri}')
+        self._MPQuery = '{scheme}://{host}{uri}'.format(scheme=self.scheme,
+            host=self._host, uri='{uri}')
 
     @property
     def Login(self):
@@ -104,21 +200,130 @@ class Megaplan(object):
     def Password(self, password):
         self._Password = password
 
-    def __init__(self, account='', login='', password=''):
+    # Statuses that make _GetData raise ClientError.
+    _ErrorStatus = (400, 401, 403, 404, 429, 500, 502, 503, 504)
+
+    # Retries reads on transient failures; None - never retry.
+    retry = RetryPolicy()
+    # Seconds a call may take in total, retries included; None - no limit.
+    deadline = None
+    # Tasks, projects, employees and comments as records.Record (__slots__)
+    # instead of dicts; they take several times less memory.
+    records = False
+    # jsonlib.Backend responses are decoded with; the fastest installed
+    # library by default.
+    json_backend = jsonlib.DEFAULT
+    # instrument.Hook objects told about every call (instrument.Trace);
+    # calls are not timed while there are none.
+    hooks = ()
+
+    def __init__(self, account='', login='', password='', rate_limiter=None,
+        retry=None, connect_timeout=None, read_timeout=None, deadline=None,
+        token_store=None, cache=_DEFAULT, records=None, json_backend=None,
+        hooks=None, host=None, scheme=None, cassette=None):
+        """
+        rate_limiter: ratelimit.RateLimiter shared by every request made
+            through this client (None - do not limit)
+        retry: retry.RetryPolicy (None - Megaplan.retry)
+        connect_timeout, read_timeout: seconds, see APIClient
+        deadline: seconds a call may take, retries included; a call that
+            runs out of time raises DeadlineExceeded
+        token_store: store.MemoryStore or store.FileStore where AccessId and
+            SecretKey are kept for the next clients of the same account and
+            login (None - log in with every new client)
+        cache: cache.ResponseCache, None - do not cache (by default a
+            cache of the CACHE_TTL endpoints)
+        records: True - tasks, projects, employees and comments come as
+            records.Task, records.Project, ... instead of dicts
+            (None - Megaplan.records)
+        json_backend: jsonlib.Backend or the name of a JSON library
+            ('ujson', 'simplejson', 'json'; None - Megaplan.json_backend)
+        hooks: list of instrument.Hook, e.g. instrument.LatencyAggregator
+            (None - Megaplan.hooks)
+        host: 'address[:port]' of the API instead of the account's
+            HOST, e.g. stub.StubServer().host
+        scheme: 'https' or 'http' (None - Megaplan.scheme)
+        cassette: cassette.Cassette or its path to record the traffic to
+            or replay it from (None - no cassette)
+        """
+        if host is not None:
+            self.HOST = host.rstrip('/') + '/'
+        if scheme is not None:
+            self.scheme = scheme
         self.Account, self.Login, self.Password = account, login, password
 
-        self._client = APIClient()
-        self._data = str()
+        self.rate_limiter = rate_limiter
+        self.token_store = token_store
+        if cache is _DEFAULT:
+            cache = ResponseCache(self.CACHE_TTL, self.CACHE_INVALIDATES)
+        self.cache = cache
+        # Concurrent identical GETs share one request; None - do not
+        # coalesce.
+        self.single_flight = SingleFlight()
+        if retry is not None:
+            self.retry = retry
+        if deadline is not None:
+            self.deadline = deadline
+        if records is not None:
+            self.records = records
+        if isinstance(json_backend, basestring):
+            json_backend = jsonlib.Backend(json_backend)
+        if json_backend is not None:
+            self.json_backend = json_backend
+        if hooks is not None:
+            self.hooks = list(hooks)
+        if isinstance(cassette, basestring):
+            cassette = Cassette(cassette)
+        self._client = APIClient(connect_timeout=connect_timeout,
+            read_timeout=read_timeout, cassette=cassette)
+        self._local = threading.local()
+        self._auth_lock = threading.Lock()
+
+        # AccessId, SecretKey and the HMAC keyed with it are replaced
+        # together so that a request never signs with a half-updated set.
+        self._credentials = (str(), str(), None)
+
+    @property
+    def _AccessId(self):
+        return self._credentials[0]
+
+    @property
+    def _SecretKey(self):
+        return self._credentials[1]
+
+    @property
+    def _data(self):
+        """The last response body received by the current thread.
+        """
+        return getattr(self._local, 'data', '')
+
+    @_data.setter
+    def _data(self, data):
+        self._local.data = data
 
-        self._AccessId = str()
-        self._SecretKey = str()
+    # (second, RFC 822 date) of the last signed request.
+    _rfcdate = (0, '')
 
-    def _TimeAsRfc822(self, dt):
-        return formatdate(mktime_tz(parsedate_tz(dt.strftime('%a, %d %b %Y %H:%M:%S'))))
+    def _RfcDateNow(self):
+        """The current time as an RFC 822 date, formatted once a second.
+        """
+        now = int(time.time())
+        rfcdate = self._rfcdate
+        if rfcdate[0] != now:
+            rfcdate = (now, formatdate(now))
+            Megaplan._rfcdate = rfcdate
+        return rfcdate[1]
+
+    def _GetSigner(self, secret_key):
+        """Returns the HMAC state keyed with secret_key; requests copy it
+        instead of keying a new HMAC each time.
+        """
+        return hmac.HMAC(secret_key.encode(self.code), digestmod=sha1)
 
     def _GetResponseObject(f):
-        def wrapper(self):
-            obj = JSON2Obj(self._data)
+        def wrapper(self, data):
+            self._data = data
+            obj = JSON2Obj(data, self.json_backend)
             if 'error' == obj.status['code']:
                 if 'message' in obj.status:
                     raise Exception(obj.status['message'])
@@ -126,53 +331,114 @@ class Megaplan(object):
 
         return wrapper
 
+    def _SetCredentials(self, access_id, secret_key):
+        if self.debug:
+            self._MPQuery = 'http://{host}'.format(host=self._host) + '{uri}'
+
+        self._credentials = (access_id, secret_key,
+            self._GetSigner(secret_key))
+
     @_GetResponseObject
     def _AuthorizeHandle(self, obj):
-        self._AccessId = obj.data['AccessId']
-        self._SecretKey = obj.data['SecretKey']
+        self._SetCredentials(obj.data['AccessId'], obj.data['SecretKey'])
 
-        if self.debug:
-            self._MPQuery = 'http://{host}'.format(host=self._host) + '{uri}'
+    @property
+    def _TokenKey(self):
+        return '{0}:{1}'.format(self.Account, self.Login)
 
     def _Authorize(self):
         uri = self.AUTHORIZE + 'authorize.api'
         md5pass = md5.new(self.Password).hexdigest()
         params = {'Login': self.Login, 'Password': md5pass}
-        self._data = \
-            self._client.Request(self._MPQuery.format(uri=uri), params)
-        self._AuthorizeHandle()
+        data = self._Open(uri, self._EncodeParams(params)).read()
+        self._AuthorizeHandle(data)
+
+        if self.token_store is not None:
+            self.token_store.Set(self._TokenKey, list(self._credentials[:2]))
+
+    def _Authenticate(self):
+        """Takes AccessId and SecretKey from the token store, or logs in.
+        """
+        if self.token_store is not None:
+            token = self.token_store.Get(self._TokenKey)
+            if token:
+                self._SetCredentials(*token)
+                return
+        self._Authorize()
+
+    def _Reauthorize(self, stale):
+        """Replaces the credentials the server has rejected.
+
+        Of the threads that got a 401 with the same stale credentials only
+        the first logs in again; the others wait on the lock and then go on
+        with the credentials it got. A pair another process has already
+        put into the token store is taken without logging in. Until the
+        new pair replaces them (in one assignment) calls keep signing with
+        the stale credentials: a call retried meanwhile gets a 401 and
+        waits here too.
+        """
+        with self._auth_lock:
+            if self._credentials is not stale:
+                return
+            if self.token_store is not None:
+                stale_token = list(stale[:2])
+                token = self.token_store.Get(self._TokenKey)
+                if token and token != stale_token:
+                    self._SetCredentials(*token)
+                    return
+                self.token_store.Delete(self._TokenKey, stale_token)
+            self._Authorize()
 
     def _Auth(f):
         def wrapper(self, *args, **kwargs):
-            if (self._AccessId == '') or (self._SecretKey == ''):
-                self._Authorize()
+            if not all(self._credentials):
+                # Threads that come in while the first one is logging in wait
+                # for it instead of logging in again.
+                with self._auth_lock:
+                    if not all(self._credentials):
+                        self._Authenticate()
             return f(self, *args, **kwargs)
         return wrapper
 
-    def _GetSignature(self, method, uri, params={}):
-        self._rfcdate = self._TimeAsRfc822(datetime.now())
-        self._md5content = ''
+    def _GetSignature(self, method, uri, md5content, date, signer):
         contenttype = ''
         if 'POST' == method:
-            self._md5content = md5.new(urlencode(params)).hexdigest()
             contenttype = 'application/x-www-form-urlencoded'
         sign = {
             'method': method,
-            'md5content': self._md5content,
+            'md5content': md5content,
             'contenttype': contenttype,
-            'date': self._rfcdate,
+            'date': date,
             'host': self._host,
             'uri': uri
         }
         q = self.SIGNATURE.format(**sign)
-        h = hmac.HMAC(self._SecretKey.encode(self.code), q, sha1)
+        h = signer.copy()
+        h.update(q)
         return base64.encodestring(h.hexdigest()).strip()
 
-    def _GetHeaders(self, uri, params={}):
+    def _EncodeParams(self, params):
+        """Returns the POST body for params. It is built once per call and
+        the same string is hashed for Content-MD5 and sent.
+        """
+        if not params:
+            return ''
+        code = self.code
+        return urlencode([
+            (k.encode(code) if isinstance(k, unicode) else k,
+                v.encode(code) if isinstance(v, unicode) else v)
+            for k, v in params.iteritems()])
+
+    def _GetHeaders(self, uri, body='', credentials=None):
         method = 'GET'
-        if params:
+        md5content = ''
+        if body:
             method = 'POST'
-        signature = self._GetSignature(method, uri, params)
+            md5content = md5.new(body).hexdigest()
+        rfcdate = self._RfcDateNow()
+        access_id, secret_key, signer = credentials or self._credentials
+        signature = self._GetSignature(method, uri, md5content, rfcdate,
+            signer)
         header = {
             'User-Agent': 'Mozilla/5.0 (Windows; U; Windows NT 6.0; ru; rv:1.9.1.7) Gecko/20091221 Firefox/3.5.7',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
@@ -181,32 +447,333 @@ class Megaplan(object):
             'Accept-Charset': 'utf-8;q=0.7,*;q=0.7',
             'Keep-Alive': '300',
             'Connection': 'keep-alive',
-            'Date': self._rfcdate,
-            'X-Authorization': '{0}:{1}'.format(self._AccessId, signature)
+            'Date': rfcdate,
+            'X-Authorization': '{0}:{1}'.format(access_id, signature)
         }
         if method == 'GET':
             header['Accept'] = 'application/json'
         elif method == 'POST':
-            header['Content-MD5'] = self._md5content
+            header['Content-MD5'] = md5content
         return header
 
     @_GetResponseObject
     def _ResponseHandle(self, obj):
+        if self.records and isinstance(obj.data, dict):
+            Convert(obj.data)
         return obj
 
+    def _Open(self, uri, body='', headers={}, timeout=None, trace=None):
+        rate_limiter = self.rate_limiter
+        if rate_limiter is not None:
+            if timeout is None:
+                rate_limiter.Acquire()
+            else:
+                # The wait for the limiter is part of the deadline.
+                started = time.time()
+                delay = rate_limiter.Reserve()
+                if delay >= timeout:
+                    raise _Overdue('The rate limiter holds the request for '
+                        '{0:.3f}s, past the deadline'.format(delay))
+                if delay > 0:
+                    time.sleep(delay)
+                timeout -= time.time() - started
+        response = self._client.Open(self._MPQuery.format(uri=uri),
+            params=body, headers=headers, timeout=timeout, trace=trace)
+        if rate_limiter is not None:
+            rate_limiter.Feedback(response.status,
+                response.getheader('retry-after'))
+        return response
+
+    def _Call(self, uri, body='', timeout=None, credentials=None,
+        stream=False, trace=None):
+        # Signed here so that every attempt carries a fresh Date.
+        if trace is None:
+            headers = self._GetHeaders(uri, body, credentials)
+        else:
+            trace.attempts += 1
+            started = time.time()
+            headers = self._GetHeaders(uri, body, credentials)
+            trace.Add('sign', time.time() - started)
+        response = self._Open(uri, body, headers, timeout, trace)
+        if response.status in self._ErrorStatus:
+            self._data = response.read()
+            raise ClientError(
+                '{0} {1}'.format(response.status, response.reason),
+                response.status)
+        if stream:
+            return response
+        return response.read()
+
+    def _Fetch(self, uri, body='', stream=False, trace=None):
+        """Returns the response body, retrying as the retry policy allows;
+        with stream the client.Response is returned with the body unread.
+        """
+        retry = self.retry
+        if retry is not None and not retry.IsRetryable(uri, body):
+            retry = None
+        deadline = self.deadline
+
+        started = time.time()
+        attempt = 0
+        reauthorized = False
+        while True:
+            attempt += 1
+            timeout = None
+            if deadline is not None:
+                timeout = started + deadline - time.time()
+            credentials = self._credentials
+            try:
+                return self._Call(uri, body, timeout, credentials, stream,
+                    trace)
+            except (socket.error, httplib.HTTPException, ClientError) as e:
+                elapsed = time.time() - started
+                if deadline is not None and (elapsed >= deadline or
+                    isinstance(e, _Overdue)):
+                    raise DeadlineExceeded(deadline, elapsed, e)
+                if isinstance(e, ClientError) and e.status == 401 and \
+                    not reauthorized:
+                    # The key has expired or was revoked: log in once more
+                    # and replay the call with the new one.
+                    reauthorized = True
+                    if trace is not None:
+                        trace.reauthorized = True
+                    self._Reauthorize(credentials)
+                    continue
+                if retry is None or (isinstance(e, ClientError) and
+                    e.status not in retry.STATUSES):
+                    raise
+                delay = retry.Next(attempt, started)
+                if delay is None:
+                    raise
+                if deadline is not None and elapsed + delay >= deadline:
+                    raise DeadlineExceeded(deadline, elapsed, e)
+            time.sleep(delay)
+
+    def _Trace(self, uri, body=''):
+        """Starts the instrument.Trace of a call; None if there are no
+        hooks.
+        """
+        hooks = self.hooks
+        if not hooks:
+            return None
+        trace = Trace(uri, 'POST' if body else 'GET')
+        for hook in hooks:
+            hook.Before(trace)
+        return trace
+
+    def _Finish(self, trace, error=None):
+        if trace is None:
+            return
+        trace.Finish(error)
+        for hook in self.hooks:
+            hook.After(trace)
+
+    def _Decode(self, data, trace=None):
+        if trace is None:
+            return self._ResponseHandle(data)
+        started = time.time()
+        try:
+            return self._ResponseHandle(data)
+        finally:
+            trace.Add('decode', time.time() - started)
+
+    def _Load(self, uri, trace=None, generation=None):
+        data = self._Fetch(uri, trace=trace)
+        obj = self._Decode(data, trace)
+        if self.cache is not None:
+            # Not kept if a write has invalidated uri meanwhile.
+            self.cache.Set(uri, data, generation)
+        return obj
+
+    def _Get(self, uri, trace=None):
+        cache = self.cache
+        generation = None
+        if cache is not None:
+            data = cache.Get(uri)
+            if data is not None:
+                if trace is not None:
+                    trace.source = 'cache'
+                return self._Decode(data, trace)
+            generation = cache.Generation(uri)
+
+        single_flight = self.single_flight
+        if single_flight is None:
+            return self._Load(uri, trace, generation)
+        # A call made after a write does not join one made before it.
+        return single_flight.Do((uri, generation),
+            lambda: self._Load(uri, trace, generation))
+
+    def _Request(self, uri, body='', trace=None):
+        if not body:
+            return self._Get(uri, trace)
+
+        try:
+            return self._Decode(self._Fetch(uri, body, trace=trace), trace)
+        finally:
+            if self.cache is not None:
+                self.cache.Written(uri)
+
     @_Auth
     def _GetData(self, uri, params={}):
-        headers = self._GetHeaders(uri, params)
-        self._data = self._client.Request(
-            self._MPQuery.format(uri=uri), params=params, headers=headers)
-        if self._client.Status in (400, 401, 403, 404, 500):
-            raise ClientError(
-                '{0} {1}'.format(self._client.Status, self._client.Reason))
-        return self._ResponseHandle()
+        body = self._EncodeParams(params)
+        trace = self._Trace(uri, body)
+        if trace is None:
+            return self._Request(uri, body)
+
+        try:
+            obj = self._Request(uri, body, trace)
+        except Exception as e:
+            error = sys.exc_info()
+            self._Finish(trace, e)
+            raise error[0], error[1], error[2]
+        self._Finish(trace)
+        return obj
 
     def GetData(self):
         return self._data
 
+    def _Map(self, func, args, max_workers=None):
+        """Calls func(arg) for every arg on a thread pool.
+
+        Returns a list of BatchItem in the order of args; a failed call does
+        not stop the others.
+        """
+        def call(arg):
+            try:
+                return BatchItem(arg, func(arg))
+            except Exception as e:
+                return BatchItem(arg, Error=e)
+
+        args = list(args)
+        workers = min(max_workers or self.max_workers, len(args))
+        if workers <= 1:
+            return map(call, args)
+        pool = ThreadPool(workers)
+        try:
+            return pool.map(call, args)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _ListUri(self, api, Folder, Status, FavoritesOnly, Search,
+        TimeUpdated=None):
+        if (Folder not in self._FolderType) or (Status not in self._StatusType):
+            raise AttributeError('Invalid parameter value')
+
+        uri = '{0}list.api?Folder={1}&Status={2}&FavoritesOnly={3}&Search={4}'
+        uri = uri.format(api, Folder, Status, int(FavoritesOnly), Search)
+        if TimeUpdated:
+            uri += '&' + urlencode({'TimeUpdated': TimeUpdated})
+        return uri
+
+    def _IterItems(self, chunks, key, trace=None):
+        """Yields the items of data[key] decoded one by one from chunks of
+        a response body.
+        """
+        stream = ItemStream(('data', key),
+            decoder=self.json_backend.Decoder())
+        record = RECORDS.get(key) if self.records else None
+        checked = False
+        for chunk in chunks:
+            if trace is None:
+                items = stream.Feed(chunk)
+            else:
+                started = time.time()
+                items = stream.Feed(chunk)
+                trace.Add('decode', time.time() - started)
+            if not checked and ('status',) in stream.captured:
+                checked = True
+                status = stream.captured[('status',)]
+                if 'error' == status['code'] and 'message' in status:
+                    raise Exception(status['message'])
+            for item in items:
+                if record is not None and isinstance(item, dict):
+                    item = record.FromDict(item)
+                yield item
+        stream.Close()
+
+    @_Auth
+    def _Stream(self, uri, key):
+        """Yields the items of data[key] of uri as they are read from the
+        socket; only the record being parsed is held in memory.
+        """
+        trace = self._Trace(uri)
+        error = None
+        try:
+            response = self._Fetch(uri, stream=True, trace=trace)
+            try:
+                for item in self._IterItems(response.IterChunks(), key,
+                    trace):
+                    yield item
+            finally:
+                response.Close()
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._Finish(trace, error)
+
+    @_Auth
+    def _GetBody(self, uri, trace=None):
+        return self._Fetch(uri, trace=trace)
+
+    def _Prefetch(self, uri, trace=None):
+        """Starts fetching the body of uri; Get() on the result waits for it.
+        """
+        return Prefetch(self._GetBody, uri, trace)
+
+    def _IterList(self, uri, key, page_size):
+        """Yields the items of data[key] of the list uri, page_size items
+        (Limit/Offset) per request; without page_size the whole list is
+        streamed from one response. A page is decoded as a whole; if it
+        is full, the next one is fetched in the background while its items
+        are consumed, so no more than one page of records and one of text
+        are held. A page shorter than page_size is the last one.
+        """
+        if not page_size:
+            for item in self._Stream(uri, key):
+                yield item
+            return
+
+        def fetch(offset):
+            page = '{0}&Limit={1}&Offset={2}'.format(uri, page_size, offset)
+            trace = self._Trace(page)
+            return self._Prefetch(page, trace), trace
+
+        chunk_size = Response.chunk_size
+        offset = 0
+        pending = fetch(offset)
+        trace = error = None
+        try:
+            while pending is not None:
+                prefetch, trace = pending
+                pending = None
+                data = prefetch.Get()
+                chunks = (data[i:i + chunk_size]
+                    for i in xrange(0, len(data), chunk_size))
+                items = list(self._IterItems(chunks, key, trace))
+                data = chunks = None
+                self._Finish(trace)
+                trace = None
+                if len(items) >= page_size:
+                    offset += page_size
+                    pending = fetch(offset)
+                for item in items:
+                    yield item
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._Finish(trace, error)
+            # The page requested ahead is finished once it has arrived.
+            if pending is not None and pending[1] is not None:
+                try:
+                    pending[0].Get()
+                except Exception as e:
+                    self._Finish(pending[1], e)
+                else:
+                    self._Finish(pending[1])
+
     def Tasks(self, Folder='all', Status='any', FavoritesOnly=False, Search=''):
         """
         input:
@@ -235,12 +802,25 @@ class Megaplan(object):
                 Favorite: integer # В избранном
                 TimeCreated: datetime # Время создания
         """
-        if (Folder not in self._FolderType) or (Status not in self._StatusType):
-            raise AttributeError('Invalid parameter value')
+        return self._GetData(
+            self._ListUri(self.TASK, Folder, Status, FavoritesOnly, Search))
 
-        uri = '{0}list.api?Folder={1}&Status={2}&FavoritesOnly={3}&Search={4}'
-        uri = uri.format(self.TASK, Folder, Status, int(FavoritesOnly), Search)
-        return self._GetData(uri)
+    def IterTasks(self, Folder='all', Status='any', FavoritesOnly=False,
+        Search='', page_size=100, TimeUpdated=None):
+        """
+        input:
+            Folder, Status, FavoritesOnly, Search # См. Tasks
+            TimeUpdated=None: datetime # Только задачи, измененные после
+                указанного времени
+            page_size=100: integer # Задач в одном запросе (Limit);
+                None - все задачи одним запросом
+        output:
+            Генератор задач (см. Tasks). Следующая страница запрашивается
+            в фоне, пока обрабатывается текущая
+        """
+        uri = self._ListUri(self.TASK, Folder, Status, FavoritesOnly, Search,
+            TimeUpdated)
+        return self._IterList(uri, 'tasks', page_size)
 
     def TaskCard(self, Id):
         """
@@ -271,6 +851,19 @@ class Megaplan(object):
         uri = '{0}card.api?Id={1}'.format(self.TASK, Id)
         return self._GetData(uri)
 
+    def TaskCards(self, Ids, max_workers=None):
+        """
+        input:
+            Ids: array<integer> # ID задач
+            max_workers=None: integer # Число параллельных запросов
+                (по умолчанию Megaplan.max_workers)
+        output:
+            array<BatchItem(Id, Result, Error)> # В порядке Ids.
+                Result - ответ TaskCard, Error - исключение, если запрос
+                не удался
+        """
+        return self._Map(self.TaskCard, Ids, max_workers)
+
     def TaskCreate(self, **kwargs):
         """
         input:
@@ -405,12 +998,25 @@ class Megaplan(object):
                 Favorite: integer # В избранном
                 TimeCreated: datetime # Время создания
         """
-        if (Folder not in self._FolderType) or (Status not in self._StatusType):
-            raise AttributeError('Invalid parameter value')
+        return self._GetData(
+            self._ListUri(self.PROJECT, Folder, Status, FavoritesOnly, Search))
 
-        uri = '{0}list.api?Folder={1}&Status={2}&FavoritesOnly={3}&Search={4}'
-        uri = uri.format(self.PROJECT, Folder, Status, int(FavoritesOnly), Search)
-        return self._GetData(uri)
+    def IterProjects(self, Folder='all', Status='any', FavoritesOnly=False,
+        Search='', page_size=100, TimeUpdated=None):
+        """
+        input:
+            Folder, Status, FavoritesOnly, Search # См. Projects
+            TimeUpdated=None: datetime # Только проекты, измененные после
+                указанного времени
+            page_size=100: integer # Проектов в одном запросе (Limit);
+                None - все проекты одним запросом
+        output:
+            Генератор проектов (см. Projects). Следующая страница
+            запрашивается в фоне, пока обрабатывается текущая
+        """
+        uri = self._ListUri(self.PROJECT, Folder, Status, FavoritesOnly,
+            Search, TimeUpdated)
+        return self._IterList(uri, 'projects', page_size)
 
     def ProjectCard(self, Id):
         """
@@ -442,6 +1048,19 @@ class Megaplan(object):
         uri = '{0}card.api?Id={1}'.format(self.PROJECT, Id)
         return self._GetData(uri)
 
+    def ProjectCards(self, Ids, max_workers=None):
+        """
+        input:
+            Ids: array<integer> # ID проектов
+            max_workers=None: integer # Число параллельных запросов
+                (по умолчанию Megaplan.max_workers)
+        output:
+            array<BatchItem(Id, Result, Error)> # В порядке Ids.
+                Result - ответ ProjectCard, Error - исключение, если запрос
+                не удался
+        """
+        return self._Map(self.ProjectCard, Ids, max_workers)
+
     def ProjectCreate(self, **kwargs):
         """
         input:
@@ -591,6 +1210,21 @@ class Megaplan(object):
         uri = uri.format(self.EMPLOYEE, Department, OrderBy, OrderDir)
         return self._GetData(uri)
 
+    def IterEmployees(self, Department=0, OrderBy='name', OrderDir='asc',
+        page_size=100):
+        """
+        input:
+            Department, OrderBy, OrderDir # См. Employees
+            page_size=100: integer # Сотрудников в одном запросе (Limit);
+                None - все сотрудники одним запросом
+        output:
+            Генератор сотрудников (см. Employees). Следующая страница
+            запрашивается в фоне, пока обрабатывается текущая
+        """
+        uri = '{0}list.api?Department={1}&OrderBy={2}&OrderDir={3}'
+        uri = uri.format(self.EMPLOYEE, Department, OrderBy, OrderDir)
+        return self._IterList(uri, 'employees', page_size)
+
     def EmployeeCard(self, Id):
         """
         input:
@@ -631,6 +1265,19 @@ class Megaplan(object):
         uri = '{0}card.api?Id={1}'.format(self.EMPLOYEE, Id)
         return self._GetData(uri)
 
+    def EmployeeCards(self, Ids, max_workers=None):
+        """
+        input:
+            Ids: array<integer> # ID сотрудников
+            max_workers=None: integer # Число параллельных запросов
+                (по умолчанию Megaplan.max_workers)
+        output:
+            array<BatchItem(Id, Result, Error)> # В порядке Ids.
+                Result - ответ EmployeeCard, Error - исключение, если запрос
+                не удался
+        """
+        return self._Map(self.EmployeeCard, Ids, max_workers)
+
     def EmployeeCreate(self, **kwargs):
         """
         input:
@@ -750,6 +1397,29 @@ class Megaplan(object):
         uri = uri.format(self.COMMENT, SubjectType, SubjectId, Order)
         return self._GetData(uri)
 
+    def CommentLists(self, SubjectType, SubjectIds, Order='asc',
+        max_workers=None):
+        """
+        input:
+            SubjectType: string = ('task' (задача),
+                'project' (проект)) # Тип комментируемых объектов
+            SubjectIds: array<integer> # ID комментируемых объектов
+            Order='asc': string = ('asc' (по возрастанию), 'desc' (по убыванию))
+                # Направление сортировки по дате (по умолчанию asc)
+            max_workers=None: integer # Число параллельных запросов
+                (по умолчанию Megaplan.max_workers)
+        output:
+            array<BatchItem(Id, Result, Error)> # В порядке SubjectIds.
+                Result - ответ Comments, Error - исключение, если запрос
+                не удался
+        """
+        if (SubjectType not in self._SubjectType) or \
+            (Order not in self._OrderType):
+            raise AttributeError('Invalid parameter value')
+
+        return self._Map(lambda Id: self.Comments(SubjectType, Id, Order),
+            SubjectIds, max_workers)
+
     def CommentCreate(self, SubjectType, SubjectId, **kwargs):
         """
         input:
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        prometheus
+# Purpose:     Client metrics in the Prometheus text exposition format
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import bisect
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from instrument import Hook
+
+
+# Upper bounds (seconds) of the request duration buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _Escape(value):
+    if isinstance(value, str):
+        value = value.decode('utf-8', 'replace')
+    return unicode(value).replace('\\', '\\\\').replace('\n', '\\n').replace(
+        '"', '\\"')
+
+
+def _Number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _Labels(names, values):
+    if not names:
+        return ''
+    return u'{' + u','.join(u'{0}="{1}"'.format(name, _Escape(value))
+        for name, value in zip(names, values)) + u'}'
+
+
+class MetricsHook(Hook):
+    """instrument.Hook counting calls for the Exporter.
+
+    After() only increments a few counters under a lock; the text is
+    built when the metrics are scraped.
+    """
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # (endpoint, method, status, source) -> count
+        self.requests = {}
+        # (endpoint, error class) -> count
+        self.errors = {}
+        # endpoint -> [bucket counts, sum, count]
+        self.durations = {}
+        # (endpoint, phase) -> seconds
+        self.phases = {}
+        # endpoint -> retries, request bytes, response bytes
+        self.retries = {}
+        self.request_bytes = {}
+        self.response_bytes = {}
+        self.reauthorizations = 0
+
+    def After(self, trace):
+        endpoint = trace.endpoint
+        status = '' if trace.status is None else trace.status
+        key = (endpoint, trace.method, status, trace.source)
+        bucket = bisect.bisect_left(self.buckets, trace.elapsed)
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if trace.error is not None:
+                key = (endpoint, type(trace.error).__name__)
+                self.errors[key] = self.errors.get(key, 0) + 1
+            duration = self.durations.get(endpoint)
+            if duration is None:
+                duration = self.durations[endpoint] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0]
+            duration[0][bucket] += 1
+            duration[1] += trace.elapsed
+            duration[2] += 1
+            for phase, seconds in trace.phases.iteritems():
+                key = (endpoint, phase)
+                self.phases[key] = self.phases.get(key, 0.0) + seconds
+            if trace.attempts > 1:
+                self.retries[endpoint] = (self.retries.get(endpoint, 0) +
+                    trace.attempts - 1)
+            self.request_bytes[endpoint] = (
+                self.request_bytes.get(endpoint, 0) + trace.request_bytes)
+            self.response_bytes[endpoint] = (
+                self.response_bytes.get(endpoint, 0) + trace.response_bytes)
+            if trace.reauthorized:
+                self.reauthorizations += 1
+
+    def Snapshot(self):
+        with self._lock:
+            return {
+                'requests': dict(self.requests),
+                'errors': dict(self.errors),
+                'durations': dict((endpoint, (list(value[0]), value[1],
+                    value[2])) for endpoint, value in
+                    self.durations.iteritems()),
+                'phases': dict(self.phases),
+                'retries': dict(self.retries),
+                'request_bytes': dict(self.request_bytes),
+                'response_bytes': dict(self.response_bytes),
+                'reauthorizations': self.reauthorizations,
+            }
+
+
+class _Writer(object):
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.lines = []
+
+    def Metric(self, name, kind, text, labels=(), samples=()):
+        """samples: (label values, value) pairs, or (suffix, label names,
+        label values, value) for histogram series.
+        """
+        name = self.prefix + name
+        self.lines.append('# HELP {0} {1}'.format(name, text))
+        self.lines.append('# TYPE {0} {1}'.format(name, kind))
+        for sample in samples:
+            if len(sample) == 2:
+                suffix, names, (values, value) = '', labels, sample
+            else:
+                suffix, names, values, value = sample
+            self.lines.append(u'{0}{1}{2} {3}'.format(name, suffix,
+                _Labels(names, values), _Number(value)))
+
+    def Text(self):
+        return u'\n'.join(self.lines) + u'\n'
+
+
+class Exporter(object):
+    """Prometheus metrics of a Megaplan (or AsyncMegaplan) client.
+
+    Adds a MetricsHook to mplan.hooks. Render() returns the metrics in the
+    text exposition format: requests by endpoint, method, status and
+    source (network, cache, coalesced), errors, a request duration
+    histogram, phase times, retries, re-authorizations and byte counts,
+    and, read when rendered, the response cache, coalescing, connection
+    pool and rate limiter counters. Serve() answers scrapes over HTTP.
+
+        exporter = Exporter(mplan)
+        exporter.Serve(9464)
+    """
+    def __init__(self, mplan, prefix='megaplan_', buckets=BUCKETS):
+        self.mplan = mplan
+        self.prefix = prefix
+        self.hook = MetricsHook(buckets)
+        mplan.hooks = list(mplan.hooks) + [self.hook]
+        self._server = None
+
+    def Close(self):
+        """Stops collecting and serving.
+        """
+        if self.hook in self.mplan.hooks:
+            self.mplan.hooks = [hook for hook in self.mplan.hooks
+                if hook is not self.hook]
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _Calls(self, out):
+        data = self.hook.Snapshot()
+        out.Metric('requests_total', 'counter', 'API calls.',
+            ('endpoint', 'method', 'status', 'source'),
+            sorted(data['requests'].items()))
+        out.Metric('request_errors_total', 'counter', 'Failed API calls.',
+            ('endpoint', 'error'), sorted(data['errors'].items()))
+
+        samples = []
+        labels = ('endpoint', 'le')
+        bounds = self.hook.buckets + (float('inf'),)
+        for endpoint, (counts, total, count) in sorted(
+            data['durations'].items()):
+            cumulative = 0
+            for bound, bucket in zip(bounds, counts):
+                cumulative += bucket
+                samples.append(('_bucket', labels,
+                    (endpoint, _Number(bound)), cumulative))
+            samples.append(('_sum', ('endpoint',), (endpoint,), total))
+            samples.append(('_count', ('endpoint',), (endpoint,), count))
+        out.Metric('request_duration_seconds', 'histogram',
+            'Duration of API calls, retries included.', samples=samples)
+
+        out.Metric('request_phase_seconds_total', 'counter',
+            'Seconds spent in each phase of API calls.', ('endpoint', 'phase'),
+            sorted(data['phases'].items()))
+        out.Metric('request_retries_total', 'counter',
+            'Repeated attempts of API calls.', ('endpoint',),
+            sorted(((endpoint,), count)
+                for endpoint, count in data['retries'].items()))
+        out.Metric('reauthorizations_total', 'counter',
+            'Logins made again after the API rejected the key.',
+            samples=[((), data['reauthorizations'])])
+        out.Metric('request_bytes_total', 'counter', 'Request body bytes.',
+            ('endpoint',), sorted(((endpoint,), count)
+                for endpoint, count in data['request_bytes'].items()))
+        out.Metric('response_bytes_total', 'counter',
+            'Response body bytes as received.', ('endpoint',),
+            sorted(((endpoint,), count)
+                for endpoint, count in data['response_bytes'].items()))
+
+    def _Components(self, out):
+        mplan = self.mplan
+        cache = mplan.cache
+        if cache is not None:
+            stats = cache.Stats()
+            out.Metric('cache_events_total', 'counter',
+                'Response cache lookups and removals.', ('event',),
+                [((event,), stats[event]) for event in
+                    ('hits', 'misses', 'expired', 'evicted', 'invalidated')])
+            out.Metric('cache_entries', 'gauge', 'Cached responses.',
+                samples=[((), stats['size'])])
+
+        single_flight = mplan.single_flight
+        if single_flight is not None:
+            stats = single_flight.Stats()
+            out.Metric('coalesced_total', 'counter',
+                'GET calls that waited for an identical call in flight.',
+                samples=[((), stats['coalesced'])])
+            out.Metric('in_flight', 'gauge', 'GET calls in flight.',
+                samples=[((), stats['in_flight'])])
+
+        pools = sorted(mplan._client.PoolStats().items())
+        names = lambda key: '{0}://{1}:{2}'.format(*key)
+        out.Metric('pool_connections', 'gauge',
+            'Pooled connections by state.', ('pool', 'state'),
+            [((names(key), state), stats[state])
+                for key, stats in pools for state in ('active', 'idle')])
+        out.Metric('pool_events_total', 'counter',
+            'Connection pool events.', ('pool', 'event'),
+            [((names(key), event), stats[event]) for key, stats in pools
+                for event in ('created', 'reused', 'stale', 'expired',
+                    'discarded', 'reconnected')])
+        out.Metric('pool_size', 'gauge', 'Connections kept per pool.',
+            samples=[((), mplan._client.pool_size)])
+
+        rate_limiter = mplan.rate_limiter
+        if rate_limiter is not None:
+            stats = rate_limiter.Stats()
+            out.Metric('rate_limit_requests_per_second', 'gauge',
+                'Current request rate of the rate limiter.',
+                samples=[((), stats['rate'])])
+            out.Metric('rate_limit_events_total', 'counter',
+                'Requests through the rate limiter.', ('event',),
+                [((event,), stats[event])
+                    for event in ('requests', 'delayed', 'throttled')])
+
+    def Render(self):
+        out = _Writer(self.prefix)
+        self._Calls(out)
+        self._Components(out)
+        return out.Text()
+
+    def Serve(self, port=9464, address=''):
+        """Serves Render() on http://address:port/metrics from a daemon
+        thread; returns the server.
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = exporter.Render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self._server = Server((address, port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self._server
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        ratelimit
+# Purpose:     Client-side request rate limiting
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import threading
+import time
+
+
+class RateLimiter(object):
+    """Token bucket shared by every thread that sends through a client.
+
+    Allows `rate` requests per second on average and bursts of up to `burst`
+    requests. A throttling answer (429 or any 5xx) multiplies the current
+    rate by `backoff` (but not below `min_rate`) and honours Retry-After;
+    every successful answer then brings it back up by `recovery` * rate.
+    """
+    def __init__(self, rate=10.0, burst=None, min_rate=0.5, backoff=0.5,
+        recovery=0.05):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self.min_rate = min(float(min_rate), self.rate)
+        self.backoff = backoff
+        self.recovery = recovery
+
+        self._lock = threading.Lock()
+        self._rate = self.rate
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._blocked_until = 0.0
+        self._stats = {'requests': 0, 'delayed': 0, 'throttled': 0,
+            'waited': 0.0}
+
+    def _Refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self._rate)
+            self._updated = now
+
+    def Reserve(self):
+        """Takes a token and returns how many seconds the caller has to wait
+        before using it.
+        """
+        with self._lock:
+            now = time.time()
+            self._Refill(now)
+            # The balance may go negative: later callers queue up behind the
+            # tokens that are already promised.
+            self._tokens -= 1
+            delay = 0.0
+            if self._tokens < 0:
+                delay = -self._tokens / self._rate
+            delay = max(delay, self._blocked_until - now)
+            self._stats['requests'] += 1
+            if delay > 0:
+                self._stats['delayed'] += 1
+                self._stats['waited'] += delay
+            return delay
+
+    def Acquire(self):
+        """Blocks until a request may be sent.
+        """
+        delay = self.Reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def Feedback(self, status, retry_after=None):
+        """Adjusts the rate to the status of a response.
+        """
+        with self._lock:
+            now = time.time()
+            if status == 429 or status >= 500:
+                self._Refill(now)
+                self._rate = max(self.min_rate, self._rate * self.backoff)
+                self._tokens = min(self._tokens, 0.0)
+                self._stats['throttled'] += 1
+                try:
+                    retry_after = float(retry_after)
+                except (TypeError, ValueError):
+                    retry_after = 0.0
+                if retry_after > 0:
+                    self._blocked_until = max(self._blocked_until,
+                        now + retry_after)
+            elif status < 400 and self._rate < self.rate:
+                self._Refill(now)
+                self._rate = min(self.rate,
+                    self._rate + self.rate * self.recovery)
+
+    def Stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['rate'] = self._rate
+        return stats
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        records
+# Purpose:     Compact records for tasks, projects, employees and comments
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import threading
+import weakref
+from datetime import date, datetime
+
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+
+class Ref(object):
+    """object(Id, Name) of a response.
+
+    Refs are interned: every Ref with the same Id and Name is one shared
+    object as long as anything refers to it, so they must not be changed.
+    """
+    __slots__ = ('Id', 'Name', '__weakref__')
+
+    _pool = weakref.WeakValueDictionary()
+    _lock = threading.Lock()
+
+    def __new__(cls, Id, Name=None):
+        key = (Id, Name)
+        with cls._lock:
+            ref = cls._pool.get(key)
+            if ref is None:
+                ref = object.__new__(cls)
+                ref.Id, ref.Name = Id, Name
+                cls._pool[key] = ref
+        return ref
+
+    @classmethod
+    def FromDict(cls, value):
+        """Ref of {Id, Name}; other values (None, objects with more fields)
+        are returned as they are.
+        """
+        if isinstance(value, dict) and 'Id' in value and len(value) <= 2:
+            if len(value) == 1 or 'Name' in value:
+                return cls(value['Id'], value.get('Name'))
+        return value
+
+    def AsDict(self):
+        return {'Id': self.Id, 'Name': self.Name}
+
+    def __getitem__(self, key):
+        if key not in self.__slots__[:2]:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return 'Ref({0!r}, {1!r})'.format(self.Id, self.Name)
+
+
+def _ParseDate(value):
+    if not isinstance(value, basestring):
+        return value
+    try:
+        if len(value) == 10:
+            return datetime.strptime(value, DATE_FORMAT).date()
+        return datetime.strptime(value, DATETIME_FORMAT)
+    except ValueError:
+        return value
+
+
+def _FormatDate(value):
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    if isinstance(value, date):
+        return value.strftime(DATE_FORMAT)
+    return value
+
+
+class _LazyDate(object):
+    """Field kept as the string of the response until it is first read,
+    then as a datetime (date for date-only values).
+    """
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot, None)
+        if isinstance(value, basestring):
+            value = _ParseDate(value)
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+
+class _RecordType(type):
+    """Builds __slots__ of a record from its field lists.
+    """
+    def __new__(mcs, name, bases, attrs):
+        if '__slots__' not in attrs:
+            dates = attrs.get('_dates', ())
+            attrs['__slots__'] = (attrs.get('_fields', ()) +
+                attrs.get('_refs', ()) + attrs.get('_ref_lists', ()) +
+                tuple('_' + field for field in dates))
+            for field in dates:
+                attrs[field] = _LazyDate('_' + field)
+        return type.__new__(mcs, name, bases, attrs)
+
+
+class Record(object):
+    """Record of a response with a slot per known field.
+
+    _fields are kept as they are, _refs become Ref, _ref_lists lists of
+    Ref and _dates are parsed on first access. Fields missing from the
+    response read as None; unknown fields are kept in a dict. Records
+    can be read as dicts too (record['Owner']['Id'], record.get('Id')).
+    """
+    __metaclass__ = _RecordType
+    __slots__ = ('_extra',)
+
+    _fields = ()
+    _refs = ()
+    _ref_lists = ()
+    _dates = ()
+    # Repeated string values (statuses, types) kept once.
+    _interned = ()
+    _values = {}
+
+    @classmethod
+    def FromDict(cls, data):
+        record = cls.__new__(cls)
+        extra = None
+        for key, value in data.iteritems():
+            if key in cls._refs:
+                value = Ref.FromDict(value)
+            elif key in cls._ref_lists:
+                if isinstance(value, list):
+                    value = [Ref.FromDict(item) for item in value]
+            elif key in cls._interned:
+                value = cls._values.setdefault(value, value)
+            elif key in cls._dates:
+                key = '_' + key
+            elif key not in cls._fields:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+                continue
+            setattr(record, key, value)
+        record._extra = extra
+        return record
+
+    def _Fields(self):
+        cls = type(self)
+        return cls._fields + cls._refs + cls._ref_lists + cls._dates
+
+    def AsDict(self):
+        """The record as the dict it was built from.
+        """
+        data = {}
+        for key in self._Fields():
+            slot = '_' + key if key in self._dates else key
+            try:
+                value = object.__getattribute__(self, slot)
+            except AttributeError:
+                continue
+            if isinstance(value, Ref):
+                value = value.AsDict()
+            elif key in self._ref_lists and isinstance(value, list):
+                value = [item.AsDict() if isinstance(item, Ref) else item
+                    for item in value]
+            elif key in self._dates:
+                value = _FormatDate(value)
+            data[key] = value
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def __getattr__(self, name):
+        # Called for unset slots and unknown names only.
+        if name in self._Fields():
+            return None
+        extra = object.__getattribute__(self, '_extra')
+        if extra and name in extra:
+            return extra[name]
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        if key in self._Fields():
+            return getattr(self, key)
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def __repr__(self):
+        return '{0}(Id={1!r}, Name={2!r})'.format(type(self).__name__,
+            getattr(self, 'Id', None), getattr(self, 'Name', None))
+
+
+class Task(Record):
+    _fields = ('Id', 'Name', 'Statement', 'Status', 'DeadlineType', 'Favorite')
+    _refs = ('Owner', 'Responsible', 'Severity', 'SuperTask', 'Project')
+    _ref_lists = ('Executors', 'Auditors')
+    _dates = ('Deadline', 'TimeCreated', 'TimeUpdated')
+    _interned = ('Status', 'DeadlineType')
+
+
+class Project(Record):
+    _fields = ('Id', 'Name', 'Statement', 'Status', 'DeadlineType', 'Favorite')
+    _refs = ('Owner', 'Responsible', 'Severity', 'SuperProject')
+    _ref_lists = ('Executors', 'Auditors')
+    _dates = ('Deadline', 'TimeCreated', 'TimeUpdated')
+    _interned = ('Status', 'DeadlineType')
+
+
+class Employee(Record):
+    _fields = ('Id', 'Name', 'LastName', 'FirstName', 'MiddleName', 'Gender',
+        'Phones', 'Email', 'Avatar', 'Photo')
+    _refs = ('Position', 'Department', 'Status')
+    _ref_lists = ('ChiefsWithoutMe', 'SubordinatesWithoutMe', 'Coordinators')
+    _dates = ('Birthday', 'AppearanceDay', 'FireDay', 'TimeCreated')
+    _interned = ('Gender',)
+
+
+class Comment(Record):
+    _fields = ('Id', 'Text', 'Work', 'Avatar', 'SubjectType', 'SubjectId')
+    _refs = ('Author',)
+    _dates = ('WorkDate', 'TimeCreated')
+    _interned = ('SubjectType',)
+
+
+# Record type of the items under each key of response data.
+RECORDS = {
+    'task': Task,
+    'tasks': Task,
+    'project': Project,
+    'projects': Project,
+    'employee': Employee,
+    'employees': Employee,
+    'comment': Comment,
+    'comments': Comment,
+}
+
+
+def Convert(data):
+    """Replaces the tasks, projects, employees and comments of response
+    data (a card or a list) with records in place; returns data.
+    """
+    if isinstance(data, dict):
+        for key, value in data.iteritems():
+            cls = RECORDS.get(key)
+            if cls is None:
+                continue
+            if isinstance(value, list):
+                data[key] = [cls.FromDict(item) if isinstance(item, dict)
+                    else item for item in value]
+            elif isinstance(value, dict):
+                data[key] = cls.FromDict(value)
+    return data
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        replica
+# Purpose:     Local SQLite replica of tasks, projects, comments and employees
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import json
+import sqlite3
+import threading
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS employees (
+    Id INTEGER PRIMARY KEY,
+    Name TEXT,
+    Department INTEGER,
+    Position INTEGER,
+    Email TEXT,
+    TimeCreated TEXT,
+    Data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS employees_Department ON employees (Department);
+
+CREATE TABLE IF NOT EXISTS projects (
+    Id INTEGER PRIMARY KEY,
+    Name TEXT,
+    Status TEXT,
+    Deadline TEXT,
+    Owner INTEGER REFERENCES employees (Id),
+    Responsible INTEGER REFERENCES employees (Id),
+    SuperProject INTEGER REFERENCES projects (Id),
+    TimeCreated TEXT,
+    TimeUpdated TEXT,
+    Data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS projects_Status ON projects (Status);
+CREATE INDEX IF NOT EXISTS projects_Owner ON projects (Owner);
+CREATE INDEX IF NOT EXISTS projects_Responsible ON projects (Responsible);
+CREATE INDEX IF NOT EXISTS projects_SuperProject ON projects (SuperProject);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    Id INTEGER PRIMARY KEY,
+    Name TEXT,
+    Status TEXT,
+    Deadline TEXT,
+    Owner INTEGER REFERENCES employees (Id),
+    Responsible INTEGER REFERENCES employees (Id),
+    Project INTEGER REFERENCES projects (Id),
+    SuperTask INTEGER REFERENCES tasks (Id),
+    Severity INTEGER,
+    TimeCreated TEXT,
+    TimeUpdated TEXT,
+    Data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_Status ON tasks (Status);
+CREATE INDEX IF NOT EXISTS tasks_Deadline ON tasks (Deadline);
+CREATE INDEX IF NOT EXISTS tasks_Owner ON tasks (Owner);
+CREATE INDEX IF NOT EXISTS tasks_Responsible ON tasks (Responsible);
+CREATE INDEX IF NOT EXISTS tasks_Project ON tasks (Project);
+CREATE INDEX IF NOT EXISTS tasks_SuperTask ON tasks (SuperTask);
+
+CREATE TABLE IF NOT EXISTS comments (
+    Id INTEGER PRIMARY KEY,
+    SubjectType TEXT,
+    SubjectId INTEGER,
+    Author INTEGER REFERENCES employees (Id),
+    Work INTEGER,
+    WorkDate TEXT,
+    TimeCreated TEXT,
+    Data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS comments_Subject ON comments (SubjectType, SubjectId);
+CREATE INDEX IF NOT EXISTS comments_Author ON comments (Author);
+'''
+
+
+def _Ref(value):
+    """Id of an object(Id, Name) field.
+    """
+    if isinstance(value, dict):
+        return value.get('Id')
+    return value
+
+
+class Replica(object):
+    """Tasks, projects, comments and employees mirrored into SQLite.
+
+    Each table is keyed by Id and keeps the record as JSON (Data) next to
+    indexed columns for Owner, Responsible, Project, SuperTask and the other
+    fields that lists are filtered by. Foreign keys are declared but not
+    enforced, since records arrive in any order. Upserts of a batch run in
+    one transaction; the read methods answer from the local database only.
+
+        replica = Replica('megaplan.db')
+        replica.Pull(mplan)
+        replica.Tasks(Responsible=1000005, Status='actual')
+    """
+    COLUMNS = {
+        'employees': ('Id', 'Name', 'Department', 'Position', 'Email',
+            'TimeCreated'),
+        'projects': ('Id', 'Name', 'Status', 'Deadline', 'Owner',
+            'Responsible', 'SuperProject', 'TimeCreated', 'TimeUpdated'),
+        'tasks': ('Id', 'Name', 'Status', 'Deadline', 'Owner', 'Responsible',
+            'Project', 'SuperTask', 'Severity', 'TimeCreated', 'TimeUpdated'),
+        'comments': ('Id', 'SubjectType', 'SubjectId', 'Author', 'Work',
+            'WorkDate', 'TimeCreated'),
+    }
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def Close(self):
+        with self._lock:
+            self._db.close()
+
+    def _Upsert(self, table, records, extra=None):
+        columns = self.COLUMNS[table]
+        sql = 'INSERT OR REPLACE INTO {0} ({1}, Data) VALUES ({2})'.format(
+            table, ', '.join(columns), ', '.join('?' * (len(columns) + 1)))
+        rows = []
+        for record in records:
+            if not isinstance(record, dict):
+                record = record.AsDict()
+            if extra:
+                record = dict(record, **extra)
+            rows.append([_Ref(record.get(column)) for column in columns] +
+                [json.dumps(record)])
+        with self._lock:
+            with self._db:
+                self._db.executemany(sql, rows)
+        return len(rows)
+
+    def UpsertEmployees(self, records):
+        return self._Upsert('employees', records)
+
+    def UpsertProjects(self, records):
+        return self._Upsert('projects', records)
+
+    def UpsertTasks(self, records):
+        return self._Upsert('tasks', records)
+
+    def UpsertComments(self, SubjectType, SubjectId, records):
+        return self._Upsert('comments', records,
+            {'SubjectType': SubjectType, 'SubjectId': SubjectId})
+
+    def Delete(self, table, ids):
+        if table not in self.COLUMNS:
+            raise ValueError('Unknown table "{0}"'.format(table))
+        sql = 'DELETE FROM {0} WHERE Id = ?'.format(table)
+        with self._lock:
+            with self._db:
+                self._db.executemany(sql, [(Id,) for Id in ids])
+
+    def Apply(self, changes):
+        """Applies a sync.ChangeSet of tasks or projects.
+        """
+        self._Upsert(changes.Entity, changes.Upserts)
+        self.Delete(changes.Entity, changes.Deletes)
+
+    def Pull(self, mplan, comments=False, page_size=100):
+        """Loads employees, projects and tasks (and their comments if asked)
+        from the API into the replica.
+        """
+        self.UpsertEmployees(mplan.IterEmployees(page_size=page_size))
+        self.UpsertProjects(mplan.IterProjects(page_size=page_size))
+        task_ids = []
+        batch = []
+        for task in mplan.IterTasks(page_size=page_size):
+            task_ids.append(task['Id'])
+            batch.append(task)
+            if len(batch) >= page_size:
+                self.UpsertTasks(batch)
+                batch = []
+        self.UpsertTasks(batch)
+        if comments:
+            for item in mplan.CommentLists('task', task_ids):
+                if not item.Ok:
+                    raise item.Error
+                self.UpsertComments('task', item.Id,
+                    item.Result.data['comments'])
+
+    def _Select(self, table, filters, OrderBy='Id', Limit=None, Offset=0):
+        columns = self.COLUMNS[table]
+        if OrderBy not in columns:
+            raise ValueError('Unknown column "{0}"'.format(OrderBy))
+        where, args = [], []
+        for column, value in filters:
+            if value is None:
+                continue
+            if column == 'Search':
+                if isinstance(value, str):
+                    value = value.decode('utf-8')
+                where.append('Name LIKE ?')
+                args.append(u'%{0}%'.format(value))
+            elif isinstance(value, (list, tuple, set)):
+                value = list(value)
+                where.append('{0} IN ({1})'.format(column,
+                    ', '.join('?' * len(value))))
+                args.extend(value)
+            else:
+                where.append('{0} = ?'.format(column))
+                args.append(value)
+        sql = 'SELECT Data FROM {0}'.format(table)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY {0}'.format(OrderBy)
+        if Limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            args.extend((Limit, Offset))
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _Get(self, table, Id):
+        records = self._Select(table, [('Id', Id)])
+        return records[0] if records else None
+
+    def Tasks(self, Status=None, Owner=None, Responsible=None, Project=None,
+        SuperTask=None, Search=None, OrderBy='Id', Limit=None, Offset=0):
+        """Tasks matching every filter that is not None; a filter may be a
+        list of values.
+        """
+        return self._Select('tasks', [('Status', Status), ('Owner', Owner),
+            ('Responsible', Responsible), ('Project', Project),
+            ('SuperTask', SuperTask), ('Search', Search)],
+            OrderBy, Limit, Offset)
+
+    def Task(self, Id):
+        return self._Get('tasks', Id)
+
+    def Projects(self, Status=None, Owner=None, Responsible=None,
+        SuperProject=None, Search=None, OrderBy='Id', Limit=None, Offset=0):
+        return self._Select('projects', [('Status', Status), ('Owner', Owner),
+            ('Responsible', Responsible), ('SuperProject', SuperProject),
+            ('Search', Search)], OrderBy, Limit, Offset)
+
+    def Project(self, Id):
+        return self._Get('projects', Id)
+
+    def Employees(self, Department=None, Search=None, OrderBy='Name',
+        Limit=None, Offset=0):
+        return self._Select('employees', [('Department', Department),
+            ('Search', Search)], OrderBy, Limit, Offset)
+
+    def Employee(self, Id):
+        return self._Get('employees', Id)
+
+    def Comments(self, SubjectType, SubjectId, Author=None, OrderBy='Id'):
+        return self._Select('comments', [('SubjectType', SubjectType),
+            ('SubjectId', SubjectId), ('Author', Author)], OrderBy)
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
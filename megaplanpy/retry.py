@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        retry
+# Purpose:     Retry policy for API calls
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import random
+import time
+
+
+class RetryPolicy(object):
+    """When and how often a failed call is sent again.
+
+    Calls to the read endpoints (READ_ENDPOINTS) are retried on connection
+    errors and on the STATUSES answers, up to max_attempts in total. Waits
+    grow as backoff * 2 ** (attempt - 1), capped at max_backoff, and are
+    shortened by a random share of up to `jitter`. No attempt is started
+    once `deadline` seconds have passed since the first one.
+
+    Writes are not retried unless asked: writes=True retries every POST,
+    a sequence of endpoints (e.g. ('Task/create.api', 'Comment/create.api'))
+    retries just those.
+    """
+    READ_ENDPOINTS = ('list.api', 'card.api', 'availableActions.api')
+    STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=10.0,
+        jitter=0.5, deadline=None, writes=False):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.deadline = deadline
+        self.writes = writes
+
+    def IsRetryable(self, uri, body=''):
+        path = uri.split('?', 1)[0]
+        if body:
+            if self.writes is True:
+                return True
+            return bool(self.writes) and path.endswith(tuple(self.writes))
+        return path.endswith(self.READ_ENDPOINTS)
+
+    def Delay(self, attempt):
+        """Returns the pause before attempt + 1.
+        """
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+    def Next(self, attempt, started):
+        """Returns the pause before the next attempt, or None if the call
+        must not be retried any more.
+        """
+        if attempt >= self.max_attempts:
+            return None
+        delay = self.Delay(attempt)
+        if self.deadline is not None and \
+            time.time() + delay - started >= self.deadline:
+            return None
+        return delay
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
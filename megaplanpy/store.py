@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        store
+# Purpose:     Key-value stores for state kept between calls and processes
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import json
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class MemoryStore(object):
+    """Values kept in memory, shared by the threads of one process.
+    """
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def Get(self, key, default=None):
+        with self._lock:
+            return self._data.get(key, default)
+
+    def Set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+    def Delete(self, key, value=None):
+        """Removes key; if value is given, only while key still holds it.
+        """
+        with self._lock:
+            if value is None or self._data.get(key) == value:
+                self._data.pop(key, None)
+
+
+class FileStore(object):
+    """JSON-serializable values kept in a file, shared between processes.
+
+    Every change rewrites the file atomically under an exclusive lock on
+    path + '.lock' (where fcntl is available), so concurrent processes
+    neither lose updates nor read a half-written file. The file is created
+    readable by its owner only.
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._lock = threading.Lock()
+
+    def _Lock(self):
+        if fcntl is None:
+            return None
+        lock = open(self.path + '.lock', 'a')
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        return lock
+
+    def _Unlock(self, lock):
+        if lock is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+            lock.close()
+
+    def _Read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _Write(self, data):
+        fd, tmp = tempfile.mkstemp(prefix='.', dir=os.path.dirname(self.path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                json.dump(data, f)
+            if os.name == 'nt' and os.path.exists(self.path):
+                os.remove(self.path)
+            os.rename(tmp, self.path)
+        except:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _Update(self, func):
+        with self._lock:
+            lock = self._Lock()
+            try:
+                data = self._Read()
+                if func(data):
+                    self._Write(data)
+            finally:
+                self._Unlock(lock)
+
+    def Get(self, key, default=None):
+        with self._lock:
+            return self._Read().get(key, default)
+
+    def Set(self, key, value):
+        def update(data):
+            data[key] = value
+            return True
+        self._Update(update)
+
+    def Delete(self, key, value=None):
+        """Removes key; if value is given, only while key still holds it.
+        """
+        def update(data):
+            if key in data and (value is None or data[key] == value):
+                del data[key]
+                return True
+            return False
+        self._Update(update)
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
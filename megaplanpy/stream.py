@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        stream
+# Purpose:     Incremental parsing of large JSON list responses
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+import json
+import re
+
+
+class ItemStream(object):
+    """Pulls the elements of one array out of a JSON document fed in chunks.
+
+    Feed() returns the elements of the array at `path` (('data', 'tasks')
+    for a task list) completed by the chunk, each decoded on its own, so
+    only the text of the element being read is buffered. The values at the
+    `captures` paths (the response status by default) are decoded whole and
+    kept in `captured`. decoder is the json.JSONDecoder used for elements.
+    """
+    _special = re.compile(r'["{}\[\]:,]')
+    _space = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, path, captures=(('status',),), decoder=None):
+        self.path = tuple(path)
+        self.captures = set(tuple(capture) for capture in captures)
+        self.captured = {}
+        self._decode = (decoder or json.JSONDecoder()).raw_decode
+        self._buf = ''
+        self._pos = 0
+        # [container, key, expecting a key] for every open object/array.
+        self._stack = []
+        self._items_depth = None
+        self._item_expected = False
+
+    def _Path(self):
+        return tuple(entry[1] if entry[0] == '{' else '*'
+            for entry in self._stack)
+
+    def _Value(self, decode, buf, pos):
+        """Decodes the value at pos; returns (value, end) or None if the
+        buffer does not hold all of it yet.
+        """
+        pos = self._space.match(buf, pos).end()
+        try:
+            value, end = decode(buf, pos)
+        except ValueError:
+            return None
+        # A number may go on in the next chunk ('-2' of '-2.5', '1' of
+        # '1e10'): the value is whole only once what follows it is seen.
+        after = self._space.match(buf, end).end()
+        if after >= len(buf) or buf[after] not in ',]}':
+            return None
+        return value, end
+
+    def Feed(self, chunk):
+        buf = self._buf + chunk
+        items = []
+        stack = self._stack
+        find = self._special.search
+        decode = self._decode
+        pos = self._pos
+        while True:
+            if self._item_expected:
+                pos = self._space.match(buf, pos).end()
+                if pos >= len(buf):
+                    break
+                if buf[pos] != ']':
+                    value = self._Value(decode, buf, pos)
+                    if value is None:
+                        break
+                    items.append(value[0])
+                    pos = value[1]
+                    self._item_expected = False
+                    continue
+
+            match = find(buf, pos)
+            if match is None:
+                pos = len(buf)
+                break
+            i = match.start()
+            c = buf[i]
+            if c == '"':
+                j = i
+                while True:
+                    j = buf.find('"', j + 1)
+                    if j < 0:
+                        break
+                    k = j - 1
+                    while buf[k] == '\\':
+                        k -= 1
+                    if (j - k) % 2:
+                        break
+                if j < 0:
+                    pos = i
+                    break
+                top = stack[-1] if stack else None
+                if top is not None and top[0] == '{' and top[2]:
+                    top[1] = json.loads(buf[i:j + 1])
+                    top[2] = False
+                pos = j + 1
+                continue
+
+            depth = len(stack)
+            if c in '{[':
+                path = self._Path()
+                stack.append([c, None, c == '{'])
+                if c == '[' and path == self.path and \
+                    self._items_depth is None:
+                    self._items_depth = depth + 1
+                    self._item_expected = True
+            elif c == ':':
+                stack[-1][2] = False
+                path = self._Path()
+                if path in self.captures:
+                    value = self._Value(json.JSONDecoder().raw_decode, buf,
+                        i + 1)
+                    if value is None:
+                        pos = i
+                        break
+                    self.captured[path] = value[0]
+                    pos = value[1]
+                    continue
+            elif c == ',':
+                if stack[-1][0] == '{':
+                    stack[-1][2] = True
+                elif depth == self._items_depth:
+                    self._item_expected = True
+            else:
+                if depth == self._items_depth:
+                    self._items_depth = -1
+                    self._item_expected = False
+                stack.pop()
+            pos = i + 1
+
+        # Keep only the text that has not been parsed yet.
+        self._buf = buf[pos:]
+        self._pos = 0
+        return items
+
+    def Close(self):
+        """Raises ValueError if the document has been cut short.
+        """
+        if self._stack or self._buf.strip():
+            raise ValueError('Unexpected end of JSON document')
+
+
+def main():
+    pass
+
+if __name__ == '__main__':
+    main()
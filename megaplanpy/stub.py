@@ -0,0 +1,636 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+#-------------------------------------------------------------------------------
+# Name:        stub
+# Purpose:     Local stand-in of the Megaplan API for tests and benchmarks
+#
+# Created:     18.10.2026
+# Licence:     MIT
+#-------------------------------------------------------------------------------
+
+"""A local HTTP server that answers like the Megaplan API.
+
+    server = StubServer(Dataset(tasks=10000), latency=0.02)
+    server.Start()
+    mplan = server.Client()
+    mplan.TaskCard(1000001)
+    server.Stop()
+
+or from the command line:
+
+    python -m megaplanpy.stub --port 8080 --tasks 10000
+"""
+
+import base64
+import hmac
+import json
+import md5
+import random
+import socket
+import sys
+import threading
+import time
+import zlib
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from datetime import datetime, timedelta
+from hashlib import sha1
+from SocketServer import ThreadingMixIn
+from urlparse import parse_qsl, urlparse
+
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+SIGNATURE = '{method}\n{md5content}\n{contenttype}\n{date}\n{host}{uri}'
+
+STATUSES = ('actual', 'inprocess', 'new', 'overdue', 'done', 'delayed',
+    'completed', 'failed')
+
+WORDS = (u'Подготовить', u'отчет', u'по', u'проекту', u'клиента', u'договор',
+    u'Согласовать', u'смету', u'для', u'отдела', u'продаж', u'review', u'API',
+    u'релиз', u'тестирование', u'документацию')
+
+# Fields of the items of list.api; card.api returns all of them.
+LIST_FIELDS = {
+    'tasks': ('Id', 'Name', 'Status', 'Deadline', 'Owner', 'Responsible',
+        'Severity', 'SuperTask', 'Project', 'Favorite', 'TimeCreated',
+        'TimeUpdated'),
+    'projects': ('Id', 'Name', 'Status', 'Deadline', 'Owner', 'Responsible',
+        'Severity', 'SuperProject', 'Favorite', 'TimeCreated', 'TimeUpdated'),
+    'employees': ('Id', 'Name', 'LastName', 'FirstName', 'MiddleName',
+        'Position', 'Department', 'Phones', 'Email', 'Status', 'TimeCreated'),
+}
+
+
+def _Ref(item):
+    return {'Id': item['Id'], 'Name': item['Name']} if item else None
+
+
+class Dataset(object):
+    """Synthetic employees, projects, tasks and comments.
+
+    The same arguments (seed included) give the same data. statement is
+    the length of the text of every task, project and comment, which sets
+    the size of the responses.
+    """
+    def __init__(self, tasks=1000, projects=50, employees=100, comments=2,
+        statement=200, seed=0):
+        rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        now = datetime(2026, 10, 18, 12, 0, 0)
+
+        def Time(days=365):
+            return (now - timedelta(seconds=rnd.randrange(days * 86400))
+                ).strftime(TIME_FORMAT)
+
+        def Text(length):
+            words, size = [], 0
+            while size < length:
+                word = rnd.choice(WORDS)
+                words.append(word)
+                size += len(word) + 1
+            return u' '.join(words)[:length]
+
+        self.severities = [{'Id': i + 1, 'Name': name}
+            for i, name in enumerate((u'Низкая', u'Обычная', u'Высокая'))]
+        self.departments = [{'Id': i + 1, 'Name': u'Отдел {0}'.format(i + 1)}
+            for i in xrange(max(1, employees // 10))]
+        positions = [{'Id': i + 1, 'Name': u'Должность {0}'.format(i + 1)}
+            for i in xrange(10)]
+
+        self.employees = []
+        for i in xrange(max(1, employees)):
+            self.employees.append({
+                'Id': 1000000 + i,
+                'Name': u'Сотрудник {0}'.format(i),
+                'LastName': u'Сотрудник',
+                'FirstName': unicode(i),
+                'MiddleName': u'',
+                'Gender': rnd.choice(('male', 'female')),
+                'Position': _Ref(rnd.choice(positions)),
+                'Department': _Ref(rnd.choice(self.departments)),
+                'Phones': ['+7 495 {0:07d}'.format(rnd.randrange(10 ** 7))],
+                'Email': 'employee{0}@example.com'.format(i),
+                'Status': {'Id': 1, 'Name': u'Работает'},
+                'TimeCreated': Time(),
+            })
+
+        self.projects = []
+        for i in xrange(projects):
+            project = {
+                'Id': 100000 + i,
+                'Name': u'Проект {0}'.format(i),
+                'Statement': Text(statement),
+                'Status': rnd.choice(STATUSES),
+                'Deadline': Time(),
+                'DeadlineType': 'soft',
+                'Owner': _Ref(rnd.choice(self.employees)),
+                'Responsible': _Ref(rnd.choice(self.employees)),
+                'Executors': [_Ref(rnd.choice(self.employees))
+                    for _ in xrange(3)],
+                'Auditors': [_Ref(rnd.choice(self.employees))],
+                'Severity': _Ref(rnd.choice(self.severities)),
+                'SuperProject': _Ref(rnd.choice(self.projects))
+                    if self.projects and rnd.random() < 0.2 else None,
+                'Favorite': 0,
+                'TimeCreated': Time(),
+            }
+            project['TimeUpdated'] = max(project['TimeCreated'], Time(30))
+            self.projects.append(project)
+
+        self.tasks = []
+        for i in xrange(tasks):
+            task = {
+                'Id': 1000000 + i,
+                'Name': Text(rnd.randint(20, 60)),
+                'Statement': Text(statement),
+                'Status': rnd.choice(STATUSES),
+                'Deadline': Time() if rnd.random() < 0.7 else None,
+                'DeadlineType': 'soft',
+                'Owner': _Ref(rnd.choice(self.employees)),
+                'Responsible': _Ref(rnd.choice(self.employees)),
+                'Executors': [_Ref(rnd.choice(self.employees))
+                    for _ in xrange(rnd.randint(0, 3))],
+                'Auditors': [_Ref(rnd.choice(self.employees))
+                    for _ in xrange(rnd.randint(0, 2))],
+                'Severity': _Ref(rnd.choice(self.severities)),
+                'SuperTask': _Ref(rnd.choice(self.tasks))
+                    if self.tasks and rnd.random() < 0.2 else None,
+                'Project': _Ref(rnd.choice(self.projects))
+                    if self.projects else None,
+                'Favorite': int(rnd.random() < 0.1),
+                'TimeCreated': Time(),
+            }
+            task['TimeUpdated'] = max(task['TimeCreated'], Time(30))
+            self.tasks.append(task)
+
+        self.comments = []
+        for task in self.tasks:
+            for _ in xrange(comments):
+                author = rnd.choice(self.employees)
+                self.comments.append({
+                    'Id': len(self.comments) + 1,
+                    'SubjectType': 'task',
+                    'SubjectId': task['Id'],
+                    'Text': Text(statement),
+                    'Work': rnd.choice((0, 0, 15, 30, 60)),
+                    'WorkDate': Time()[:10],
+                    'TimeCreated': Time(),
+                    'Author': _Ref(author),
+                    'Avatar': '/avatars/{0}.png'.format(author['Id']),
+                })
+
+        self._index = {
+            'tasks': dict((item['Id'], item) for item in self.tasks),
+            'projects': dict((item['Id'], item) for item in self.projects),
+            'employees': dict((item['Id'], item) for item in self.employees),
+        }
+
+    def Get(self, kind, Id):
+        return self._index[kind].get(Id)
+
+    def Add(self, kind, item):
+        with self._lock:
+            items = getattr(self, kind)
+            item['Id'] = (items[-1]['Id'] + 1) if items else 1
+            items.append(item)
+            if kind in self._index:
+                self._index[kind][item['Id']] = item
+        return item
+
+    def Remove(self, kind, Id):
+        with self._lock:
+            item = self._index[kind].pop(Id)
+            getattr(self, kind).remove(item)
+        return item
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # The response goes out in one write (flushed after each request), so
+    # Nagle and delayed ACKs do not add to the latency.
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.stub._Handle(self)
+
+    do_POST = do_GET
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Reply(Exception):
+    def __init__(self, status, message, headers=None):
+        super(_Reply, self).__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class StubServer(object):
+    """Megaplan API stand-in on a local port.
+
+    Implements authorize.api and the task, project, employee, comment,
+    severity and department endpoints over a Dataset. Every other request
+    must carry an X-Authorization signed the way Megaplan._GetSignature
+    signs it (and a matching Content-MD5 for POST), otherwise it gets 401.
+
+    latency (+ up to jitter) seconds are slept before each reply.
+    error_rate of the requests fail with one of errors. rate, if set,
+    lets through that many requests per second and answers the rest with
+    429 and Retry-After. Inject() makes the next requests fail with the
+    given status, Revoke() invalidates the issued keys. stats counts what
+    the server has seen.
+    """
+    def __init__(self, dataset=None, login='stub', password='stub',
+        address='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+        errors=(500, 502, 503), rate=None, gzip=True, seed=0):
+        self.dataset = dataset if dataset is not None else Dataset()
+        self.login = login
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.errors = tuple(errors)
+        self.rate = rate
+        self.gzip = gzip
+        self._address = (address, port)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._injected = []
+        self._allowance = rate
+        self._checked = time.time()
+        self._server = None
+        self.stats = {'requests': 0, 'logins': 0, 'unauthorized': 0,
+            'throttled': 0, 'errors': 0, 'endpoints': {}}
+
+    def __enter__(self):
+        self.Start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.Stop()
+
+    def Start(self):
+        self._server = _Server(self._address, _Handler)
+        self._server.stub = self
+        thread = threading.Thread(target=self._server.serve_forever,
+            args=(0.05,))
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def Stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def host(self):
+        """'address:port' the server listens on.
+        """
+        address, port = self._server.server_address[:2]
+        return '{0}:{1}'.format(address, port)
+
+    def Client(self, **kwargs):
+        """A Megaplan pointed at this server.
+        """
+        from main import Megaplan
+        return Megaplan('stub', self.login, self.password, host=self.host,
+            scheme='http', **kwargs)
+
+    def Inject(self, status, count=1):
+        """Fails the next count requests with status.
+        """
+        with self._lock:
+            self._injected.extend([status] * count)
+
+    def Revoke(self):
+        """Invalidates the keys issued so far; the next signed requests get
+        401.
+        """
+        with self._lock:
+            self._keys.clear()
+
+    # Request handling
+
+    def _Count(self, name, endpoint=None):
+        with self._lock:
+            self.stats[name] += 1
+            if endpoint is not None:
+                endpoints = self.stats['endpoints']
+                endpoints[endpoint] = endpoints.get(endpoint, 0) + 1
+
+    def _Throttle(self):
+        """Token bucket of rate requests per second; seconds to wait or
+        None.
+        """
+        with self._lock:
+            now = time.time()
+            self._allowance = min(self.rate,
+                self._allowance + (now - self._checked) * self.rate)
+            self._checked = now
+            if self._allowance < 1.0:
+                return (1.0 - self._allowance) / self.rate
+            self._allowance -= 1.0
+        return None
+
+    def _Failure(self):
+        with self._lock:
+            if self._injected:
+                return self._injected.pop(0)
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self._random.choice(self.errors)
+        return None
+
+    def _Authorize(self, request, method, body):
+        signature = request.headers.get('X-Authorization', '')
+        access_id, _, signature = signature.partition(':')
+        with self._lock:
+            secret_key = self._keys.get(access_id)
+        if secret_key is None:
+            raise _Reply(401, 'Unknown AccessId')
+        md5content = ''
+        contenttype = ''
+        if method == 'POST':
+            md5content = request.headers.get('Content-MD5', '')
+            contenttype = 'application/x-www-form-urlencoded'
+            if md5content != md5.new(body).hexdigest():
+                raise _Reply(401, 'Content-MD5 does not match the body')
+        q = SIGNATURE.format(method=method, md5content=md5content,
+            contenttype=contenttype, date=request.headers.get('Date', ''),
+            host=request.headers.get('Host', '') + '/',
+            uri=request.path[1:])
+        h = hmac.HMAC(secret_key, q, sha1)
+        if base64.encodestring(h.hexdigest()).strip() != signature:
+            raise _Reply(401, 'Invalid signature')
+
+    def _Handle(self, request):
+        length = int(request.headers.get('Content-Length') or 0)
+        body = request.rfile.read(length) if length else ''
+        method = request.command
+        uri = urlparse(request.path)
+        endpoint = uri.path.lstrip('/')
+        params = dict(parse_qsl(uri.query))
+        params.update(parse_qsl(body))
+        self._Count('requests', endpoint)
+
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.random() * self.jitter
+        if delay:
+            time.sleep(delay)
+
+        try:
+            if self.rate:
+                wait = self._Throttle()
+                if wait is not None:
+                    self._Count('throttled')
+                    raise _Reply(429, 'Too many requests',
+                        {'Retry-After': str(max(1, int(wait + 0.999)))})
+            status = self._Failure()
+            if status is not None:
+                self._Count('errors')
+                raise _Reply(status, 'Injected error')
+            if endpoint == 'BumsCommonApiV01/User/authorize.api':
+                data = self._Login(params)
+            else:
+                self._Authorize(request, method, body)
+                handler = self._ROUTES.get(endpoint)
+                if handler is None:
+                    raise _Reply(404, 'Unknown method {0}'.format(endpoint))
+                data = handler(self, params)
+            status, headers = 200, {}
+            document = {'status': {'code': 'ok', 'message': None},
+                'data': data}
+        except _Reply as e:
+            if e.status == 401:
+                self._Count('unauthorized')
+            status, headers = e.status, e.headers
+            document = {'status': {'code': 'error', 'message': e.message}}
+        self._Send(request, status, headers, json.dumps(document))
+
+    def _Send(self, request, status, headers, text):
+        encoding = request.headers.get('Accept-Encoding', '')
+        if self.gzip and len(text) > 1024 and 'gzip' in encoding:
+            compressor = zlib.compressobj(6, zlib.DEFLATED,
+                16 + zlib.MAX_WBITS)
+            text = compressor.compress(text) + compressor.flush()
+            headers = dict(headers, **{'Content-Encoding': 'gzip'})
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(text)))
+        for name, value in headers.iteritems():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(text)
+
+    # Endpoints
+
+    def _Login(self, params):
+        self._Count('logins')
+        if params.get('Login') != self.login or params.get('Password') != \
+            md5.new(self.password).hexdigest():
+            raise _Reply(403, 'Invalid login or password')
+        with self._lock:
+            access_id = 'stub{0:08x}'.format(self._random.getrandbits(32))
+            secret_key = '{0:040x}'.format(self._random.getrandbits(160))
+            self._keys[access_id] = secret_key
+        return {'AccessId': access_id, 'SecretKey': secret_key}
+
+    def _Page(self, items, params):
+        offset = int(params.get('Offset') or 0)
+        limit = params.get('Limit')
+        if limit is not None:
+            return items[offset:offset + int(limit)]
+        return items[offset:]
+
+    def _List(self, kind, params):
+        me = self.dataset.employees[0]['Id']
+        folder = params.get('Folder', 'all')
+        status = params.get('Status', 'any')
+        search = params.get('Search', '').decode('utf-8').lower()
+        favorites = params.get('FavoritesOnly') in ('1', 'true')
+        updated = params.get('TimeUpdated')
+
+        def Match(item):
+            if status != 'any' and item['Status'] != status:
+                return False
+            if favorites and not item['Favorite']:
+                return False
+            if updated and item.get('TimeUpdated', '') < updated:
+                return False
+            if search and search not in item['Name'].lower():
+                return False
+            if folder == 'owner':
+                return item['Owner']['Id'] == me
+            if folder == 'responsible':
+                return item['Responsible']['Id'] == me
+            if folder in ('executor', 'auditor'):
+                field = 'Executors' if folder == 'executor' else 'Auditors'
+                return any(ref['Id'] == me for ref in item[field])
+            if folder == 'incoming':
+                return item['Responsible']['Id'] == me or any(
+                    ref['Id'] == me for ref in item['Executors'])
+            return True
+
+        fields = LIST_FIELDS[kind]
+        items = [item for item in getattr(self.dataset, kind) if Match(item)]
+        return {kind: [dict((field, item.get(field)) for field in fields)
+            for item in self._Page(items, params)]}
+
+    def _Card(self, kind, key, params):
+        item = self.dataset.Get(kind, int(params.get('Id') or 0))
+        if item is None:
+            raise _Reply(404, 'Not found')
+        return {key: item}
+
+    def _Model(self, params):
+        return dict((key[6:-1], value.decode('utf-8'))
+            for key, value in params.iteritems()
+            if key.startswith('Model[') and key.endswith(']'))
+
+    def _Create(self, kind, params):
+        model = self._Model(params)
+        if not model.get('Name'):
+            raise _Reply(400, 'Name is required')
+        me = _Ref(self.dataset.employees[0])
+        responsible = self.dataset.Get('employees',
+            int(model.get('Responsible') or 0))
+        now = datetime.now().strftime(TIME_FORMAT)
+        item = self.dataset.Add(kind, {
+            'Name': model['Name'],
+            'Statement': model.get('Statement', u''),
+            'Status': 'assigned' if kind == 'tasks' else 'accepted',
+            'Deadline': model.get('Deadline'),
+            'DeadlineType': model.get('DeadlineType', 'soft'),
+            'Owner': me,
+            'Responsible': _Ref(responsible) or me,
+            'Executors': [],
+            'Auditors': [],
+            'Severity': None,
+            'Favorite': 0,
+            'TimeCreated': now,
+            'TimeUpdated': now,
+        })
+        return {'Id': item['Id'], 'Name': item['Name']}
+
+    def _Edit(self, kind, params):
+        item = self.dataset.Get(kind, int(params.get('Id') or 0))
+        if item is None:
+            raise _Reply(404, 'Not found')
+        model = self._Model(params)
+        with self.dataset._lock:
+            for key in ('Name', 'Statement', 'Deadline', 'DeadlineType'):
+                if key in model:
+                    item[key] = model[key]
+            item['TimeUpdated'] = datetime.now().strftime(TIME_FORMAT)
+        return {}
+
+    def _Comments(self, params):
+        subject = (params.get('SubjectType'), int(params.get('SubjectId') or 0))
+        comments = [comment for comment in self.dataset.comments
+            if (comment['SubjectType'], comment['SubjectId']) == subject]
+        if params.get('Order') == 'desc':
+            comments.reverse()
+        return {'comments': comments}
+
+    def _CommentCreate(self, params):
+        kind = {'task': 'tasks', 'project': 'projects'}.get(
+            params.get('SubjectType'))
+        if kind is None or self.dataset.Get(kind,
+            int(params.get('SubjectId') or 0)) is None:
+            raise _Reply(404, 'Not found')
+        model = self._Model(params)
+        author = self.dataset.employees[0]
+        comment = self.dataset.Add('comments', {
+            'SubjectType': params['SubjectType'],
+            'SubjectId': int(params['SubjectId']),
+            'Text': model.get('Text', u''),
+            'Work': int(model.get('Work') or 0),
+            'WorkDate': model.get('WorkDate'),
+            'TimeCreated': datetime.now().strftime(TIME_FORMAT),
+            'Author': _Ref(author),
+            'Avatar': '/avatars/{0}.png'.format(author['Id']),
+        })
+        return comment
+
+    _ROUTES = {
+        'BumsTaskApiV01/Task/list.api':
+            lambda self, params: self._List('tasks', params),
+        'BumsTaskApiV01/Task/card.api':
+            lambda self, params: self._Card('tasks', 'task', params),
+        'BumsTaskApiV01/Task/create.api':
+            lambda self, params: self._Create('tasks', params),
+        'BumsTaskApiV01/Task/edit.api':
+            lambda self, params: self._Edit('tasks', params),
+        'BumsTaskApiV01/Severity/list.api':
+            lambda self, params: {'severities': self.dataset.severities},
+        'BumsProjectApiV01/Project/list.api':
+            lambda self, params: self._List('projects', params),
+        'BumsProjectApiV01/Project/card.api':
+            lambda self, params: self._Card('projects', 'project', params),
+        'BumsProjectApiV01/Project/create.api':
+            lambda self, params: self._Create('projects', params),
+        'BumsProjectApiV01/Project/edit.api':
+            lambda self, params: self._Edit('projects', params),
+        'BumsStaffApiV01/Employee/list.api':
+            lambda self, params: {'employees': [
+                dict((field, item.get(field))
+                    for field in LIST_FIELDS['employees'])
+                for item in self._Page(self.dataset.employees, params)]},
+        'BumsStaffApiV01/Employee/card.api':
+            lambda self, params: self._Card('employees', 'employee', params),
+        'BumsStaffApiV01/Department/list.api':
+            lambda self, params: {'departments': self.dataset.departments},
+        'BumsCommonApiV01/Comment/list.api':
+            lambda self, params: self._Comments(params),
+        'BumsCommonApiV01/Comment/create.api':
+            lambda self, params: self._CommentCreate(params),
+    }
+
+
+def main():
+    from optparse import OptionParser
+    parser = OptionParser()
+    parser.add_option('--address', default='127.0.0.1')
+    parser.add_option('--port', type='int', default=8080)
+    parser.add_option('--tasks', type='int', default=1000)
+    parser.add_option('--projects', type='int', default=50)
+    parser.add_option('--employees', type='int', default=100)
+    parser.add_option('--comments', type='int', default=2)
+    parser.add_option('--statement', type='int', default=200)
+    parser.add_option('--latency', type='float', default=0.0)
+    parser.add_option('--error-rate', type='float', default=0.0)
+    parser.add_option('--rate', type='float', default=None)
+    options, args = parser.parse_args()
+
+    dataset = Dataset(options.tasks, options.projects, options.employees,
+        options.comments, options.statement)
+    server = StubServer(dataset, address=options.address, port=options.port,
+        latency=options.latency, error_rate=options.error_rate,
+        rate=options.rate)
+    server.Start()
+    print('Megaplan stub on http://{0}/ (login {1}, password {2})'.format(
+        server.host, server.login, server.password))
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.Stop()
+
+if __name__ == '__main__':
+    main()
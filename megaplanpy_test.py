@@ -1,7 +1,39 @@
 ﻿#This file was originally generated by PyScripter's unitest wizard
 
+import base64
+import datetime
+import hmac
+import httplib
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
 import unittest
-from megaplanpy import Megaplan
+import zlib
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from hashlib import sha1
+from megaplanpy import AsyncMegaplan, Megaplan
+from megaplanpy.asyncclient import AsyncClient
+from megaplanpy.cache import ResponseCache
+from megaplanpy.cassette import CassetteMiss
+from megaplanpy.client import APIClient, ConnectionPool, Decoder
+from megaplanpy.coalesce import SingleFlight
+from megaplanpy.eventloop import Future, Loop
+from megaplanpy.instrument import Histogram, LatencyAggregator, Trace
+from megaplanpy.jsonlib import Available, Backend
+from megaplanpy.main import ClientError, DeadlineExceeded
+from megaplanpy.prometheus import Exporter
+from megaplanpy.ratelimit import RateLimiter
+from megaplanpy.retry import RetryPolicy
+from megaplanpy.records import Convert, Task
+from megaplanpy.replica import Replica
+from megaplanpy.store import FileStore, MemoryStore
+from megaplanpy.stream import ItemStream
+from megaplanpy.stub import Dataset, StubServer
+from megaplanpy.sync import IncrementalSync
 
 
 class TestMegaplan(unittest.TestCase):
@@ -13,7 +45,10 @@ class TestMegaplan(unittest.TestCase):
         login = ''
         password = ''
         self.my_name = '' # 'my name, is the same as in Megaplan'
-        self.mplan = Megaplan(account, login, password)
+        # A cassette recorded once against the account makes the tests
+        # repeatable offline.
+        self.mplan = Megaplan(account, login, password,
+            cassette=os.environ.get('MEGAPLAN_CASSETTE'))
 
     def tearDown(self):
         del self.mplan
@@ -243,5 +278,1171 @@ class TestMegaplan(unittest.TestCase):
         self.Projects()
 
 
+class FakeConnection(object):
+
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def test_Reuse(self):
+        pool = ConnectionPool(FakeConnection, maxsize=1)
+        connection, reused = pool.Acquire()
+        self.assertFalse(reused)
+        pool.Release(connection)
+        self.assertEqual(pool.Acquire(), (connection, True))
+        other, reused = pool.Acquire()
+        pool.Release(connection)
+        pool.Release(other)
+        stats = pool.Stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['reused'], 1)
+        self.assertEqual(stats['discarded'], 1)
+        self.assertEqual(stats['idle'], 1)
+
+    def test_Stale(self):
+        pool = ConnectionPool(FakeConnection)
+        connection, reused = pool.Acquire()
+        pool.Release(connection)
+        connection.peer.close()
+        fresh, reused = pool.Acquire()
+        self.assertFalse(reused)
+        self.assertNotEqual(fresh, connection)
+        self.assertEqual(pool.Stats()['stale'], 1)
+
+    def test_Expired(self):
+        pool = ConnectionPool(FakeConnection, idle_timeout=-1)
+        connection, reused = pool.Acquire()
+        pool.Release(connection)
+        self.assertFalse(pool.Acquire()[1])
+        self.assertEqual(pool.Stats()['expired'], 1)
+
+    def test_Resend(self):
+        # Answers the first request on a connection and drops the
+        # connection at the second one, as a server closing an idle
+        # keep-alive socket would.
+        seen = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle(self):
+                self.requests = 0
+                BaseHTTPRequestHandler.handle(self)
+
+            def Reply(self):
+                seen.append(self.command)
+                self.requests += 1
+                if self.requests > 1:
+                    self.close_connection = 1
+                    return
+                if self.command == 'POST':
+                    self.rfile.read(int(self.headers['Content-Length']))
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write('ok')
+
+            do_GET = do_POST = Reply
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever,
+            args=(0.05,))
+        thread.daemon = True
+        thread.start()
+        url = 'http://127.0.0.1:{0}/'.format(server.server_address[1])
+        client = APIClient()
+        try:
+            self.assertEqual(client.Request(url), 'ok')
+            # Sent again on a fresh connection.
+            self.assertEqual(client.Request(url), 'ok')
+            self.assertEqual(seen, ['GET', 'GET', 'GET'])
+            # A POST the server may have processed is not.
+            self.assertRaises((socket.error, httplib.HTTPException),
+                client.Request, url, 'a=1')
+            self.assertEqual(seen[3:], ['POST'])
+        finally:
+            client.Close()
+            server.shutdown()
+            server.server_close()
+
+
+class TestDecoder(unittest.TestCase):
+
+    BODY = '{"status": {"code": "ok"}, "data": {}}' * 100
+
+    def Decode(self, encoding, data):
+        decoder = Decoder(encoding)
+        chunks = [decoder.Decompress(data[i:i + 7])
+            for i in xrange(0, len(data), 7)]
+        return ''.join(chunks) + decoder.Flush()
+
+    def test_Gzip(self):
+        obj = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        data = obj.compress(self.BODY) + obj.flush()
+        self.assertEqual(self.Decode('gzip', data), self.BODY)
+
+    def test_Deflate(self):
+        data = zlib.compress(self.BODY)
+        self.assertEqual(self.Decode('deflate', data), self.BODY)
+        self.assertEqual(self.Decode('deflate', data[2:-4]), self.BODY)
+
+    def test_Identity(self):
+        self.assertEqual(self.Decode('', self.BODY), self.BODY)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_Burst(self):
+        limiter = RateLimiter(rate=10, burst=3)
+        delays = [limiter.Reserve() for i in xrange(5)]
+        self.assertEqual(delays[:3], [0.0] * 3)
+        self.assertAlmostEqual(delays[3], 0.1, places=2)
+        self.assertAlmostEqual(delays[4], 0.2, places=2)
+
+    def test_Feedback(self):
+        limiter = RateLimiter(rate=10, backoff=0.5, recovery=0.1)
+        limiter.Feedback(429, '2')
+        self.assertEqual(limiter.Stats()['rate'], 5.0)
+        self.assertTrue(limiter.Reserve() > 1.5)
+        limiter.Feedback(200)
+        self.assertEqual(limiter.Stats()['rate'], 6.0)
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_IsRetryable(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.IsRetryable('BumsTaskApiV01/Task/card.api?Id=1'))
+        self.assertTrue(policy.IsRetryable('BumsTaskApiV01/Task/list.api'))
+        self.assertFalse(policy.IsRetryable('BumsTaskApiV01/Task/create.api',
+            'Model%5BName%5D=x'))
+        policy = RetryPolicy(writes=('Task/create.api',))
+        self.assertTrue(policy.IsRetryable('BumsTaskApiV01/Task/create.api',
+            'Model%5BName%5D=x'))
+        self.assertFalse(policy.IsRetryable('BumsTaskApiV01/Task/edit.api',
+            'Id=1'))
+
+    def test_Next(self):
+        policy = RetryPolicy(max_attempts=3, backoff=1, jitter=0)
+        self.assertEqual(policy.Next(1, time.time()), 1)
+        self.assertEqual(policy.Next(2, time.time()), 2)
+        self.assertEqual(policy.Next(3, time.time()), None)
+        policy.deadline = 1.5
+        self.assertEqual(policy.Next(2, time.time()), None)
+
+
+class TestSignature(unittest.TestCase):
+
+    def test_GetHeaders(self):
+        mplan = Megaplan('account', 'login', 'password')
+        mplan._credentials = ('id', 'secret', mplan._GetSigner('secret'))
+        uri = 'BumsTaskApiV01/Task/card.api?Id=1'
+        headers = mplan._GetHeaders(uri)
+        q = 'GET\n\n\n{0}\naccount.megaplan.ru/{1}'.format(headers['Date'], uri)
+        signature = base64.encodestring(
+            hmac.HMAC('secret', q, sha1).hexdigest()).strip()
+        self.assertEqual(headers['X-Authorization'], 'id:' + signature)
+        self.assertEqual(mplan._RfcDateNow(), headers['Date'])
+
+
+class TestStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def Check(self, store):
+        self.assertEqual(store.Get('acc:login'), None)
+        store.Set('acc:login', ['id', 'key'])
+        self.assertEqual(store.Get('acc:login'), ['id', 'key'])
+        store.Delete('acc:login', ['old', 'key'])
+        self.assertEqual(store.Get('acc:login'), ['id', 'key'])
+        store.Delete('acc:login', ['id', 'key'])
+        self.assertEqual(store.Get('acc:login'), None)
+
+    def test_MemoryStore(self):
+        self.Check(MemoryStore())
+
+    def test_FileStore(self):
+        path = os.path.join(self.dir, 'tokens.json')
+        self.Check(FileStore(path))
+        FileStore(path).Set('acc:login', ['id', 'key'])
+        self.assertEqual(FileStore(path).Get('acc:login'), ['id', 'key'])
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(
+            {'Staff/Employee/list.api': 60, 'Staff/Department/list.api': 60},
+            {'Staff/Employee/': ('Staff/Employee/', 'Staff/Department/')},
+            maxsize=2)
+
+    def test_GetSet(self):
+        self.cache.Set('Staff/Employee/list.api?Department=1', 'a')
+        self.cache.Set('Task/Task/card.api?Id=1', 'b')
+        self.assertEqual(
+            self.cache.Get('Staff/Employee/list.api?Department=1'), 'a')
+        self.assertEqual(self.cache.Get('Task/Task/card.api?Id=1'), None)
+        self.assertEqual(
+            self.cache.Get('Staff/Employee/list.api?Department=2'), None)
+        stats = self.cache.Stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']),
+            (1, 1, 1))
+
+    def test_LRU(self):
+        self.cache.Set('Staff/Employee/list.api?Department=1', 'a')
+        self.cache.Set('Staff/Employee/list.api?Department=2', 'b')
+        self.cache.Get('Staff/Employee/list.api?Department=1')
+        self.cache.Set('Staff/Department/list.api', 'c')
+        self.assertEqual(
+            self.cache.Get('Staff/Employee/list.api?Department=2'), None)
+        self.assertEqual(
+            self.cache.Get('Staff/Employee/list.api?Department=1'), 'a')
+
+    def test_Expired(self):
+        self.cache.ttl['Staff/Department/list.api'] = 0
+        self.cache.Set('Staff/Department/list.api', 'c')
+        self.assertEqual(self.cache.Get('Staff/Department/list.api'), None)
+
+    def test_Written(self):
+        self.cache.Set('Staff/Employee/list.api', 'a')
+        self.cache.Set('Staff/Department/list.api', 'c')
+        self.cache.Written('Staff/Employee/edit.api')
+        self.assertEqual(self.cache.Stats()['size'], 0)
+
+    def test_Generation(self):
+        uri = 'Staff/Employee/list.api'
+        generation = self.cache.Generation(uri)
+        self.cache.Invalidate('Task/')
+        self.cache.Set(uri, 'a', generation)
+        self.assertEqual(self.cache.Get(uri), 'a')
+        # Fetched before a write that is done by now.
+        generation = self.cache.Generation(uri)
+        self.cache.Written('Staff/Employee/edit.api')
+        self.cache.Set(uri, 'b', generation)
+        self.assertEqual(self.cache.Get(uri), None)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_Do(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls, results = [], []
+
+        def func():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return object()
+
+        def worker():
+            results.append(flight.Do('card.api?Id=1', func))
+
+        threads = [threading.Thread(target=worker) for i in xrange(5)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        while flight.Stats()['coalesced'] < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(map(id, results))), 1)
+        self.assertEqual(flight.Stats(),
+            {'calls': 5, 'coalesced': 4, 'in_flight': 0})
+
+    def test_Join(self):
+        flight = SingleFlight()
+        started = []
+        start = lambda: started.append(Future()) or started[-1]
+        futures = [flight.Join('card.api?Id=1', start) for i in xrange(3)]
+        self.assertEqual(len(started), 1)
+        self.assertEqual(flight.Stats()['in_flight'], 1)
+        started[0].SetResult('card')
+        self.assertEqual([future.Get(0) for future in futures], ['card'] * 3)
+        flight.Join('card.api?Id=1', start)
+        self.assertEqual(len(started), 2)
+        self.assertEqual(flight.Stats(),
+            {'calls': 4, 'coalesced': 2, 'in_flight': 1})
+
+
+class TestItemStream(unittest.TestCase):
+
+    DOCUMENT = {
+        'status': {'code': 'ok', 'message': 'a "quoted" \\ [text]'},
+        'data': {
+            'other': [{'tasks': [0]}],
+            'tasks': [{'Id': i, 'Name': u'Задача {0}, "{{}}"'.format(i),
+                'Owner': {'Id': 1, 'Name': 'Owner'}, 'Executors': [1, 2]}
+                for i in xrange(100)] + [12345, 'text', None],
+        },
+    }
+
+    def Parse(self, text, size):
+        stream = ItemStream(('data', 'tasks'))
+        items = []
+        for i in xrange(0, len(text), size):
+            items.extend(stream.Feed(text[i:i + size]))
+            self.assertTrue(len(stream._buf) < 200)
+        stream.Close()
+        return stream, items
+
+    def test_Feed(self):
+        text = json.dumps(self.DOCUMENT)
+        for size in (1, 3, 17, 4096):
+            stream, items = self.Parse(text, size)
+            self.assertEqual(items, self.DOCUMENT['data']['tasks'])
+            self.assertEqual(stream.captured[('status',)],
+                self.DOCUMENT['status'])
+
+    def test_Truncated(self):
+        stream = ItemStream(('data', 'tasks'))
+        stream.Feed('{"status": {"code": "ok"}, "data": {"tasks": [{"Id": 1}')
+        self.assertRaises(ValueError, stream.Close)
+
+    def test_Numbers(self):
+        values = [-2.5, 1e10, 0, -7, 3.25e-3, 12345678, True, None]
+        text = json.dumps({'data': {'tasks': values}})
+        for size in xrange(1, 12):
+            stream, items = self.Parse(text, size)
+            self.assertEqual(items, values)
+        stream = ItemStream(('data', 'tasks'))
+        self.assertEqual(stream.Feed('{"data": {"tasks": [-2'), [])
+        self.assertEqual(stream.Feed('.5, 1e'), [-2.5])
+        self.assertEqual(stream.Feed('10 ]}}'), [1e10])
+        stream.Close()
+
+
+class TestRecords(unittest.TestCase):
+
+    def Task(self, Id):
+        return {'Id': Id, 'Name': u'Задача', 'Status': 'actual',
+            'Deadline': '2026-10-18', 'TimeCreated': '2026-10-01 10:00:00',
+            'Owner': {'Id': 1000005, 'Name': u'Иванов'}, 'SuperTask': None,
+            'Executors': [{'Id': 1000005, 'Name': u'Иванов'}],
+            'Customer': {'Id': 7, 'Name': 'C', 'Status': 'a', 'Type': 'b'}}
+
+    def test_FromDict(self):
+        a, b = Task.FromDict(self.Task(1)), Task.FromDict(self.Task(2))
+        self.assertTrue(a.Owner is b.Owner)
+        self.assertTrue(a.Executors[0] is a.Owner)
+        self.assertEqual(a.Owner.Name, u'Иванов')
+        self.assertEqual(a['Owner']['Id'], 1000005)
+        self.assertEqual(a.get('Customer')['Type'], 'b')
+        self.assertEqual(a.Statement, None)
+        self.assertRaises(KeyError, lambda: a['Unknown'])
+        self.assertRaises(AttributeError, lambda: a.Unknown)
+        self.assertFalse(hasattr(a, '__dict__'))
+
+    def test_Dates(self):
+        task = Task.FromDict(self.Task(1))
+        self.assertTrue(isinstance(task._Deadline, basestring))
+        self.assertEqual(task.Deadline, datetime.date(2026, 10, 18))
+        self.assertEqual(task.TimeCreated,
+            datetime.datetime(2026, 10, 1, 10, 0, 0))
+        self.assertEqual(task.TimeUpdated, None)
+        self.assertEqual(task.AsDict(), self.Task(1))
+
+    def test_Convert(self):
+        data = Convert({'tasks': [self.Task(1)], 'task': self.Task(2),
+            'other': [self.Task(3)]})
+        self.assertTrue(isinstance(data['tasks'][0], Task))
+        self.assertTrue(isinstance(data['task'], Task))
+        self.assertTrue(isinstance(data['other'][0], dict))
+
+
+class TestJsonBackend(unittest.TestCase):
+
+    TEXT = '{"status": {"code": "ok"}, "data": {"Id": 1, "Work": 1.5}}'
+
+    def test_Loads(self):
+        for name in Available():
+            self.assertEqual(Backend(name).Loads(self.TEXT),
+                json.loads(self.TEXT))
+        self.assertRaises(ImportError, Backend, 'nojson')
+
+    def test_Hooks(self):
+        for name in Available():
+            backend = Backend(name, object_hook=lambda d: sorted(d),
+                parse_float=str)
+            if name == 'ujson':
+                self.assertEqual(backend.name, 'simplejson'
+                    if 'simplejson' in Available() else 'json')
+            else:
+                self.assertEqual(backend.name, name)
+            self.assertEqual(backend.Loads(self.TEXT), ['data', 'status'])
+            value, end = backend.Decoder().raw_decode(
+                self.TEXT + ' []', len('{"status": {"code": "ok"}, "data": '))
+            self.assertEqual(value, ['Id', 'Work'])
+            self.assertEqual(backend.Loads('[1.5]'), ['1.5'])
+
+
+class TestInstrument(unittest.TestCase):
+
+    def test_Histogram(self):
+        histogram = Histogram()
+        for i in xrange(1, 1001):
+            histogram.Add(i / 1000.0)
+        self.assertEqual(histogram.count, 1000)
+        self.assertEqual(histogram.max, 1.0)
+        for q in (50, 90, 99):
+            self.assertAlmostEqual(histogram.Percentile(q), q / 100.0,
+                delta=q / 100.0 * 0.2)
+        self.assertEqual(histogram.Percentile(100), 1.0)
+        self.assertEqual(Histogram().Percentile(50), None)
+
+    def test_LatencyAggregator(self):
+        latency = LatencyAggregator()
+        for i in xrange(10):
+            trace = Trace('BumsTaskApiV01/Task/card.api?Id={0}'.format(i))
+            trace.attempts = 1
+            trace.status = 200 if i else 500
+            trace.response_bytes = 100
+            trace.Add('ttfb', 0.05)
+            trace.Finish(None if i else ClientError('500', 500))
+            latency.After(trace)
+        self.assertEqual(latency.Endpoints(), ['BumsTaskApiV01/Task/card.api'])
+        stats = latency.Stats()['BumsTaskApiV01/Task/card.api']
+        self.assertEqual(stats['count'], 10)
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['statuses'], {200: 9, 500: 1})
+        self.assertEqual(stats['sources'], {'network': 10})
+        self.assertEqual(stats['response_bytes'], 1000)
+        self.assertAlmostEqual(stats['phases']['ttfb'], 0.05)
+        self.assertTrue(stats['p50'] <= stats['p99'] <= stats['max'])
+
+
+class TestPrometheus(unittest.TestCase):
+
+    def test_Render(self):
+        mplan = Megaplan('account', 'login', 'password')
+        exporter = Exporter(mplan, buckets=(0.1, 1.0))
+        self.assertEqual(mplan.hooks, [exporter.hook])
+        for elapsed, attempts in ((0.05, 1), (0.5, 3)):
+            trace = Trace('BumsTaskApiV01/Task/list.api?Folder=all')
+            trace.attempts, trace.status = attempts, 200
+            trace.Finish()
+            trace.elapsed = elapsed
+            exporter.hook.After(trace)
+        lines = exporter.Render().splitlines()
+        for line in (
+            'megaplan_requests_total{endpoint="BumsTaskApiV01/Task/list.api",'
+                'method="GET",status="200",source="network"} 2',
+            'megaplan_request_duration_seconds_bucket{endpoint='
+                '"BumsTaskApiV01/Task/list.api",le="0.1"} 1',
+            'megaplan_request_duration_seconds_bucket{endpoint='
+                '"BumsTaskApiV01/Task/list.api",le="+Inf"} 2',
+            'megaplan_request_duration_seconds_count{endpoint='
+                '"BumsTaskApiV01/Task/list.api"} 2',
+            'megaplan_request_retries_total{endpoint='
+                '"BumsTaskApiV01/Task/list.api"} 2',
+            'megaplan_cache_entries 0',
+            '# TYPE megaplan_request_duration_seconds histogram'):
+            self.assertTrue(line in lines, line)
+        exporter.Close()
+        self.assertEqual(mplan.hooks, [])
+
+    def test_Coalesced(self):
+        with StubServer(Dataset(tasks=5), latency=0.02) as server:
+            mplan = AsyncMegaplan('stub', 'stub', 'stub', host=server.host,
+                scheme='http')
+            exporter = Exporter(mplan)
+            try:
+                for card in [mplan.TaskCard(1000001) for i in xrange(5)]:
+                    card.Get(5)
+                lines = exporter.Render().splitlines()
+            finally:
+                exporter.Close()
+                mplan.Close()
+        self.assertTrue('megaplan_coalesced_total 4' in lines)
+        self.assertTrue('megaplan_requests_total{endpoint='
+            '"BumsTaskApiV01/Task/card.api",method="GET",status="",'
+            'source="coalesced"} 4' in lines)
+
+
+class TestStub(unittest.TestCase):
+    """Megaplan against the local stub server.
+    """
+    def setUp(self):
+        self.server = StubServer(Dataset(tasks=120, projects=5, employees=20))
+        self.server.Start()
+        self.mplan = self.server.Client(retry=RetryPolicy(backoff=0.01))
+
+    def tearDown(self):
+        self.mplan._client.Close()
+        self.server.Stop()
+
+    def test_Read(self):
+        task = self.mplan.TaskCard(1000007).data['task']
+        self.assertEqual(task, self.server.dataset.Get('tasks', 1000007))
+        ids = [item['Id'] for item in self.mplan.IterTasks(page_size=50)]
+        self.assertEqual(ids, range(1000000, 1000120))
+        self.assertEqual(len(list(self.mplan.IterTasks(page_size=None))), 120)
+        self.assertEqual(len(self.mplan.Employees().data['employees']), 20)
+        self.assertEqual(self.server.stats['logins'], 1)
+
+    def test_Pages(self):
+        endpoints = self.server.stats['endpoints']
+        self.assertEqual(len(list(self.mplan.IterEmployees(page_size=100))),
+            20)
+        self.assertEqual(endpoints[Megaplan.EMPLOYEE + 'list.api'], 1)
+        # The last page is short: no request for the one after it.
+        self.assertEqual(len(list(self.mplan.IterTasks(page_size=50))), 120)
+        self.assertEqual(endpoints[Megaplan.TASK + 'list.api'], 3)
+        # The last page is full: an empty one ends the list.
+        self.assertEqual(len(list(self.mplan.IterTasks(page_size=40))), 120)
+        self.assertEqual(endpoints[Megaplan.TASK + 'list.api'], 7)
+
+    def test_Write(self):
+        data = self.mplan.TaskCreate(**{'Model[Name]': u'Задача'}).data
+        self.assertEqual(data['Name'], u'Задача')
+        self.mplan.CommentCreate('task', data['Id'],
+            **{'Model[Text]': u'Комментарий'})
+        comments = self.mplan.Comments('task', data['Id']).data['comments']
+        self.assertEqual([c['Text'] for c in comments], [u'Комментарий'])
+
+    def test_Signature(self):
+        mplan = self.mplan
+        mplan.TaskCard(1000001)
+        secret_key = 'wrong'
+        mplan._credentials = (mplan._AccessId, secret_key,
+            mplan._GetSigner(secret_key))
+        mplan.TaskCard(1000001)
+        self.assertEqual(self.server.stats['unauthorized'], 1)
+        self.server.Revoke()
+        mplan.TaskCard(1000001)
+        self.assertEqual(self.server.stats['unauthorized'], 2)
+        self.assertEqual(self.server.stats['logins'], 3)
+
+        mplan = self.server.Client()
+        mplan.Password = 'wrong'
+        self.assertRaises(Exception, mplan.TaskCard, 1000001)
+
+    def test_Reauthorize(self):
+        # A call retried while the new login is in flight signs with the
+        # old key and waits for the new one after its 401.
+        class SlowLogin(StubServer):
+            def _Login(self, params):
+                time.sleep(0.2)
+                return StubServer._Login(self, params)
+
+        server = SlowLogin(Dataset(tasks=5)).Start()
+        mplan = server.Client(retry=RetryPolicy(backoff=0.1, jitter=0))
+        errors = []
+
+        def Call(Id):
+            try:
+                mplan.TaskCard(Id)
+            except Exception as e:
+                errors.append(e)
+
+        try:
+            mplan.TaskCard(1000001)
+            server.Revoke()
+            server.Inject(503)
+            retried = threading.Thread(target=Call, args=(1000004,))
+            retried.start()
+            time.sleep(0.05)
+            # Logs in again; the other call retries meanwhile.
+            threads = [threading.Thread(target=Call, args=(1000000 + i % 4,))
+                for i in xrange(16)]
+            for thread in threads:
+                thread.start()
+            for thread in threads + [retried]:
+                thread.join()
+        finally:
+            mplan._client.Close()
+            server.Stop()
+        self.assertEqual(errors, [])
+        self.assertEqual(server.stats['logins'], 2)
+
+    def test_Cache(self):
+        self.mplan.Employees()
+        self.mplan.Employees()
+        self.assertEqual(self.mplan.cache.Stats()['hits'], 1)
+        mplan = self.server.Client(cache=None)
+        self.assertEqual(mplan.cache, None)
+
+        # A list read while an edit is made is not cached.
+        self.mplan.cache.Invalidate()
+        self.server.latency = 0.1
+        reader = threading.Thread(target=self.mplan.Employees)
+        reader.start()
+        time.sleep(0.05)
+        self.mplan.cache.Written(Megaplan.EMPLOYEE + 'edit.api')
+        reader.join()
+        self.assertEqual(self.mplan.cache.Stats()['size'], 0)
+
+    def test_Failures(self):
+        self.mplan.TaskCard(1000001)
+        self.server.Inject(503, 2)
+        self.mplan.TaskCard(1000001)
+        self.assertEqual(self.server.stats['errors'], 2)
+        self.server.Inject(404)
+        self.assertRaises(ClientError, self.mplan.TaskCard, 1000001)
+
+
+class TestDeadline(unittest.TestCase):
+    """The deadline covers the rate limiter and slow bodies.
+    """
+    def test_RateLimiter(self):
+        with StubServer(Dataset(tasks=5)) as server:
+            mplan = server.Client(deadline=0.5,
+                rate_limiter=RateLimiter(rate=1, burst=1))
+            # The login takes the only token.
+            started = time.time()
+            self.assertRaises(DeadlineExceeded, mplan.TaskCard, 1000001)
+            self.assertTrue(time.time() - started < 0.5)
+            mplan._client.Close()
+
+    def test_SlowBody(self):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '100')
+                self.end_headers()
+                try:
+                    for i in xrange(100):
+                        self.wfile.write(' ')
+                        self.wfile.flush()
+                        time.sleep(0.02)
+                except socket.error:
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever,
+            args=(0.05,))
+        thread.daemon = True
+        thread.start()
+        store = MemoryStore()
+        store.Set('stub:stub', ['id', 'key'])
+        mplan = Megaplan('stub', 'stub', 'stub', host='127.0.0.1:{0}'.format(
+            server.server_address[1]), scheme='http', token_store=store,
+            deadline=0.3, read_timeout=1.0)
+        try:
+            started = time.time()
+            with self.assertRaises(DeadlineExceeded) as context:
+                mplan.TaskCard(1000001)
+            self.assertTrue(context.exception.elapsed < 1.0)
+            self.assertTrue(time.time() - started < 1.0)
+        finally:
+            mplan._client.Close()
+            server.shutdown()
+            server.server_close()
+
+    def test_WillClose(self):
+        # Bodies read until the server closes the connection.
+        class Handler(BaseHTTPRequestHandler):
+            body = 'x' * 100000
+
+            def do_GET(self):
+                if self.path == '/close':
+                    self.protocol_version = 'HTTP/1.1'
+                self.send_response(200)
+                if self.path == '/close':
+                    self.send_header('Connection', 'close')
+                self.end_headers()
+                self.wfile.write(self.body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever,
+            args=(0.05,))
+        thread.daemon = True
+        thread.start()
+        client = APIClient(read_timeout=5)
+        url = 'http://127.0.0.1:{0}/'.format(server.server_address[1])
+        try:
+            for path in ('http10', 'close'):
+                self.assertEqual(client.Request(url + path), Handler.body)
+                response = client.Open(url + path, timeout=5)
+                self.assertEqual(response.read(), Handler.body)
+            stats = client.PoolStats().values()[0]
+            self.assertEqual(stats['discarded'], 4)
+            self.assertEqual(stats['idle'], 0)
+        finally:
+            client.Close()
+            server.shutdown()
+            server.server_close()
+
+    def test_Retries(self):
+        with StubServer(Dataset(tasks=5), latency=0.1) as server:
+            mplan = server.Client(deadline=0.35,
+                retry=RetryPolicy(max_attempts=10, backoff=0.01))
+            mplan.TaskCard(1000001)
+            server.Inject(503, 10)
+            with self.assertRaises(DeadlineExceeded) as context:
+                mplan.TaskCard(1000001)
+            self.assertTrue(0.3 <= context.exception.elapsed < 0.6)
+            mplan._client.Close()
+
+
+class TestBulk(unittest.TestCase):
+    """The *Cards methods against the stub server.
+    """
+    def setUp(self):
+        self.server = StubServer(Dataset(tasks=30, projects=5, employees=10))
+        self.server.Start()
+        self.mplan = self.server.Client()
+
+    def tearDown(self):
+        self.mplan._client.Close()
+        self.server.Stop()
+
+    def test_Order(self):
+        ids = range(1000029, 999999, -1)
+        items = self.mplan.TaskCards(ids, max_workers=4)
+        self.assertEqual([item.Id for item in items], ids)
+        self.assertEqual([item.Result.data['task']['Id'] for item in items],
+            ids)
+        self.assertTrue(all(item.Ok for item in items))
+        self.assertEqual(self.server.stats['endpoints'][
+            'BumsTaskApiV01/Task/card.api'], 30)
+
+        items = self.mplan.ProjectCards([100004, 100000])
+        self.assertEqual([item.Result.data['project']['Id']
+            for item in items], [100004, 100000])
+        items = self.mplan.EmployeeCards([1000001])
+        self.assertEqual(items[0].Result.data['employee']['Id'], 1000001)
+        items = self.mplan.CommentLists('task', [1000001, 1000002])
+        self.assertEqual([set(c['SubjectId'] for c in
+            item.Result.data['comments']) for item in items],
+            [set([1000001]), set([1000002])])
+
+    def test_Errors(self):
+        items = self.mplan.TaskCards([1000001, 1, 1000002], max_workers=3)
+        self.assertEqual([item.Ok for item in items], [True, False, True])
+        self.assertTrue(isinstance(items[1].Error, ClientError))
+        self.assertEqual(items[1].Error.status, 404)
+        self.assertEqual(self.mplan.TaskCards([]), [])
+
+
+class TestSync(unittest.TestCase):
+    """IncrementalSync against the stub server.
+    """
+    def setUp(self):
+        self.server = StubServer(Dataset(tasks=30, projects=3, employees=5))
+        self.server.Start()
+        self.mplan = self.server.Client()
+        self.sync = IncrementalSync(self.mplan, MemoryStore(), 'tasks',
+            page_size=10)
+
+    def tearDown(self):
+        self.mplan._client.Close()
+        self.server.Stop()
+
+    def Shift(self, time, seconds):
+        return (datetime.datetime.strptime(time, IncrementalSync.TIME_FORMAT)
+            + datetime.timedelta(seconds=seconds)).strftime(
+            IncrementalSync.TIME_FORMAT)
+
+    def test_Fetch(self):
+        tasks = self.server.dataset.tasks
+        latest = max(task['TimeUpdated'] for task in tasks)
+        changes = self.sync.Fetch()
+        self.assertEqual(sorted(task['Id'] for task in changes.Upserts),
+            range(1000000, 1000030))
+        self.assertEqual(changes.Deletes, [])
+        self.assertEqual(changes.State['since'], self.Shift(latest, -60))
+        # Nothing is stored before Commit().
+        state = self.sync.Fetch().State
+        self.assertEqual((state['since'], state['ids']),
+            (changes.State['since'], changes.State['ids']))
+        self.sync.Commit(changes)
+
+        changes = self.sync.Fetch()
+        self.assertEqual(sorted(task['Id'] for task in changes.Upserts),
+            sorted(task['Id'] for task in tasks
+            if task['TimeUpdated'] >= self.Shift(latest, -60)))
+        self.sync.Commit(changes)
+
+        self.mplan.TaskEdit(1000005, **{'Model[Name]': u'Задача'})
+        changes = self.sync.Fetch()
+        edited = [task for task in changes.Upserts if task['Id'] == 1000005]
+        self.assertEqual(edited[0]['Name'], u'Задача')
+        self.assertEqual(changes.State['since'],
+            self.Shift(edited[0]['TimeUpdated'], -60))
+        self.sync.Commit(changes)
+
+        # Changed in the same minute but listed late: within the overlap.
+        edited = self.server.dataset.Get('tasks', 1000005)['TimeUpdated']
+        self.server.dataset.Get('tasks', 1000006)['TimeUpdated'] = \
+            self.Shift(edited, -30)
+        self.server.dataset.Get('tasks', 1000007)['TimeUpdated'] = \
+            self.Shift(edited, -90)
+        ids = [task['Id'] for task in self.sync.Fetch().Upserts]
+        self.assertTrue(1000006 in ids)
+        self.assertFalse(1000007 in ids)
+
+    def test_Deletes(self):
+        lists = lambda: self.server.stats['endpoints'][
+            'BumsTaskApiV01/Task/list.api']
+        self.sync.Commit(self.sync.Fetch())
+        self.server.dataset.Remove('tasks', 1000003)
+        # Off by default: only the changes are listed.
+        before = lists()
+        self.assertEqual(self.sync.Fetch().Deletes, [])
+        self.assertEqual(lists(), before + 1)
+
+        self.sync.detect_deletes = True
+        self.server.dataset.Remove('tasks', 1000011)
+        changes = self.sync.Fetch()
+        self.assertEqual(changes.Deletes, [1000003, 1000011])
+        self.assertEqual(len(changes.State['ids']), 28)
+        self.sync.Commit(changes)
+        self.assertEqual(self.sync.Fetch().Deletes, [])
+
+        # At most once an hour: the first run scanned already.
+        self.sync.detect_deletes = 3600
+        self.server.dataset.Remove('tasks', 1000012)
+        self.assertEqual(self.sync.Fetch().Deletes, [])
+        changes.State['scanned'] -= 3600
+        self.sync.Commit(changes)
+        self.assertEqual(self.sync.Fetch().Deletes, [1000012])
+
+    def test_Cards(self):
+        self.sync.cards = True
+        changes = self.sync.Fetch()
+        self.assertEqual(len(changes.Upserts), 30)
+        self.assertTrue(all('Statement' in task for task in changes.Upserts))
+        self.assertRaises(ValueError, IncrementalSync, self.mplan,
+            MemoryStore(), 'comments')
+
+
+class TestReplica(unittest.TestCase):
+    """Replica filled from the stub server.
+    """
+    def setUp(self):
+        self.server = StubServer(Dataset(tasks=40, projects=4, employees=6,
+            comments=2))
+        self.server.Start()
+        self.mplan = self.server.Client()
+        self.replica = Replica()
+
+    def tearDown(self):
+        self.replica.Close()
+        self.mplan._client.Close()
+        self.server.Stop()
+
+    def test_Pull(self):
+        dataset = self.server.dataset
+        self.replica.Pull(self.mplan, comments=True, page_size=15)
+        tasks = self.replica.Tasks()
+        self.assertEqual([task['Id'] for task in tasks],
+            range(1000000, 1000040))
+        self.assertEqual(tasks[3]['Name'], dataset.tasks[3]['Name'])
+        self.assertEqual(len(self.replica.Projects()), 4)
+        self.assertEqual(self.replica.Employee(1000002)['Name'],
+            dataset.employees[2]['Name'])
+        comments = self.replica.Comments('task', 1000007)
+        self.assertEqual([comment['Id'] for comment in comments],
+            [comment['Id'] for comment in dataset.comments
+            if comment['SubjectId'] == 1000007])
+        self.assertEqual(self.replica.Task(1), None)
+
+        # Pulled again: replaced, not duplicated.
+        self.replica.Pull(self.mplan, page_size=100)
+        self.assertEqual(len(self.replica.Tasks()), 40)
+
+    def test_Tasks(self):
+        tasks = self.server.dataset.tasks
+        self.replica.Pull(self.mplan)
+        status = tasks[0]['Status']
+        responsible = tasks[0]['Responsible']['Id']
+        project = tasks[0]['Project']['Id']
+
+        def Ids(predicate):
+            return [task['Id'] for task in tasks if predicate(task)]
+
+        def Selected(**filters):
+            return [task['Id'] for task in self.replica.Tasks(**filters)]
+
+        self.assertEqual(Selected(Status=status),
+            Ids(lambda task: task['Status'] == status))
+        self.assertEqual(Selected(Status=status, Responsible=responsible),
+            Ids(lambda task: task['Status'] == status and
+            task['Responsible']['Id'] == responsible))
+        self.assertEqual(Selected(Project=[project, 0]),
+            Ids(lambda task: task['Project']['Id'] == project))
+        self.assertEqual(Selected(Search=u'отчет'),
+            Ids(lambda task: u'отчет' in task['Name']))
+        self.assertEqual(Selected(Search=u'отчет'.encode('utf-8')),
+            Selected(Search=u'отчет'))
+        self.assertEqual(Selected(OrderBy='TimeUpdated', Limit=5, Offset=2),
+            [task['Id'] for task in sorted(tasks,
+            key=lambda task: (task['TimeUpdated'], task['Id']))][2:7])
+        self.assertRaises(ValueError, self.replica.Tasks, OrderBy='Data')
+
+    def test_Apply(self):
+        sync = IncrementalSync(self.mplan, MemoryStore(), 'tasks',
+            detect_deletes=True)
+        changes = sync.Run()
+        self.replica.Apply(changes)
+        self.assertEqual(len(self.replica.Tasks()), 40)
+
+        self.mplan.TaskEdit(1000004, **{'Model[Name]': u'Задача'})
+        self.server.dataset.Remove('tasks', 1000009)
+        changes = sync.Run()
+        self.assertEqual(changes.Deletes, [1000009])
+        self.replica.Apply(changes)
+        self.assertEqual(self.replica.Task(1000004)['Name'], u'Задача')
+        self.assertEqual(self.replica.Task(1000009), None)
+        self.assertEqual(len(self.replica.Tasks()), 39)
+        self.assertRaises(ValueError, self.replica.Delete, 'other', [1])
+
+
+class CountingServer(StubServer):
+    """StubServer that keeps the most requests handled at once and the
+    client threads alive meanwhile.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CountingServer, self).__init__(*args, **kwargs)
+        self.peak = self.in_flight = self.threads = 0
+        self._counter = threading.Lock()
+
+    def _Handle(self, request):
+        with self._counter:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.threads = max(self.threads, self.ClientThreads())
+        try:
+            return super(CountingServer, self)._Handle(request)
+        finally:
+            with self._counter:
+                self.in_flight -= 1
+
+    def ClientThreads(self):
+        """Threads alive but those of the server.
+        """
+        return len([thread for thread in threading.enumerate()
+            if getattr(getattr(thread, '_Thread__target', None), 'im_self',
+                None) is not self._server])
+
+
+class TestAsync(unittest.TestCase):
+    """AsyncMegaplan against the stub server.
+    """
+    def setUp(self):
+        self.server = CountingServer(Dataset(tasks=60, projects=5,
+            employees=10), latency=0.02)
+        self.server.Start()
+        self.mplan = AsyncMegaplan('stub', 'stub', 'stub',
+            host=self.server.host, scheme='http', concurrency=4)
+
+    def tearDown(self):
+        self.mplan.Close()
+        self.server.Stop()
+
+    def test_Concurrency(self):
+        threads = self.server.ClientThreads()
+        cards = [self.mplan.TaskCard(1000000 + i) for i in xrange(40)]
+        self.assertTrue(all(isinstance(card, Future) for card in cards))
+        self.assertEqual([card.Get(10).data['task']['Id'] for card in cards],
+            range(1000000, 1000040))
+        self.assertEqual(self.server.stats['logins'], 1)
+        self.assertEqual(self.server.peak, 4)
+        # The loop is the only thread of the client.
+        self.assertEqual(self.server.threads, threads)
+        stats = self.mplan.Stats()
+        self.assertEqual(stats['peak'], 4)
+        self.assertEqual(stats['acquired'], 41)
+        self.assertEqual(stats['active'], 0)
+
+        self.server.peak = 0
+        ids = [item['Id'] for item in self.mplan.IterTasks(page_size=10)]
+        self.assertEqual(len(ids), 60)
+        self.assertEqual(len(list(self.mplan.IterTasks(page_size=None))), 60)
+        self.assertTrue(self.server.peak <= 2)
+        self.assertEqual(self.mplan.Stats()['acquired'], 41 + 7 + 1)
+
+    def test_Methods(self):
+        self.assertEqual(self.mplan.TaskEdit(1000005,
+            **{'Model[Name]': u'Задача'}).Get(5), None)
+        self.assertEqual(self.mplan.TaskCard(1000005).Get(5).data['task'][
+            'Name'], u'Задача')
+        # The stub has no favorites: the nested call fails.
+        self.assertRaises(ClientError,
+            self.mplan.TaskMarkAsFavorite(1000005).Get, 5)
+        items = self.mplan.TaskCards([1000001, 1, 1000002]).Get(5)
+        self.assertEqual([item.Ok for item in items], [True, False, True])
+        self.assertEqual(items[1].Error.status, 404)
+        self.assertEqual(self.mplan.TaskCards([]).Get(5), [])
+
+        requests = self.server.stats['endpoints'][
+            'BumsTaskApiV01/Task/card.api']
+        cards = [self.mplan.TaskCard(1000009) for i in xrange(10)]
+        self.assertEqual(len(set(id(card.Get(5)) for card in cards)), 1)
+        self.assertEqual(self.server.stats['endpoints'][
+            'BumsTaskApiV01/Task/card.api'], requests + 1)
+        stats = self.mplan.single_flight.Stats()
+        self.assertEqual(stats['coalesced'], 9)
+        self.assertEqual(stats['in_flight'], 0)
+
+        self.assertRaises(ClientError, self.mplan.TaskCard(1).Get, 5)
+        self.assertRaises(Exception,
+            self.mplan.TaskAction(1000001, 'act_unknown').Get, 5)
+        self.server.Revoke()
+        calls = [self.mplan.TaskCard(1000001 + i % 2) for i in xrange(8)]
+        for call in calls:
+            call.Get(5)
+        self.assertEqual(self.server.stats['logins'], 2)
+
+        loop = self.mplan.loop
+        self.mplan.Close()
+        self.assertFalse(loop.running)
+
+    def test_Responses(self):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            body = 'x' * 100000
+
+            def do_GET(self):
+                self.send_response(200)
+                if self.path == '/chunked':
+                    data = zlib.compress(self.body)
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.send_header('Content-Encoding', 'deflate')
+                    self.end_headers()
+                    for i in xrange(0, len(data), 100):
+                        chunk = data[i:i + 100]
+                        self.wfile.write('{0:x}\r\n{1}\r\n'.format(
+                            len(chunk), chunk))
+                    self.wfile.write('0\r\n\r\n')
+                elif self.path == '/close':
+                    self.send_header('Connection', 'close')
+                    self.end_headers()
+                    self.wfile.write(self.body)
+                    self.close_connection = 1
+                else:
+                    self.send_header('Content-Length', str(len(self.body)))
+                    self.end_headers()
+                    self.wfile.write(self.body)
+                    # The kept-alive connection is dropped.
+                    self.close_connection = 1
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever,
+            args=(0.05,))
+        thread.daemon = True
+        thread.start()
+        class SlowResolver(AsyncClient):
+            def _lookup(self, host, port):
+                time.sleep(0.5)
+                return super(SlowResolver, self)._lookup('127.0.0.1', port)
+
+        loop = Loop().Start()
+        client = SlowResolver(loop, read_timeout=5)
+        url = 'http://127.0.0.1:{0}/'.format(server.server_address[1])
+        try:
+            for path in ('chunked', 'close', 'length', 'length'):
+                self.assertEqual(client.Request(url + path).Get(5),
+                    Handler.body)
+            response = client.Open(url + 'chunked', stream=True).Get(5)
+            self.assertEqual(''.join(response.IterChunks()), Handler.body)
+            stats = client.PoolStats()[('http', '127.0.0.1',
+                server.server_address[1])]
+            self.assertEqual(stats['active'], 0)
+            # Found closed before the request or after it (and sent
+            # again).
+            self.assertEqual(stats['stale'] + stats['reconnected'], 2)
+
+            # Other requests go on while a host name is being resolved.
+            slow = client.Request(url.replace('127.0.0.1', 'slow.invalid') +
+                'length')
+            started = time.time()
+            self.assertEqual(client.Request(url + 'close').Get(5),
+                Handler.body)
+            self.assertTrue(time.time() - started < 0.4)
+            self.assertFalse(slow.Done())
+            self.assertEqual(slow.Get(5), Handler.body)
+        finally:
+            loop.Stop()
+            client.Close()
+            server.shutdown()
+            server.server_close()
+
+
+class TestCassette(unittest.TestCase):
+    """Recording the traffic with the stub server and replaying it.
+    """
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def Record(self, path):
+        server = StubServer(Dataset(tasks=20, projects=2, employees=5))
+        server.Start()
+        mplan = server.Client(cassette=path)
+        address = server.host
+        try:
+            self.assertEqual(mplan._client.cassette.mode, 'record')
+            before = mplan.Tasks().data
+            card = mplan.TaskCard(1000003).data
+            mplan.TaskCreate(**{'Model[Name]': u'Задача'})
+            after = mplan.Tasks().data
+        finally:
+            mplan._client.Close()
+            server.Stop()
+        self.assertEqual(len(after['tasks']), len(before['tasks']) + 1)
+        return address, before, card, after
+
+    def test_Replay(self):
+        for name in ('traffic.jsonl', 'traffic.jsonl.gz'):
+            path = os.path.join(self.path, name)
+            address, before, card, after = self.Record(path)
+            # Nothing listens on the address any more.
+            mplan = Megaplan('stub', 'stub', 'other', host=address,
+                scheme='http', cassette=path)
+            self.assertEqual(mplan._client.cassette.mode, 'replay')
+            self.assertEqual(mplan.Tasks().data, before)
+            self.assertEqual(mplan.TaskCard(1000003).data, card)
+            mplan.TaskCreate(**{'Model[Name]': u'Задача'})
+            self.assertEqual(mplan.Tasks().data, after)
+            self.assertEqual(mplan.Tasks().data, after)
+            self.assertRaises(CassetteMiss, mplan.TaskCard, 1000004)
+            stats = mplan._client.cassette.Stats()
+            self.assertEqual((stats['played'], stats['misses']), (6, 1))
+
+    def test_Secrets(self):
+        path = os.path.join(self.path, 'traffic.jsonl')
+        self.Record(path)
+        with open(path) as f:
+            entries = [json.loads(line) for line in f]
+        login = entries[0]
+        self.assertEqual(login['body'], 'Login=stub&Password=***')
+        self.assertEqual(json.loads(login['response'])['data'],
+            {'AccessId': '***', 'SecretKey': '***'})
+        self.assertFalse(any('X-Authorization' in entry['headers']
+            for entry in entries))
+
+
 if __name__ == '__main__':
     unittest.main()
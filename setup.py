@@ -34,6 +34,7 @@ setup(
         'Topic :: Software Development :: Libraries :: Python Modules',
     ],
     install_requires=[],
+    extras_require={'fastjson': ['ujson', 'simplejson']},
     include_package_data=True,
     zip_safe=False,
     long_description=read('README.rst'),